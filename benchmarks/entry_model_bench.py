@@ -0,0 +1,212 @@
+"""Memory and per-entry cost of the Article records against feedparser entries
+
+Builds one large RSS feed out of the fixture entries, parses it once with
+feedparser and then compares:
+
+- memory still held after parsing: the FeedParserDict the pipeline used to
+  keep until the end of the feed, against the ParsedFeed (Article records)
+  it keeps now;
+- time per entry for everything after feedparser.parse: a frozen copy of
+  the old date parsing / selection / field reads on the dicts, against the
+  conversion to Articles plus the same steps on them.
+
+Both paths must pick the same entries in the same order.
+
+    python benchmarks/entry_model_bench.py [--entries 10000] [--repeat 5]
+"""
+import argparse
+import gc
+import hashlib
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from pathlib import Path
+from xml.sax.saxutils import escape
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'extractor'))
+
+import feedparser  # noqa: E402
+
+from articles import parsed_feed_of  # noqa: E402
+from sec_feed_extract import select_new_entries  # noqa: E402
+
+FIXTURES_DIR = Path(__file__).resolve().parent / 'fixtures' / 'feeds'
+
+
+# --- cópia congelada da implementação antiga (não alterar) ---
+
+DATE_FIELDS = ('published_parsed', 'updated_parsed', 'created_parsed')
+STRING_DATE_FIELDS = ('published', 'updated', 'created')
+
+
+def legacy_entry_id_of(entry):
+    value = entry.get('id') or entry.get('link')
+    if value:
+        return str(value)
+    return 'sha256:' + hashlib.sha256(str(entry.get('title', '')).encode('utf-8')).hexdigest()
+
+
+def legacy_parse_date_string(value):
+    value = value.strip()
+    try:
+        dt_obj = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        try:
+            dt_obj = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+    if dt_obj.tzinfo:
+        dt_obj = dt_obj.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt_obj
+
+
+def legacy_entry_datetime(RssObject):
+    for field in DATE_FIELDS:
+        if RssObject.get(field):
+            return datetime(*RssObject.get(field)[:6])
+    for field in STRING_DATE_FIELDS:
+        if RssObject.get(field):
+            dt_obj = legacy_parse_date_string(str(RssObject.get(field)))
+            if dt_obj:
+                return dt_obj
+    return None
+
+
+def legacy_select_new_entries(entries, window_start, cursor, cursor_ids, undated_ids):
+    dated, undated = [], []
+    for RssObject in entries:
+        dt_obj = legacy_entry_datetime(RssObject)
+        if dt_obj is None:
+            undated.append(RssObject)
+        else:
+            dated.append((dt_obj, RssObject))
+    dated.sort(key=lambda item: item[0], reverse=True)
+    floor = max(window_start, cursor) if cursor else window_start
+    new_entries = []
+    scanned = 0
+    for dt_obj, RssObject in dated:
+        scanned += 1
+        if dt_obj < floor:
+            break
+        if dt_obj == cursor and (cursor_ids is None or legacy_entry_id_of(RssObject) in cursor_ids):
+            continue
+        new_entries.append((dt_obj, RssObject))
+    new_entries.reverse()
+    seen_undated = set()
+    for RssObject in undated:
+        entry_id = legacy_entry_id_of(RssObject)
+        seen_undated.add(entry_id)
+        if entry_id not in undated_ids:
+            new_entries.append((None, RssObject))
+    return new_entries, seen_undated, scanned
+
+
+def legacy_process(NewsFeed, window_start, cursor):
+    new_entries, _, _ = legacy_select_new_entries(NewsFeed.entries, window_start, cursor, None, set())
+    selected = []
+    for dt_obj, RssObject in new_entries:
+        DateActivity = dt_obj.strftime('%Y-%m-%dT%H:%M:%S')
+        title = RssObject.title if hasattr(RssObject, 'title') else 'No title'
+        link = RssObject.link if hasattr(RssObject, 'link') else ''
+        description = RssObject.summary if hasattr(RssObject, 'summary') else ''
+        selected.append((legacy_entry_id_of(RssObject), title, link, len(description), DateActivity))
+    return selected
+
+
+# --- caminho atual ---
+
+def current_process(NewsFeed, window_start, cursor):
+    feed = parsed_feed_of(NewsFeed, 'Bench')
+    new_articles, _, _ = select_new_entries(feed.articles, window_start, cursor, None, set())
+    selected = []
+    for article in new_articles:
+        DateActivity = time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(article.timestamp))
+        selected.append((article.id, article.title, article.link, len(article.summary), DateActivity))
+    return selected
+
+
+# --- feed sintético ---
+
+def large_feed(entries, now):
+    """RSS document with `entries` items cycled from the fixtures, one every 3 minutes back from `now`"""
+    samples = [entry for path in sorted(FIXTURES_DIR.glob('*.xml'))
+               for entry in feedparser.parse(path.read_bytes()).entries]
+    items = []
+    for i in range(entries):
+        entry = samples[i % len(samples)]
+        published = format_datetime(now - timedelta(minutes=3 * i))
+        items.append(
+            f"<item><title>{escape(entry.get('title', ''))} #{i}</title>"
+            f"<link>{escape(entry.get('link', ''))}&amp;n={i}</link>"
+            f"<guid isPermaLink=\"false\">bench-{i}</guid><pubDate>{published}</pubDate>"
+            f"<category>Bench</category><description>{escape(entry.get('summary', ''))}</description></item>")
+    return ('<?xml version="1.0" encoding="UTF-8"?><rss version="2.0"><channel><title>Bench</title>'
+            '<link>https://bench.example/</link><description>Synthetic feed</description>'
+            + ''.join(items) + '</channel></rss>').encode('utf-8')
+
+
+def retained_bytes(body, convert):
+    """Bytes still allocated once the parse result is reduced to what the pipeline keeps"""
+    gc.collect()
+    tracemalloc.start()
+    NewsFeed = feedparser.parse(body)
+    kept = parsed_feed_of(NewsFeed, 'Bench') if convert else NewsFeed
+    del NewsFeed
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del kept
+    return size
+
+
+def timed(fn, NewsFeed, window_start, cursor, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(NewsFeed, window_start, cursor)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--entries', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    now = datetime.now(timezone.utc).replace(microsecond=0)
+    body = large_feed(args.entries, now)
+    NewsFeed = feedparser.parse(body)
+    window_start = (now - timedelta(days=14)).replace(tzinfo=None)
+    # Cursor no meio da janela: parte das entradas é nova, parte já foi vista
+    cursor = (now - timedelta(days=7)).replace(tzinfo=None)
+
+    legacy_selected = legacy_process(NewsFeed, window_start, cursor)
+    current_selected = current_process(NewsFeed, window_start, cursor)
+    print(f"feed: {len(NewsFeed.entries)} entries, {len(body) / 1e6:.1f} MB, "
+          f"{len(current_selected)} new after the cursor")
+    if legacy_selected != current_selected:
+        mismatch = next((pair for pair in zip(legacy_selected, current_selected) if pair[0] != pair[1]),
+                        (len(legacy_selected), len(current_selected)))
+        print("selection mismatch:", mismatch)
+        return 1
+
+    legacy_mem = retained_bytes(body, convert=False)
+    current_mem = retained_bytes(body, convert=True)
+    per_10k = 10000 / len(NewsFeed.entries)
+    print(f"memory  legacy:  {legacy_mem * per_10k / 1e6:8.1f} MB per 10k entries")
+    print(f"memory  current: {current_mem * per_10k / 1e6:8.1f} MB per 10k entries  "
+          f"({legacy_mem / current_mem:.1f}x less)")
+
+    legacy = timed(legacy_process, NewsFeed, window_start, cursor, args.repeat)
+    current = timed(current_process, NewsFeed, window_start, cursor, args.repeat)
+    print(f"time    legacy:  {legacy * 1e6 / len(NewsFeed.entries):8.1f} us/entry  ({legacy:.3f}s)")
+    print(f"time    current: {current * 1e6 / len(NewsFeed.entries):8.1f} us/entry  ({current:.3f}s)")
+    print(f"speedup: {legacy / current:.2f}x")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,443 @@
+"""Local stand-ins for the feed hosts, the Groq API and the Notion API
+
+One threaded HTTP server answers:
+
+    GET  /feeds/<n>/<fixture>.xml     recorded feed XML, dates shifted to "now"; with local_links=True the
+                                      article links point at /articles/ on this server
+    GET  /articles/<host>/<path>      article page: navigation, sidebar and footer around the text
+    POST /openai/v1/chat/completions  canned Groq (OpenAI-compatible) answers, picked by a hash
+                                      of the article; JSON-mode requests get one per "### Article <id>";
+                                      with llm_fail_every=N every Nth request gets 429 + Retry-After
+    POST /v1/pages                    Notion page creation, 200 (pages are kept in memory); with
+                                      notion_fail_every=N every Nth request gets notion_fail_status
+    POST /v1/databases/<id>/query     Notion query: property filters (multi_select, select, date) and
+                                      last_edited_time filters joined by and/or, property and timestamp
+                                      sorts, page_size / start_cursor pagination; archived pages left out
+    PATCH /v1/pages/<id>              Notion property update or archive; bumps last_edited_time (to the
+                                      minute, like Notion)
+    POST /oauth/v2/accessToken        LinkedIn token exchange / refresh (form-encoded)
+    GET  /v2/me                       LinkedIn profile of the token owner
+    POST /v2/ugcPosts                 LinkedIn post creation, 201 + x-restli-id; 401 for unknown tokens; with
+                                      linkedin_fail_every=N every Nth post gets linkedin_fail_status
+
+Only meant for the benchmarks; nothing here is used by the extractor itself.
+"""
+import hashlib
+import itertools
+import json
+import re
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qsl
+
+FIXTURES_DIR = Path(__file__).resolve().parent / 'fixtures'
+
+RFC822_DATE = re.compile(r'<(pubDate|lastBuildDate)>([^<]+)</')
+ARTICLE_LINK = re.compile(r'(<link>|<link rel="alternate" type="text/html" href=")https?://')
+ARTICLE_SENTENCES = (
+    "Administrators running {topic} in production should plan the upgrade during the next maintenance window, "
+    "after testing it on a staging host that mirrors the real configuration.",
+    "The change affects anyone who automates {topic} with shell scripts, Ansible playbooks or CI/CD pipelines, "
+    "because the defaults and the command-line flags behave differently now.",
+    "According to the maintainers, {topic} was reviewed by several contributors, and the regression tests now "
+    "cover the corner cases that were reported by users over the last releases.",
+    "A quick way to check whether a server is affected is to compare the installed version with the fixed one, "
+    "for example with rpm -q or dpkg -l, and to look for the related entries in the system journal.",
+    "Security teams recommend rolling out the fix gradually, monitoring error rates and latency, and keeping a "
+    "tested rollback plan in case a dependency breaks after the update.",
+    "Cloud providers and Linux distributions are expected to ship updated packages and images for {topic} over "
+    "the coming days, so pinned versions in Dockerfiles and Terraform modules deserve a second look.",
+    "Long-term, the project plans to simplify configuration, reduce the number of moving parts and document the "
+    "migration path for teams that still depend on older behavior.",
+)
+BATCH_ARTICLE = re.compile(r'^### Article (\d+)\n', re.MULTILINE)
+ISO_DATE = re.compile(r'\d{4}-\d\d-\d\dT\d\d:\d\d:\d\d(?:Z|[+-]\d\d:\d\d)')
+
+
+def _parse_iso(value):
+    return datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+
+def shift_dates(xml, now=None):
+    """Move every date in a recorded feed so its newest entry is one hour old"""
+    dates = [parsedate_to_datetime(m.group(2)) for m in RFC822_DATE.finditer(xml)]
+    dates += [_parse_iso(m.group(0)) for m in ISO_DATE.finditer(xml)]
+    if not dates:
+        return xml
+    now = now or datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+    delta = now - timedelta(hours=1) - max(dates)
+    xml = RFC822_DATE.sub(
+        lambda m: f"<{m.group(1)}>{format_datetime(parsedate_to_datetime(m.group(2)) + delta)}</", xml)
+    return ISO_DATE.sub(lambda m: (_parse_iso(m.group(0)) + delta).strftime('%Y-%m-%dT%H:%M:%SZ'), xml)
+
+
+LINKEDIN_TOKEN = 'fake-linkedin-token'
+LINKEDIN_PERSON_ID = 'fake-person'
+
+
+def notion_time():
+    """Now as a Notion timestamp; Notion keeps last_edited_time to the minute"""
+    return datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:00.000Z')
+
+
+def notion_page(payload, page_id=None):
+    """Page as the Notion API returns it: rich text and titles get `plain_text`"""
+    properties = json.loads(json.dumps(payload.get('properties', {})))
+    for value in properties.values():
+        for item in value.get('rich_text', []) + value.get('title', []):
+            item['plain_text'] = item.get('text', {}).get('content', '')
+    return {'object': 'page', 'id': page_id or str(uuid.uuid4()),
+            'created_time': datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%fZ'),
+            'last_edited_time': notion_time(), 'archived': False, 'properties': properties}
+
+
+def compare_dates(value, condition):
+    """Notion date condition (equals, after, on_or_before, ...) against an ISO date or timestamp"""
+    if not value:
+        return False
+    for operator, bound in condition.items():
+        if len(bound) == 10:
+            current = value[:10]
+        else:
+            current = datetime.fromisoformat(value.replace('Z', '+00:00'))
+            bound = datetime.fromisoformat(bound.replace('Z', '+00:00'))
+        if not {'equals': current == bound, 'after': current > bound, 'on_or_after': current >= bound,
+                'before': current < bound, 'on_or_before': current <= bound}.get(operator, True):
+            return False
+    return True
+
+
+def page_matches(page, condition):
+    """Evaluate a Notion database filter against a page"""
+    if not condition:
+        return True
+    if 'and' in condition:
+        return all(page_matches(page, c) for c in condition['and'])
+    if 'or' in condition:
+        return any(page_matches(page, c) for c in condition['or'])
+    if 'timestamp' in condition:
+        return compare_dates(page.get(condition['timestamp']), condition[condition['timestamp']])
+    value = page['properties'].get(condition.get('property'), {})
+    if 'multi_select' in condition:
+        return condition['multi_select'].get('contains') in {o['name'] for o in value.get('multi_select', [])}
+    if 'select' in condition:
+        return (value.get('select') or {}).get('name') == condition['select'].get('equals')
+    if 'date' in condition:
+        return compare_dates((value.get('date') or {}).get('start'), condition['date'])
+    return True
+
+
+def page_statuses(page):
+    return {option['name'] for option in page['properties'].get('flow_status', {}).get('multi_select', [])}
+
+
+def article_html(path):
+    """Article page for a link path: the text is built from the slug, wrapped in the usual page chrome"""
+    slug = path.rstrip('/').rsplit('/', 1)[-1].rsplit('.', 1)[0]
+    topic = re.sub(r'[-_]+', ' ', slug).strip() or 'this release'
+    seed = int(hashlib.sha256(path.encode('utf-8')).hexdigest()[:8], 16)
+    count = 4 + seed % 3
+    paragraphs = ''.join(f"<p>{ARTICLE_SENTENCES[(seed + i) % len(ARTICLE_SENTENCES)].format(topic=topic)}</p>\n"
+                         for i in range(count))
+    links = ''.join(f'<li><a href="/related/{i}">Related story number {i} about something else</a></li>'
+                    for i in range(8))
+    return f"""<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>{topic}</title>
+<script>window.dataLayer = [{{'event': 'pageview'}}];</script><style>body {{ font-family: sans-serif; }}</style></head>
+<body><header><nav><a href="/">Home</a> <a href="/linux">Linux</a> <a href="/devops">DevOps</a>
+<a href="/security">Security</a></nav></header>
+<div class="layout"><main><article class="post-content"><h1>{topic}</h1>
+<div class="byline">By the editorial team</div>
+{paragraphs}<div class="share-buttons"><a href="#">Share on LinkedIn</a> <a href="#">Share on X</a></div>
+</article></main>
+<aside class="sidebar"><h3>Most read</h3><ul>{links}</ul></aside></div>
+<div id="newsletter"><p>Subscribe to our weekly newsletter to get the latest Linux and DevOps news in your inbox.</p></div>
+<footer><p>Copyright Example Media. All rights reserved. Privacy policy, terms of use and cookie settings.</p></footer>
+</body></html>"""
+
+
+def batch_answer(answers, ids):
+    """JSON answer in the schema of llm_generator.BATCH_INSTRUCTIONS, built from canned answers"""
+    posts = []
+    for article_id, answer in zip(ids, answers):
+        post, _, hashtags = answer.partition('HASHTAGS:')
+        posts.append({'id': int(article_id), 'post': post.split('POST:', 1)[-1].strip(),
+                      'hashtags': [tag.strip() for tag in hashtags.strip(' \n[]').split(',') if tag.strip()]})
+    return json.dumps({'posts': posts}, ensure_ascii=False)
+
+
+def load_fixtures(fixtures_dir=FIXTURES_DIR):
+    """(feed bodies by fixture name, canned Groq answers)"""
+    feeds = {path.stem: shift_dates(path.read_text(encoding='utf-8')).encode('utf-8')
+             for path in sorted((fixtures_dir / 'feeds').glob('*.xml'))}
+    answers = json.loads((fixtures_dir / 'groq_responses.json').read_text(encoding='utf-8'))
+    return feeds, answers
+
+
+class FakeServices:
+    """Threaded HTTP server with optional per-request latency for each service"""
+
+    def __init__(self, fixtures_dir=FIXTURES_DIR, feed_latency=0.0, llm_latency=0.0, notion_latency=0.0,
+                 llm_token_latency=0.0, bad_batch_every=0, linkedin_fail_every=0, local_links=False,
+                 article_latency=0.0, llm_fail_every=0, llm_retry_after='0', notion_fail_every=0,
+                 notion_fail_status=503, linkedin_fail_status=429):
+        self.feeds, self.answers = load_fixtures(fixtures_dir)
+        if not self.feeds:
+            raise RuntimeError(f"No feed fixtures found in {fixtures_dir / 'feeds'}")
+        self.fixture_names = sorted(self.feeds)
+        self.etags = {name: hashlib.sha256(body).hexdigest()[:16] for name, body in self.feeds.items()}
+        self.feed_latency = feed_latency
+        self.llm_latency = llm_latency
+        self.notion_latency = notion_latency
+        self.article_latency = article_latency
+        # Segundos por token gerado: a latência real cresce com o tamanho da resposta
+        self.llm_token_latency = llm_token_latency
+        # A cada N respostas em lote, uma vem quebrada (testa o fallback)
+        self.bad_batch_every = bad_batch_every
+        self._batch_ids = itertools.count(1)
+        # A cada N requisições ao LLM, uma recebe 429 (Retry-After None = sem o cabeçalho)
+        self.llm_fail_every = llm_fail_every
+        self.llm_retry_after = llm_retry_after
+        self._llm_attempts = itertools.count(1)
+        # A cada N páginas criadas no Notion, uma falha com este status (testa o outbox)
+        self.notion_fail_every = notion_fail_every
+        self.notion_fail_status = notion_fail_status
+        self._page_attempts = itertools.count(1)
+        self._lock = threading.Lock()
+        # Páginas do Notion criadas (id -> página no formato da API) e posts do LinkedIn
+        self.pages = {}
+        self.posts = []
+        self.linkedin_tokens = {LINKEDIN_TOKEN}
+        self._token_ids = itertools.count(1)
+        # A cada N posts no LinkedIn, um recebe 429 ou 5xx (testa os retries)
+        self.linkedin_fail_every = linkedin_fail_every
+        self.linkedin_fail_status = linkedin_fail_status
+        self._post_attempts = itertools.count(1)
+        self.requests = {'feeds': 0, 'llm': 0, 'llm_batch': 0, 'notion': 0, 'notion_query': 0, 'linkedin': 0,
+                         'articles': 0}
+        self.llm_tokens = {'prompt': 0, 'completion': 0}
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        if local_links:
+            # Links dos artigos passam a apontar para este servidor (a porta só existe agora)
+            self.feeds = {name: ARTICLE_LINK.sub(lambda m: f"{m.group(1)}{self.url}/articles/", body.decode('utf-8'))
+                          .encode('utf-8') for name, body in self.feeds.items()}
+            self.etags = {name: hashlib.sha256(body).hexdigest()[:16] for name, body in self.feeds.items()}
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def fixture_for(self, n):
+        return self.fixture_names[n % len(self.fixture_names)]
+
+    def feed_url(self, n):
+        return f"{self.url}/feeds/{n}/{self.fixture_for(n)}.xml"
+
+    def feed_body(self, n):
+        return self.feeds[self.fixture_for(n)]
+
+    def count(self, service):
+        with self._lock:
+            self.requests[service] += 1
+
+    def answer_for(self, article):
+        """Canned answer picked by a hash of the article, so reruns get the same posts"""
+        return self.answers[int(hashlib.sha256(article.encode('utf-8')).hexdigest()[:8], 16) % len(self.answers)]
+
+    def batch_answer_for(self, user_content):
+        # ['', '1', <artigo 1>, '2', <artigo 2>, ...]
+        parts = BATCH_ARTICLE.split(user_content)
+        ids, articles = parts[1::2], [article.strip() for article in parts[2::2]]
+        with self._lock:
+            broken = self.bad_batch_every and next(self._batch_ids) % self.bad_batch_every == 0
+        return '{"posts": [' if broken else batch_answer([self.answer_for(a) for a in articles], ids)
+
+    def add_tokens(self, prompt_tokens, completion_tokens):
+        with self._lock:
+            self.llm_tokens['prompt'] += prompt_tokens
+            self.llm_tokens['completion'] += completion_tokens
+
+    def add_page(self, page):
+        with self._lock:
+            self.pages[page['id']] = page
+        return page
+
+    def set_status(self, status, pages=None):
+        """Move pages (all by default) to another flow_status, like a person in the Notion UI"""
+        with self._lock:
+            for page in (pages or list(self.pages.values())):
+                page['properties']['flow_status'] = {'multi_select': [{'name': status}]}
+                page['last_edited_time'] = notion_time()
+
+    def query_pages(self, query):
+        """(page of results, next cursor) for a database query"""
+        with self._lock:
+            pages = [p for p in self.pages.values() if not p['archived'] and page_matches(p, query.get('filter'))]
+        for sort in reversed(query.get('sorts') or []):
+            key = sort.get('property')
+            if 'timestamp' in sort:
+                pages.sort(key=lambda p: p[sort['timestamp']], reverse=sort.get('direction') == 'descending')
+                continue
+            pages.sort(key=lambda p: p['properties'].get(key, {}).get('date', {}).get('start') or p['created_time'],
+                       reverse=sort.get('direction') == 'descending')
+        start = int(query.get('start_cursor') or 0)
+        end = start + int(query.get('page_size') or 100)
+        return pages[start:end], (str(end) if end < len(pages) else None)
+
+    def new_linkedin_token(self):
+        token = f"fake-linkedin-token-{next(self._token_ids)}"
+        with self._lock:
+            self.linkedin_tokens.add(token)
+        return token
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _handler(self):
+        services = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def setup(self):
+                super().setup()
+                # Cabeçalho e corpo saem em writes separados: sem isso o Nagle + delayed ACK somam ~40ms
+                self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, body=b'', content_type='application/json', headers=None):
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _linkedin_authorized(self):
+                token = self.headers.get('Authorization', '').replace('Bearer ', '', 1)
+                return token in services.linkedin_tokens
+
+            def do_GET(self):
+                if self.path == '/v2/me':
+                    services.count('linkedin')
+                    if not self._linkedin_authorized():
+                        return self._send(401, b'{"message": "Invalid access token"}')
+                    return self._send(200, json.dumps({'id': LINKEDIN_PERSON_ID}).encode('utf-8'))
+                if self.path.startswith('/articles/'):
+                    services.count('articles')
+                    if services.article_latency:
+                        time.sleep(services.article_latency)
+                    return self._send(200, article_html(self.path).encode('utf-8'), 'text/html; charset=utf-8')
+                parts = self.path.split('?', 1)[0].strip('/').split('/')
+                if len(parts) != 3 or parts[0] != 'feeds' or parts[2][:-4] not in services.feeds:
+                    return self._send(404, b'not found', 'text/plain')
+                services.count('feeds')
+                if services.feed_latency:
+                    time.sleep(services.feed_latency)
+                name = parts[2][:-4]
+                etag = f'"{services.etags[name]}"'
+                if self.headers.get('If-None-Match') == etag:
+                    return self._send(304, headers={'ETag': etag})
+                self._send(200, services.feeds[name], 'application/rss+xml; charset=utf-8', {'ETag': etag})
+
+            def _body(self):
+                raw = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                if self.headers.get('Content-Type', '').startswith('application/x-www-form-urlencoded'):
+                    return dict(parse_qsl(raw.decode('utf-8')))
+                return json.loads(raw or b'{}')
+
+            def do_PATCH(self):
+                body = self._body()
+                page = services.pages.get(self.path.rstrip('/').rsplit('/', 1)[-1])
+                if not self.path.startswith('/v1/pages/') or page is None:
+                    return self._send(404, b'{"object": "error", "status": 404}')
+                services.count('notion')
+                updated = notion_page(body)
+                with services._lock:
+                    page['properties'].update(updated['properties'])
+                    page['archived'] = bool(body.get('archived', page['archived']))
+                    page['last_edited_time'] = notion_time()
+                self._send(200, json.dumps(page).encode('utf-8'))
+
+            def do_POST(self):
+                body = self._body()
+                if self.path == '/oauth/v2/accessToken':
+                    services.count('linkedin')
+                    if body.get('grant_type') == 'refresh_token' and body.get('refresh_token') != 'fake-refresh-token':
+                        return self._send(400, b'{"error": "invalid_grant"}')
+                    answer = {'access_token': services.new_linkedin_token(), 'expires_in': 5184000,
+                              'refresh_token': 'fake-refresh-token', 'refresh_token_expires_in': 31536000}
+                    return self._send(200, json.dumps(answer).encode('utf-8'))
+                if self.path == '/v2/ugcPosts':
+                    services.count('linkedin')
+                    if not self._linkedin_authorized():
+                        return self._send(401, b'{"message": "Invalid access token"}')
+                    if services.linkedin_fail_every and next(services._post_attempts) % services.linkedin_fail_every == 0:
+                        status = services.linkedin_fail_status
+                        return self._send(status, json.dumps({'status': status}).encode('utf-8'),
+                                          headers={'Retry-After': '0'})
+                    with services._lock:
+                        services.posts.append(body)
+                        post_id = f"urn:li:share:{len(services.posts)}"
+                    return self._send(201, b'{}', headers={'x-restli-id': post_id})
+                if self.path.startswith('/v1/databases/') and self.path.endswith('/query'):
+                    services.count('notion_query')
+                    results, next_cursor = services.query_pages(body)
+                    answer = {'object': 'list', 'results': results, 'has_more': next_cursor is not None,
+                              'next_cursor': next_cursor}
+                    return self._send(200, json.dumps(answer).encode('utf-8'))
+                if self.path.endswith('/chat/completions'):
+                    services.count('llm')
+                    if services.llm_fail_every and next(services._llm_attempts) % services.llm_fail_every == 0:
+                        headers = {'Retry-After': services.llm_retry_after} if services.llm_retry_after else {}
+                        return self._send(429, b'{"error": {"message": "Rate limit reached"}}', headers=headers)
+                    user = (body.get('messages') or [{}])[-1].get('content', '')
+                    if (body.get('response_format') or {}).get('type') == 'json_object':
+                        services.count('llm_batch')
+                        content = services.batch_answer_for(user)
+                    else:
+                        content = services.answer_for(user)
+                    prompt_tokens = sum(len(m.get('content', '')) for m in body.get('messages', [])) // 4
+                    completion_tokens = len(content) // 4
+                    services.add_tokens(prompt_tokens, completion_tokens)
+                    delay = services.llm_latency + services.llm_token_latency * completion_tokens
+                    if delay:
+                        time.sleep(delay)
+                    answer = {
+                        "id": f"chatcmpl-{uuid.uuid4().hex[:12]}", "object": "chat.completion",
+                        "created": int(time.time()), "model": body.get('model', ''),
+                        "choices": [{"index": 0, "finish_reason": "stop",
+                                     "message": {"role": "assistant", "content": content}}],
+                        "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                                  "total_tokens": prompt_tokens + completion_tokens},
+                    }
+                    return self._send(200, json.dumps(answer).encode('utf-8'))
+                if self.path.endswith('/pages'):
+                    services.count('notion')
+                    if services.notion_latency:
+                        time.sleep(services.notion_latency)
+                    if services.notion_fail_every and next(services._page_attempts) % services.notion_fail_every == 0:
+                        status = services.notion_fail_status
+                        return self._send(status, json.dumps({'object': 'error', 'status': status}).encode('utf-8'),
+                                          headers={'Retry-After': '0'})
+                    page = services.add_page(notion_page(body))
+                    return self._send(200, json.dumps(page).encode('utf-8'))
+                self._send(404, b'{}')
+
+        return Handler
@@ -0,0 +1,288 @@
+"""Stage-by-stage benchmark of sec-feed-extract.py against local fake services
+
+Replays the recorded feeds in benchmarks/fixtures/feeds, answers Groq calls
+with benchmarks/fixtures/groq_responses.json and accepts Notion pages on a
+local server (see fake_services.py), then times each pipeline stage for
+several feed counts and writes a JSON report:
+
+    python benchmarks/pipeline_bench.py                      # 10, 100 and 1000 feeds
+    python benchmarks/pipeline_bench.py --feeds 10,100 --output before.json
+    python benchmarks/pipeline_bench.py --compare before.json
+    python benchmarks/pipeline_bench.py --feeds 10 --batch-size 5 --llm-token-latency 0.002
+    python benchmarks/pipeline_bench.py --feeds 10 --enrich
+
+Stages: fetch (concurrent download + parse, as in main()), parse (serial
+feedparser.parse of the same bodies), filter (GetRssFromUrl: date filter,
+dedupe, cursor writes), enrich (article pages, only with --enrich), generate, sanitize (build_notion_page), notion
+(writer + outbox bookkeeping) and persist (validators, run stats, close).
+"""
+import argparse
+import copy
+import json
+import logging
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import feedparser
+
+from fake_services import FakeServices
+
+ROOT = Path(__file__).resolve().parent.parent
+EXTRACTOR_DIR = ROOT / 'extractor'
+RESULTS_DIR = Path(__file__).resolve().parent / 'results'
+STAGES = ('fetch', 'parse', 'filter', 'enrich', 'generate', 'sanitize', 'notion', 'persist')
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def configure_env(services, dedupe, provider='groq', enrich=False):
+    """Point the extractor at the fake services; must run before it is imported"""
+    os.environ.update({
+        'LLM_PROVIDER': provider,
+        'GROQ_API_KEY': 'bench',
+        'GROQ_BASE_URL': services.url,
+        'LLM_BASE_URL': f"{services.url}/openai/v1",
+        'GROQ_RPM': '0',
+        'NOTION_API_TOKEN': 'bench',
+        'NOTION_API_URL': f"{services.url}/v1",
+        'NOTION_RPS': '0',
+        # O benchmark mede a geração de verdade, não o cache
+        'LLM_CACHE': 'off',
+        # As mesmas notícias gravadas são servidas por todos os feeds
+        'DEDUPE': 'on' if dedupe else 'off',
+        'ENRICH': 'on' if enrich else 'off',
+    })
+
+
+def load_extractor():
+    """Import the pipeline module (sec_feed_extract.py) and set up logging like the CLI does"""
+    sys.path.insert(0, str(EXTRACTOR_DIR))
+    import sec_feed_extract as module
+    from log_config import setup_logging
+    # Mesma configuração de logging de uma execução normal (LOG_* do ambiente)
+    setup_logging()
+    # Só o arquivo de log; o console fica com avisos e erros
+    for handler in logging.getLogger().handlers:
+        if not isinstance(handler, logging.FileHandler):
+            handler.setLevel(logging.WARNING)
+    return module
+
+
+@contextmanager
+def stage(timings, name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = round(time.perf_counter() - start, 4)
+
+
+def log_bytes(workdir):
+    return sum(path.stat().st_size for path in Path(workdir, 'logs').glob('*') if path.is_file())
+
+
+def peak_rss_kb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def run_pipeline(mod, services, feed_count, run_dir, dedupe, initial_stats, batch_size=1, enrich=False):
+    """Run every stage once over `feed_count` feeds in a fresh state directory, starting from `initial_stats`"""
+    from article_fetcher import ArticleEnricher
+    from article_index import ArticleIndex
+    from feed_fetcher import FETCH_WORKERS, fetch_feeds
+    from llm_generator import Generator
+    from notion_writer import NotionWriter
+    from state_store import StateStore
+
+    run_dir.mkdir(parents=True)
+    os.chdir(run_dir)
+    mod.reset_stats(initial_stats)
+    mod.state_store = store = StateStore()
+    store.start_run()
+    mod.article_index = ArticleIndex() if dedupe else None
+    requests_before = dict(services.requests)
+    tokens_before = dict(services.llm_tokens)
+    log_bytes_before = log_bytes(run_dir.parent)
+
+    rss_items = [(services.feed_url(n), f"Feed {n:04d}") for n in range(feed_count)]
+    for _, name in rss_items:
+        store.ensure_feed(name)
+    window_start = datetime.utcnow() - timedelta(days=14)
+
+    timings = {}
+    # Cada feed de teste vem do mesmo host: o limite por host seria o gargalo artificial
+    with stage(timings, 'fetch'):
+        results = list(fetch_feeds(rss_items, store, stop_before=lambda name: window_start,
+                                   per_host=FETCH_WORKERS))
+    with stage(timings, 'parse'):
+        for n in range(feed_count):
+            feedparser.parse(services.feed_body(n))
+    with stage(timings, 'filter'):
+        jobs = []
+        for result in results:
+            if result.error or result.not_modified:
+                continue
+            jobs.extend(mod.GetRssFromUrl(result.RssItem, result.feed))
+    enricher = None
+    with stage(timings, 'enrich'):
+        if enrich:
+            enricher = ArticleEnricher()
+            enricher.enrich(jobs)
+            enricher.close()
+    with stage(timings, 'generate'):
+        generator = Generator(mod.prompt, batch_size=batch_size)
+        generated = [job for job in generator.run(jobs) if not job.error]
+        generator.close()
+    with stage(timings, 'sanitize'):
+        pages = [(job, mod.build_notion_page(job.title, job.content, job.DateActivity, job.RssItem[1], job.link))
+                 for job in generated]
+    with stage(timings, 'notion'):
+        writer = NotionWriter('bench', store)
+        for job, page in pages:
+            writer.enqueue(page, job.article_id, job.title)
+        mod.collect_notion_results(writer)
+        writer.close()
+    with stage(timings, 'persist'):
+        for result in results:
+            store.update(result.RssItem[1], result.validators)
+        store.finish_run(mod.stats)
+        store.close()
+        if mod.article_index:
+            mod.article_index.close()
+
+    return {
+        'feeds': feed_count,
+        'entries': sum(r.feed.entry_count for r in results if r.feed is not None),
+        'articles': len(jobs),
+        'generated': len(generated),
+        'pages_written': mod.stats['successful_items'],
+        'errors': len(mod.stats['errors']) + sum(1 for r in results if r.error),
+        'requests': {k: services.requests[k] - requests_before[k] for k in services.requests},
+        'llm_tokens': {k: services.llm_tokens[k] - tokens_before[k] for k in services.llm_tokens},
+        'batch_size': batch_size,
+        'batch_fallbacks': generator.batch_fallbacks,
+        'enrich': {'fetched': enricher.fetched, 'cache_hits': enricher.cache_hits, 'failed': enricher.failed,
+                   'bytes': enricher.bytes_downloaded} if enricher else None,
+        'generate_ms_per_article': round(timings['generate'] / len(generated) * 1000, 2) if generated else None,
+        'stages': timings,
+        'total': round(sum(timings.values()), 4),
+        'log_bytes': log_bytes(run_dir.parent) - log_bytes_before,
+        'peak_rss_kb': peak_rss_kb(),
+    }
+
+
+def compare(report, baseline_path):
+    baseline = json.loads(Path(baseline_path).read_text(encoding='utf-8'))
+    old_runs = {run['feeds']: run for run in baseline['runs']}
+    print(f"\nComparison with {baseline_path} ({baseline.get('commit')} -> {report['commit']}):")
+    for run in report['runs']:
+        old = old_runs.get(run['feeds'])
+        if not old:
+            continue
+        print(f"  {run['feeds']} feeds:")
+        for name in STAGES + ('total',):
+            before = old['stages'].get(name) if name != 'total' else old['total']
+            after = run['stages'].get(name) if name != 'total' else run['total']
+            if before is None or after is None:
+                continue
+            change = f"{(after - before) / before * 100:+6.1f}%" if before else '     n/a'
+            print(f"    {name:<9} {before:9.3f}s -> {after:9.3f}s  {change}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--feeds', default='10,100,1000', help='comma-separated feed counts')
+    parser.add_argument('--output', help='report path (default: benchmarks/results/pipeline-<commit>.json)')
+    parser.add_argument('--compare', help='previous report to compare against')
+    parser.add_argument('--dedupe', action='store_true', help='keep cross-feed dedupe on (most articles will be dropped)')
+    parser.add_argument('--feed-latency', type=float, default=0.0, help='seconds added to each feed download')
+    parser.add_argument('--llm-latency', type=float, default=0.0, help='seconds added to each Groq call')
+    parser.add_argument('--llm-token-latency', type=float, default=0.0,
+                        help='seconds added to each Groq call per generated token')
+    parser.add_argument('--provider', default='groq', choices=('groq', 'openai'),
+                        help='LLM backend used against the stub: Groq SDK or plain OpenAI-compatible HTTP')
+    parser.add_argument('--batch-size', type=int, default=1, help='articles per Groq request (GENERATION_BATCH_SIZE)')
+    parser.add_argument('--bad-batch-every', type=int, default=0,
+                        help='return a malformed answer for every Nth batch request (exercises the fallback)')
+    parser.add_argument('--notion-latency', type=float, default=0.0, help='seconds added to each Notion call')
+    parser.add_argument('--enrich', action='store_true',
+                        help='fetch the article pages (served by the fake server) before generation')
+    parser.add_argument('--article-latency', type=float, default=0.0, help='seconds added to each article page')
+    parser.add_argument('--keep', action='store_true', help='keep the work directory (logs, state.db, raw_feeds)')
+    args = parser.parse_args()
+    feed_counts = [int(n) for n in args.feeds.split(',') if n.strip()]
+
+    services = FakeServices(feed_latency=args.feed_latency, llm_latency=args.llm_latency,
+                            notion_latency=args.notion_latency, llm_token_latency=args.llm_token_latency,
+                            bad_batch_every=args.bad_batch_every, local_links=args.enrich,
+                            article_latency=args.article_latency).start()
+    configure_env(services, args.dedupe, args.provider, args.enrich)
+    cwd = os.getcwd()
+    workdir = Path(tempfile.mkdtemp(prefix='sec-feed-bench-'))
+    try:
+        # setup_logging() cria logs/ no diretório corrente
+        os.chdir(workdir)
+        mod = load_extractor()
+        # Contadores zerados, copiados antes da primeira execução: cada contagem de feeds parte deles
+        initial_stats = copy.deepcopy(mod.stats)
+        runs = []
+        for feed_count in feed_counts:
+            run = run_pipeline(mod, services, feed_count, workdir / f"feeds_{feed_count}", args.dedupe,
+                               initial_stats, args.batch_size, args.enrich)
+            runs.append(run)
+            stages = ', '.join(f"{name} {run['stages'][name]:.3f}s" for name in STAGES)
+            print(f"{feed_count:>5} feeds, {run['articles']:>6} articles: {stages} | total {run['total']:.3f}s")
+            tokens = run['llm_tokens']
+            print(f"      LLM: {run['requests']['llm']} requests, {tokens['prompt']} prompt + "
+                  f"{tokens['completion']} completion tokens, {run['generate_ms_per_article']} ms/article")
+            if run['enrich']:
+                print(f"      Enrich: {run['enrich']['fetched']} pages fetched ({run['enrich']['bytes']} bytes), "
+                      f"{run['enrich']['cache_hits']} cache hits, {run['enrich']['failed']} failed")
+    finally:
+        os.chdir(cwd)
+        services.stop()
+        logging.shutdown()
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        'commit': git_commit(),
+        'created_at': datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'config': {'dedupe': args.dedupe, 'feed_latency': args.feed_latency,
+                   'llm_latency': args.llm_latency, 'llm_token_latency': args.llm_token_latency,
+                   'notion_latency': args.notion_latency, 'batch_size': args.batch_size, 'provider': args.provider,
+                   'enrich': args.enrich, 'article_latency': args.article_latency,
+                   'fixtures': services.fixture_names},
+        'runs': runs,
+    }
+    output = Path(args.output) if args.output else RESULTS_DIR / f"pipeline-{report['commit']}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2), encoding='utf-8')
+    print(f"Report written to {output}" + (f" (work files in {workdir})" if args.keep else ''))
+    if args.compare:
+        compare(report, args.compare)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
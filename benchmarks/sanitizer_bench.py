@@ -0,0 +1,151 @@
+"""Golden-corpus check and micro-benchmark for extractor/post_sanitizer.py
+
+Compares the sanitizer against a frozen copy of the old inline
+implementation (the one that lived in sec-feed-extract.py) on a seeded
+corpus of synthetic LLM answers, then times both.
+
+    python benchmarks/sanitizer_bench.py [--samples 3000] [--repeat 5] [--seed 42]
+"""
+import argparse
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'extractor'))
+
+from post_sanitizer import format_post  # noqa: E402
+
+
+# --- cópia congelada da implementação antiga (não alterar) ---
+
+def legacy_sanitize_for_linkedin(content):
+    content = re.sub(r"```[a-zA-Z]*\\n([\s\S]*?)```", lambda m: '💻 `' + m.group(1).replace('\n', ' ') + '`', content)
+    content = re.sub(r"```([\s\S]*?)```", lambda m: '💻 `' + m.group(1).replace('\n', ' ') + '`', content)
+    content = re.sub(r"`+([^`]+)`+", r"💻 `\1`", content)
+    content = re.sub(r"^\s*[-*]\s+", "• ", content, flags=re.MULTILINE)
+    def num_marker(m):
+        num = m.group(1)
+        emoji_nums = {'1':'1️⃣','2':'2️⃣','3':'3️⃣','4':'4️⃣','5':'5️⃣','6':'6️⃣','7':'7️⃣','8':'8️⃣','9':'9️⃣','0':'0️⃣'}
+        return emoji_nums.get(num, num) + ' '
+    content = re.sub(r"^\s*([0-9])\.\s+", num_marker, content, flags=re.MULTILINE)
+    content = re.sub(r"(^|\n)([A-Za-z])", r"\1👉 \2", content)
+    content = '\n'.join([line.strip() for line in content.splitlines()])
+    content = re.sub(r"(\n\s*){2,}", "\n", content)
+    content = re.sub(r"(\n)([^\n]{80,})(\n)", r"\1\2\n—\n", content)
+    content = re.sub(r" +", " ", content)
+    return content.strip()
+
+
+def legacy_format_post(summary):
+    if "POST:" in summary and "HASHTAGS:" in summary:
+        post_part = summary.split("POST:",1)[1]
+        post = post_part.split("HASHTAGS:",1)[0].strip()
+        hashtags_str = post_part.split("HASHTAGS:",1)[1].strip()
+    else:
+        post = summary.strip()
+    def clean_post_start(text):
+        text = text.strip()
+        pattern = r'^(POST:?|<think>|THINK:?|\*\*POST:?\*\*|\*POST:?\*|\*\*POST\*\*|POST |POST:|POST-|POST_|POST—|POST–|POST—|POST–|POST:)+' \
+                  r'\s*'
+        text = re.sub(pattern, '', text, flags=re.IGNORECASE)
+        while text.lower().startswith('<think>'):
+            text = text[7:].strip()
+        return text.strip()
+    post = clean_post_start(post)
+    post = legacy_sanitize_for_linkedin(post)
+    def extract_hashtags(post, hashtags_str):
+        hashtags = []
+        if hashtags_str:
+            hashtags = [tag.strip().replace("#","").replace(",","") for tag in hashtags_str.replace("["," ").replace("]"," ").split() if tag.strip() and tag.startswith("#") or tag.isalnum()]
+        if not hashtags:
+            hashtags = re.findall(r'#(\w+)', post)
+        if not hashtags:
+            stopwords = set(['the','a','an','and','or','for','to','of','in','on','with','is','are','at','by','as','from','that','this','it','be','has','have','was','were','but','if','so','do','can','will','just','your','you','we','i','my','our','their','they','he','she','his','her','its','not','more','all','any','new','how','why','what','when','where','which','who','about','into','out','up','down','over','under','after','before','then','than','too','very','also','only','each','other','such','these','those','may','should','could','would','must','been','being','did','does','had','having','make','made','get','got','use','used','using','like','see','even','many','much','most','some','no','yes','one','two','three','first','last','next','now','today','tomorrow','yesterday'])
+            words = re.findall(r'\b\w{4,}\b', post.lower())
+            keywords = [w.capitalize() for w in words if w not in stopwords]
+            hashtags = list(dict.fromkeys(keywords))[:3]
+        if not hashtags:
+            hashtags = ['Tech','IT','DevOps']
+        return hashtags
+    hashtags = extract_hashtags(post, hashtags_str if 'hashtags_str' in locals() else '')
+    return post, hashtags
+
+
+# --- corpus sintético ---
+
+WORDS = ("linux kernel patch security cve docker kubernetes pipeline deploy ansible terraform "
+         "systemd journal cluster node pod image registry backup restore firewall nginx "
+         "update release vulnerability exploit container cloud aws azure gcp the a to of and").split()
+PREFIXES = ["", "POST:\n", "**POST:** ", "<think>\n", "<think> POST - ", "THINK: ", "post: "]
+FRAGMENTS = [
+    lambda r: f"```bash\n{words(r, 4)}\n{words(r, 3)}\n```",
+    lambda r: f"```sh\\n{words(r, 5)}```",
+    lambda r: f"Run `{r.choice(WORDS)} --{r.choice(WORDS)}` now",
+    lambda r: f"{r.choice(['-', '*', '  -', ' *'])} {words(r, r.randint(1, 12))}",
+    lambda r: f"{r.randint(0, 12)}. {words(r, r.randint(1, 10))}",
+    lambda r: words(r, r.randint(14, 30)),
+    lambda r: f"   {words(r, r.randint(2, 8))}   ",
+    lambda r: "",
+    lambda r: " \t ",
+    lambda r: f"{words(r, 3)}  {words(r, 2)}    {words(r, 2)}",
+    lambda r: f"#{r.choice(WORDS).capitalize()} #{r.choice(WORDS)}",
+    lambda r: "What do you think? " + "🤔" * r.randint(0, 2),
+    lambda r: "`` ``` `",
+]
+SEPARATORS = ["\n", "\n", "\n\n", "\n \n", "\r\n", "\n\n\n", " "]
+
+
+def words(r, n):
+    return ' '.join(r.choice(WORDS) for _ in range(n))
+
+
+def sample(r):
+    body = ''.join(r.choice(FRAGMENTS)(r) + r.choice(SEPARATORS) for _ in range(r.randint(1, 14)))
+    answer = r.choice(PREFIXES) + body
+    if r.random() < 0.7:
+        tags = ', '.join('#' + r.choice(WORDS).capitalize() for _ in range(r.randint(0, 5)))
+        answer = "POST:\n" + answer + "\n\nHASHTAGS:\n" + r.choice([tags, f"[{tags}]", tags.replace('#', '')])
+    return answer
+
+
+def corpus(samples, seed):
+    r = random.Random(seed)
+    return [sample(r) for _ in range(samples)]
+
+
+def timed(fn, items, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for item in items:
+            fn(item)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--samples', type=int, default=3000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    items = corpus(args.samples, args.seed)
+    mismatches = [item for item in items if format_post(item) != legacy_format_post(item)]
+    print(f"golden corpus: {len(items)} samples, {len(mismatches)} mismatches")
+    if mismatches:
+        print("first mismatch:", repr(mismatches[0]))
+        return 1
+
+    legacy = timed(legacy_format_post, items, args.repeat)
+    current = timed(format_post, items, args.repeat)
+    print(f"legacy:  {legacy * 1e6 / len(items):8.1f} us/post  ({legacy:.3f}s)")
+    print(f"current: {current * 1e6 / len(items):8.1f} us/post  ({current:.3f}s)")
+    print(f"speedup: {legacy / current:.2f}x")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,163 @@
+"""Cold-start benchmark of the extractor CLI with `python -X importtime`
+
+Runs `extractor/sec-feed-extract.py` in each mode as a fresh interpreter
+(against the local fake services for the modes that touch the network),
+sums the import times reported by -X importtime and records which heavy
+packages each mode loaded:
+
+    python benchmarks/startup_bench.py                       # writes benchmarks/results/startup-<commit>.json
+    python benchmarks/startup_bench.py --repeat 10 --output before.json
+    python benchmarks/startup_bench.py --compare before.json
+"""
+import argparse
+import json
+import os
+import platform
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+from fake_services import FakeServices
+from pipeline_bench import EXTRACTOR_DIR, RESULTS_DIR, git_commit
+
+CLI = EXTRACTOR_DIR / 'sec-feed-extract.py'
+# Modo -> argumentos da CLI
+MODES = {
+    'help': ['--help'],
+    'dry-run': ['--dry-run'],
+    'replay-outbox': ['--replay-outbox'],
+    'fetch-only': ['--fetch-only'],
+    'full': [],
+}
+# Pacotes cujo carregamento queremos ver por modo
+HEAVY_PACKAGES = ('groq', 'httpx', 'pydantic', 'feedparser', 'requests', 'dotenv')
+# "import time:  self [us] | cumulative | imported package"
+IMPORT_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| \s*(\S+)")
+
+
+def parse_importtime(stderr):
+    """(total import microseconds, {top-level package: cumulative microseconds})"""
+    total = 0
+    packages = {}
+    for line in stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, name = match.groups()
+        total += int(self_us)
+        root = name.split('.')[0]
+        # Só a primeira importação de um pacote é listada; a mais externa traz o custo inteiro
+        if root in HEAVY_PACKAGES and name == root:
+            packages[root] = max(packages.get(root, 0), int(cumulative_us))
+    return total, packages
+
+
+def run_mode(args, env, workdir):
+    start = time.perf_counter()
+    process = subprocess.run([sys.executable, '-X', 'importtime', str(CLI)] + args, cwd=workdir, env=env,
+                             capture_output=True, text=True)
+    wall = time.perf_counter() - start
+    if process.returncode != 0:
+        raise RuntimeError(f"{' '.join(args) or 'full run'} exited with {process.returncode}:\n{process.stderr[-2000:]}")
+    import_us, packages = parse_importtime(process.stderr)
+    return wall, import_us, packages
+
+
+def prepare_workdir(services, feed_count):
+    workdir = Path(tempfile.mkdtemp(prefix='sec-feed-startup-'))
+    with open(workdir / 'Feed.csv', 'w', encoding='utf-8') as f:
+        for n in range(feed_count):
+            f.write(f"{services.feed_url(n)},Feed{n}\n")
+    return workdir
+
+
+def bench_env(services):
+    env = dict(os.environ)
+    env.update({
+        'GROQ_API_KEY': 'bench',
+        'GROQ_BASE_URL': services.url,
+        'GROQ_RPM': '0',
+        'NOTION_API_TOKEN': 'bench',
+        'NOTION_API_URL': f"{services.url}/v1",
+        'NOTION_RPS': '0',
+        'LLM_CACHE': 'off',
+        'DEDUPE': 'off',
+        'LOG_CONSOLE': 'off',
+    })
+    return env
+
+
+def compare(report, baseline_path):
+    baseline = json.loads(Path(baseline_path).read_text(encoding='utf-8'))
+    print(f"\nComparison with {baseline_path} ({baseline.get('commit')} -> {report['commit']}):")
+    for mode, run in report['modes'].items():
+        old = baseline['modes'].get(mode)
+        if not old:
+            continue
+        for key in ('import_ms', 'wall_ms'):
+            before, after = old[key], run[key]
+            change = f"{(after - before) / before * 100:+6.1f}%" if before else '     n/a'
+            print(f"  {mode:<14} {key:<9} {before:8.1f} -> {after:8.1f}  {change}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--modes', default=','.join(MODES), help='comma-separated modes to run')
+    parser.add_argument('--repeat', type=int, default=5, help='runs per mode (the median is reported)')
+    parser.add_argument('--feeds', type=int, default=3, help='feeds in Feed.csv for fetch-only and full runs')
+    parser.add_argument('--output', help='report path (default: benchmarks/results/startup-<commit>.json)')
+    parser.add_argument('--compare', help='previous report to compare against')
+    args = parser.parse_args()
+
+    services = FakeServices().start()
+    env = bench_env(services)
+    results = {}
+    try:
+        for mode in (m.strip() for m in args.modes.split(',') if m.strip()):
+            walls, imports, packages = [], [], {}
+            for _ in range(args.repeat):
+                # Cada execução começa sem state.db: "full" gera e grava de novo todos os artigos
+                workdir = prepare_workdir(services, args.feeds)
+                try:
+                    wall, import_us, loaded = run_mode(MODES[mode], env, workdir)
+                finally:
+                    shutil.rmtree(workdir, ignore_errors=True)
+                walls.append(wall)
+                imports.append(import_us)
+                packages = loaded
+            results[mode] = {
+                'import_ms': round(statistics.median(imports) / 1000, 1),
+                'wall_ms': round(statistics.median(walls) * 1000, 1),
+                'packages_ms': {name: round(us / 1000, 1) for name, us in sorted(packages.items())},
+            }
+            loaded = ', '.join(f"{name} {ms}ms" for name, ms in results[mode]['packages_ms'].items()) or 'none'
+            print(f"{mode:<14} imports {results[mode]['import_ms']:7.1f} ms, wall {results[mode]['wall_ms']:7.1f} ms"
+                  f" | heavy packages: {loaded}")
+    finally:
+        services.stop()
+
+    report = {
+        'commit': git_commit(),
+        'created_at': datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'config': {'repeat': args.repeat, 'feeds': args.feeds},
+        'modes': results,
+    }
+    output = Path(args.output) if args.output else RESULTS_DIR / f"startup-{report['commit']}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2), encoding='utf-8')
+    print(f"Report written to {output}")
+    if args.compare:
+        compare(report, args.compare)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,340 @@
+"""Optional enrichment stage: fetch the linked article pages and give the LLM their main text
+
+Many feeds only carry a one-line teaser in the summary. With ENRICH=on,
+the articles that pass triage and have a short summary get their page
+downloaded before generation. Downloads run concurrently over a pooled
+keep-alive session, with a per-host limit, and are capped at
+ENRICH_MAX_BYTES. The main text is extracted with a small readability-style
+scorer (stdlib HTMLParser, no extra dependency) and cut to ENRICH_MAX_TOKENS.
+
+Results are cached by canonical URL (article_index.canonicalize_url) in
+ENRICH_CACHE_PATH for ENRICH_CACHE_TTL_DAYS. A page seen by several feeds,
+or again on the next run, is downloaded once. Failures are cached for a
+shorter time.
+"""
+import logging
+import os
+import re
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from html.parser import HTMLParser
+from pathlib import Path
+
+import requests
+
+from feed_fetcher import HostLimiter, create_session
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+ENRICH_ENABLED = os.getenv('ENRICH', 'off').lower() in ('1', 'on', 'true', 'yes')
+ENRICH_WORKERS = int(os.getenv('ENRICH_WORKERS', '8'))
+ENRICH_PER_HOST = int(os.getenv('ENRICH_PER_HOST', '2'))
+ENRICH_TIMEOUT = float(os.getenv('ENRICH_TIMEOUT', '15'))
+ENRICH_MAX_BYTES = int(os.getenv('ENRICH_MAX_BYTES', str(2 * 1024 * 1024)))
+# Orçamento do texto extraído (~4 caracteres por token)
+ENRICH_MAX_TOKENS = int(os.getenv('ENRICH_MAX_TOKENS', '800'))
+# Resumos com pelo menos isso de texto já bastam; a página não é baixada
+ENRICH_MIN_SUMMARY = int(os.getenv('ENRICH_MIN_SUMMARY', '600'))
+ENRICH_CACHE_PATH = os.getenv('ENRICH_CACHE_PATH', 'cache/article_text.sqlite')
+ENRICH_CACHE_TTL_DAYS = float(os.getenv('ENRICH_CACHE_TTL_DAYS', '7'))
+# Páginas que falharam são tentadas de novo depois disso
+FAILURE_TTL = 6 * 3600
+
+# Nada dentro destes elementos é texto do artigo
+SKIP_TAGS = {'script', 'style', 'noscript', 'template', 'svg', 'canvas', 'iframe', 'object', 'nav', 'header',
+             'footer', 'aside', 'form', 'button', 'select', 'textarea', 'figcaption', 'head', 'title'}
+VOID_TAGS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'param', 'source',
+             'track', 'wbr'}
+BLOCK_TAGS = {'p', 'li', 'pre', 'blockquote', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'dd', 'dt', 'td', 'th'}
+CONTAINER_TAGS = {'article', 'main', 'section', 'div', 'body'}
+HEADINGS = {'h2', 'h3', 'h4'}
+# class/id que indicam o corpo do artigo ou ruído em volta dele
+POSITIVE = re.compile(r'article|content|entry|post|story|body|text|blog', re.IGNORECASE)
+NEGATIVE = re.compile(r'comment|share|social|related|promo|sidebar|newsletter|subscribe|advert|sponsor|cookie|'
+                      r'banner|breadcrumb|menu|footer|masthead|popup|modal|widget|author-bio|tags', re.IGNORECASE)
+WHITESPACE = re.compile(r'\s+')
+META_CHARSET = re.compile(rb'<meta[^>]+charset=["\']?([\w-]+)', re.IGNORECASE)
+HTML_TAG = re.compile(r'<[^>]+>')
+MIN_BLOCK_CHARS = 25
+MAX_LINK_DENSITY = 0.5
+
+
+class _Block:
+    __slots__ = ('tag', 'path', 'text', 'link_chars')
+
+    def __init__(self, tag, path):
+        self.tag = tag
+        self.path = path
+        self.text = []
+        self.link_chars = 0
+
+
+class MainTextParser(HTMLParser):
+    """Collects text blocks with the chain of containers each one sits in"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        # (tag, container id or None, skip) por elemento aberto
+        self.stack = []
+        self.containers = {}
+        self.blocks = []
+        self.block = None
+        self.skip_depth = 0
+        self.link_depth = 0
+
+    def _path(self):
+        return tuple(cid for _, cid, _ in self.stack if cid is not None)
+
+    def _flush(self):
+        block, self.block = self.block, None
+        if block and block.text:
+            text = WHITESPACE.sub(' ', ''.join(block.text)).strip()
+            if text:
+                block.text = text
+                self.blocks.append(block)
+
+    def handle_starttag(self, tag, attrs):
+        if tag in VOID_TAGS:
+            if tag == 'br' and self.block:
+                self.block.text.append(' ')
+            return
+        attrs = dict(attrs)
+        marker = f"{attrs.get('class') or ''} {attrs.get('id') or ''}"
+        skip = tag in SKIP_TAGS or (tag in CONTAINER_TAGS and tag != 'body' and bool(NEGATIVE.search(marker))
+                                    and not POSITIVE.search(marker))
+        cid = None
+        if tag in CONTAINER_TAGS or tag in BLOCK_TAGS:
+            self._flush()
+        if tag in CONTAINER_TAGS and not skip:
+            cid = len(self.containers)
+            bonus = 1.5 if tag in ('article', 'main') or POSITIVE.search(marker) else 1.0
+            self.containers[cid] = {'parent': self._path()[-1] if self._path() else None, 'bonus': bonus}
+        self.stack.append((tag, cid, skip))
+        if skip:
+            self.skip_depth += 1
+        if tag == 'a':
+            self.link_depth += 1
+        if tag in BLOCK_TAGS and not self.skip_depth:
+            self.block = _Block(tag, self._path())
+
+    def handle_endtag(self, tag):
+        if tag in VOID_TAGS:
+            return
+        # HTML mal formado: fecha até o elemento correspondente, se ele estiver aberto
+        for i in range(len(self.stack) - 1, -1, -1):
+            if self.stack[i][0] == tag:
+                break
+        else:
+            return
+        if tag in CONTAINER_TAGS or tag in BLOCK_TAGS:
+            self._flush()
+        for open_tag, _, skip in self.stack[i:]:
+            if skip:
+                self.skip_depth -= 1
+            if open_tag == 'a':
+                self.link_depth -= 1
+        del self.stack[i:]
+
+    def handle_data(self, data):
+        if self.skip_depth:
+            return
+        if self.block is None:
+            if not data.strip():
+                return
+            # Texto solto dentro de um <div> também conta como bloco
+            self.block = _Block('div', self._path())
+        self.block.text.append(data)
+        if self.link_depth:
+            self.block.link_chars += len(data.strip())
+
+    def close(self):
+        super().close()
+        self._flush()
+
+
+def extract_main_text(html):
+    """Main article text as paragraphs separated by blank lines ('' when nothing looks like an article)"""
+    parser = MainTextParser()
+    try:
+        parser.feed(html)
+        parser.close()
+    except Exception as e:
+        logger.debug("HTML parse error: %s", e)
+    blocks = [b for b in parser.blocks
+              if b.link_chars <= MAX_LINK_DENSITY * len(b.text)
+              and (len(b.text) >= MIN_BLOCK_CHARS or b.tag in HEADINGS)]
+    scores = {}
+    for block in blocks:
+        if not block.path or block.tag in HEADINGS:
+            continue
+        # Pontuação estilo readability: o container direto ganha tudo, o avô metade
+        score = 1 + block.text.count(',') + min(len(block.text) / 100, 3)
+        parent = block.path[-1]
+        scores[parent] = scores.get(parent, 0) + score
+        grandparent = parser.containers[parent]['parent']
+        if grandparent is not None:
+            scores[grandparent] = scores.get(grandparent, 0) + score / 2
+    if not scores:
+        return ''
+    best = max(scores, key=lambda cid: scores[cid] * parser.containers[cid]['bonus'])
+    return '\n\n'.join(b.text for b in blocks if best in b.path)
+
+
+def truncate_to_tokens(text, max_tokens=ENRICH_MAX_TOKENS):
+    """Cut at a paragraph (or word) boundary so the text fits ~max_tokens"""
+    max_chars = max_tokens * 4
+    if len(text) <= max_chars:
+        return text
+    cut = text.rfind('\n\n', 0, max_chars)
+    if cut < max_chars // 2:
+        cut = text.rfind(' ', 0, max_chars)
+    return text[:cut if cut > 0 else max_chars].rstrip() + ' …'
+
+
+def decode_html(body, encoding=None):
+    """Bytes -> text using the header charset, else <meta charset>, else UTF-8"""
+    if not encoding:
+        match = META_CHARSET.search(body[:4096])
+        encoding = match.group(1).decode('ascii') if match else 'utf-8'
+    try:
+        return body.decode(encoding, errors='replace')
+    except LookupError:
+        return body.decode('utf-8', errors='replace')
+
+
+class ArticleTextCache:
+    """Extracted text (or the failure) per canonical URL, with TTL eviction"""
+
+    def __init__(self, path=ENRICH_CACHE_PATH, ttl_days=ENRICH_CACHE_TTL_DAYS):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl_days * 86400
+        # Compartilhado pelos shards na mesma máquina (ver LLMCache)
+        self.conn = sqlite3.connect(str(self.path), timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS article_text (
+                url TEXT PRIMARY KEY,
+                text TEXT,
+                error TEXT,
+                fetched_at REAL NOT NULL
+            )""")
+        self.conn.commit()
+
+    def get(self, url):
+        """(found, text or None); failures count as found until FAILURE_TTL expires"""
+        row = self.conn.execute("SELECT text, error, fetched_at FROM article_text WHERE url = ?", (url,)).fetchone()
+        if row is None:
+            return False, None
+        text, error, fetched_at = row
+        if time.time() - fetched_at > (FAILURE_TTL if error else self.ttl):
+            return False, None
+        return True, text
+
+    def put(self, url, text, error=None):
+        self.conn.execute("INSERT OR REPLACE INTO article_text (url, text, error, fetched_at) VALUES (?, ?, ?, ?)",
+                          (url, text, str(error) if error else None, time.time()))
+        self.conn.commit()
+
+    def evict(self):
+        now = time.time()
+        removed = self.conn.execute(
+            "DELETE FROM article_text WHERE fetched_at < ? OR (error IS NOT NULL AND fetched_at < ?)",
+            (now - self.ttl, now - FAILURE_TTL)).rowcount
+        self.conn.commit()
+        return removed
+
+    def close(self):
+        try:
+            self.evict()
+        finally:
+            self.conn.close()
+
+
+def summary_length(job):
+    return len(WHITESPACE.sub(' ', HTML_TAG.sub(' ', job.description or '')).strip())
+
+
+class ArticleEnricher:
+    """Downloads article pages concurrently and sets `job.body` to their main text"""
+
+    def __init__(self, cache=None, session=None, workers=ENRICH_WORKERS, per_host=ENRICH_PER_HOST,
+                 max_tokens=ENRICH_MAX_TOKENS, min_summary=ENRICH_MIN_SUMMARY):
+        self.cache = cache if cache is not None else ArticleTextCache()
+        self.session = session or create_session(workers)
+        self.workers = max(1, workers)
+        self.limiter = HostLimiter(per_host)
+        self.max_tokens = max_tokens
+        self.min_summary = min_summary
+        self.fetched = 0
+        self.cache_hits = 0
+        self.failed = 0
+        self.bytes_downloaded = 0
+
+    def _download(self, url):
+        """(text, bytes read, error) for one page; runs on a worker thread"""
+        start = time.monotonic()
+        try:
+            with self.limiter.for_url(url):
+                with self.session.get(url, timeout=ENRICH_TIMEOUT, stream=True) as response:
+                    response.raise_for_status()
+                    content_type = response.headers.get('Content-Type', '')
+                    if content_type and 'html' not in content_type:
+                        return None, 0, f"not an HTML page ({content_type.split(';')[0]})"
+                    chunks, size = [], 0
+                    for chunk in response.iter_content(64 * 1024):
+                        chunks.append(chunk)
+                        size += len(chunk)
+                        if size >= ENRICH_MAX_BYTES:
+                            break
+                    # Sem charset no cabeçalho o requests supõe ISO-8859-1; melhor olhar o <meta>
+                    encoding = response.encoding if 'charset' in content_type.lower() else None
+            text = truncate_to_tokens(extract_main_text(decode_html(b''.join(chunks), encoding)), self.max_tokens)
+            return text, size, None if text else "no article text found"
+        except requests.RequestException as e:
+            return None, 0, f"{e.__class__.__name__}: {e}"
+        finally:
+            metrics.observe('enrich_fetch_seconds', time.monotonic() - start)
+
+    def enrich(self, jobs):
+        """Fill `body` on the jobs whose summary is shorter than `min_summary`; returns how many got text"""
+        by_url = {}
+        for job in jobs:
+            if summary_length(job) >= self.min_summary or not (job.link or '').startswith(('http://', 'https://')):
+                continue
+            by_url.setdefault(job.article.canonical_link, []).append(job)
+        pending = {}
+        for url, url_jobs in by_url.items():
+            found, text = self.cache.get(url)
+            if found:
+                self.cache_hits += 1
+                for job in url_jobs:
+                    job.body = text
+            else:
+                # O link original, não o canônico: o servidor pode depender do esquema ou da query
+                pending[url] = url_jobs
+        if pending:
+            logger.info(f"Fetching {len(pending)} article pages ({self.cache_hits} from the cache)")
+            with ThreadPoolExecutor(max_workers=min(self.workers, len(pending))) as pool:
+                futures = {pool.submit(self._download, url_jobs[0].link): url for url, url_jobs in pending.items()}
+                for future in as_completed(futures):
+                    url = futures[future]
+                    text, size, error = future.result()
+                    self.bytes_downloaded += size
+                    if error:
+                        self.failed += 1
+                        metrics.inc('enrich_pages_total', status='failed')
+                        logger.info("No article text for %s: %s", url, error)
+                    else:
+                        self.fetched += 1
+                        metrics.inc('enrich_pages_total', status='ok')
+                    self.cache.put(url, text, error)
+                    for job in pending[url]:
+                        job.body = text
+        return sum(1 for url_jobs in by_url.values() for job in url_jobs if job.body)
+
+    def close(self):
+        self.session.close()
+        self.cache.close()
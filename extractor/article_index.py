@@ -0,0 +1,168 @@
+"""Cross-feed seen-article index (canonical URL + MinHash LSH) for sec-feed-extract.py"""
+import hashlib
+import logging
+import os
+import random
+import re
+import sqlite3
+import struct
+import threading
+import time
+from pathlib import Path
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+logger = logging.getLogger(__name__)
+
+# Configuração do índice (DEDUPE=off desativa)
+DEDUPE_ENABLED = os.getenv('DEDUPE', 'on').lower() not in ('0', 'off', 'false', 'no')
+DEDUPE_INDEX_PATH = os.getenv('DEDUPE_INDEX_PATH', 'cache/seen_articles.sqlite')
+# Similaridade de Jaccard (estimada) a partir da qual dois artigos são o mesmo
+DEDUPE_SIMILARITY = float(os.getenv('DEDUPE_SIMILARITY', '0.7'))
+
+TRACKING_PARAMS = {'fbclid', 'gclid', 'mc_cid', 'mc_eid', 'ref', 'ref_src', 'amp', 'outputtype'}
+TAG_PATTERN = re.compile(r'<[^>]+>')
+WORD_PATTERN = re.compile(r'\w+')
+AMP_PATH_PATTERN = re.compile(r'(/amp/?$|/amp(?=/)|\.amp(?=\.html?$|$))')
+# 32 permutações em 8 bandas de 4: pares com Jaccard >= 0.8 viram candidatos
+# com probabilidade > 98%; os candidatos são confirmados pela assinatura inteira
+MINHASH_PERMUTATIONS = 32
+MINHASH_BANDS = 8
+ROWS_PER_BAND = MINHASH_PERMUTATIONS // MINHASH_BANDS
+MERSENNE_PRIME = (1 << 61) - 1
+_rng = random.Random(0x5EC)
+PERMUTATIONS = [(_rng.randrange(1, MERSENNE_PRIME), _rng.randrange(0, MERSENNE_PRIME))
+                for _ in range(MINHASH_PERMUTATIONS)]
+SIGNATURE_FORMAT = f'>{MINHASH_PERMUTATIONS}Q'
+MINHASH_MAX_WORDS = 400
+
+
+def canonicalize_url(url):
+    """Normalize a link so syndicated copies of the same URL compare equal"""
+    if not url:
+        return ''
+    parts = urlsplit(url.strip())
+    host = (parts.hostname or '').lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    if host.startswith('amp.'):
+        host = host[4:]
+    if parts.port and parts.port not in (80, 443):
+        host = f"{host}:{parts.port}"
+    path = AMP_PATH_PATTERN.sub('', parts.path) or '/'
+    path = re.sub(r'/{2,}', '/', path)
+    if len(path) > 1:
+        path = path.rstrip('/')
+    query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+             if not k.lower().startswith('utm_') and k.lower() not in TRACKING_PARAMS]
+    query.sort()
+    # Esquema e fragmento não distinguem artigos
+    return urlunsplit(('https', host, path, urlencode(query), ''))
+
+
+def minhash(text):
+    """MinHash signature over the word set of `text` (empty tuple if no words)"""
+    # Limita o custo em resumos enormes: as primeiras palavras bastam
+    words = set(WORD_PATTERN.findall(TAG_PATTERN.sub(' ', text or '').lower())[:MINHASH_MAX_WORDS])
+    if not words:
+        return ()
+    hashes = [int.from_bytes(hashlib.blake2b(w.encode('utf-8'), digest_size=8).digest(), 'big')
+              for w in words]
+    return tuple(min((a * h + b) % MERSENNE_PRIME for h in hashes) for a, b in PERMUTATIONS)
+
+
+def bands_of(signature):
+    """One signed 64-bit key per LSH band, ready for an indexed SQLite column"""
+    keys = []
+    for i in range(MINHASH_BANDS):
+        digest = hashlib.blake2b(struct.pack(f'>{ROWS_PER_BAND}Q', *signature[i * ROWS_PER_BAND:(i + 1) * ROWS_PER_BAND]),
+                                 digest_size=8).digest()
+        keys.append(int.from_bytes(digest, 'big', signed=True))
+    return keys
+
+
+def similarity(a, b):
+    """Estimated Jaccard similarity of two signatures"""
+    return sum(1 for x, y in zip(a, b) if x == y) / MINHASH_PERMUTATIONS
+
+
+class ArticleIndex:
+    """Persistent index of articles already sent to generation, across all feeds.
+
+    Exact duplicates are found through the canonical URL primary key; near
+    duplicates through one indexed column per MinHash LSH band, so a lookup is
+    a handful of B-tree probes regardless of how many articles were seen.
+    """
+
+    def __init__(self, path=DEDUPE_INDEX_PATH, threshold=DEDUPE_SIMILARITY):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.threshold = threshold
+        self.url_duplicates = 0
+        self.near_duplicates = 0
+        self._lock = threading.Lock()
+        # Compartilhado pelos shards na mesma máquina (ver LLMCache)
+        self.conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        band_columns = ''.join(f"band{i} INTEGER, " for i in range(MINHASH_BANDS))
+        self.conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS seen_articles (
+                url TEXT PRIMARY KEY,
+                signature BLOB,
+                {band_columns}
+                source TEXT,
+                title TEXT,
+                seen_at REAL NOT NULL
+            )""")
+        for i in range(MINHASH_BANDS):
+            self.conn.execute(f"CREATE INDEX IF NOT EXISTS seen_articles_band{i} ON seen_articles(band{i})")
+        self.conn.commit()
+
+    def find_duplicate(self, url, title, summary):
+        """Return (reason, matched_url) if the article was seen before, else None"""
+        canonical = canonicalize_url(url)
+        signature = minhash(f"{title} {summary}")
+        with self._lock:
+            if canonical:
+                row = self.conn.execute("SELECT url FROM seen_articles WHERE url = ?", (canonical,)).fetchone()
+                if row:
+                    self.url_duplicates += 1
+                    return 'url', row[0]
+            if not signature:
+                return None
+            where = ' OR '.join(f"band{i} = ?" for i in range(MINHASH_BANDS))
+            candidates = self.conn.execute(
+                f"SELECT url, signature FROM seen_articles WHERE {where}", bands_of(signature)).fetchall()
+        for candidate_url, candidate_signature in candidates:
+            if candidate_signature and similarity(
+                    signature, struct.unpack(SIGNATURE_FORMAT, candidate_signature)) >= self.threshold:
+                self.near_duplicates += 1
+                return 'similar', candidate_url
+        return None
+
+    def add(self, url, title, summary, source=None, commit=True):
+        """Remember an article; with commit=False it stays in the open transaction until commit()/rollback()"""
+        canonical = canonicalize_url(url) or f"title:{hashlib.sha256((title or '').encode('utf-8')).hexdigest()}"
+        signature = minhash(f"{title} {summary}")
+        if signature:
+            blob, bands = struct.pack(SIGNATURE_FORMAT, *signature), bands_of(signature)
+        else:
+            blob, bands = None, [None] * MINHASH_BANDS
+        band_names = ''.join(f"band{i}, " for i in range(MINHASH_BANDS))
+        with self._lock:
+            self.conn.execute(
+                f"INSERT OR IGNORE INTO seen_articles (url, signature, {band_names}source, title, seen_at) "
+                f"VALUES ({', '.join('?' * (MINHASH_BANDS + 5))})",
+                (canonical, blob, *bands, source, title, time.time()))
+            if commit:
+                self.conn.commit()
+
+    def commit(self):
+        with self._lock:
+            self.conn.commit()
+
+    def rollback(self):
+        with self._lock:
+            self.conn.rollback()
+
+    def close(self):
+        self.conn.close()
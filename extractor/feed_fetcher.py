@@ -0,0 +1,247 @@
+"""Concurrent feed download stage for sec-feed-extract.py"""
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+import feedparser
+import requests
+
+from articles import parsed_feed_of
+from feed_stream import parse_stream
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Limites de concorrência (configuráveis via .env)
+FETCH_WORKERS = int(os.getenv('FEED_FETCH_WORKERS', '16'))
+FETCH_PER_HOST = int(os.getenv('FEED_FETCH_PER_HOST', '2'))
+FETCH_TIMEOUT = float(os.getenv('FEED_FETCH_TIMEOUT', '30'))
+# full: baixa tudo e usa o feedparser; stream: iterparse incremental com parada antecipada
+FEED_PARSE_MODE = os.getenv('FEED_PARSE_MODE', 'full').lower()
+
+
+class HostLimiter:
+    """Per-host semaphores so one slow server never gets hammered by the whole pool"""
+
+    def __init__(self, per_host=FETCH_PER_HOST):
+        self.per_host = max(1, per_host)
+        self._lock = threading.Lock()
+        self._semaphores = {}
+
+    def for_url(self, url):
+        host = urlparse(url).hostname or ''
+        with self._lock:
+            if host not in self._semaphores:
+                self._semaphores[host] = threading.BoundedSemaphore(self.per_host)
+            return self._semaphores[host]
+
+
+class FetchResult:
+    """Outcome of downloading and parsing a single feed.
+
+    `not_modified` is set when the server answered 304 or the body hash matched
+    the previous run; `feed` is None in that case and nothing needs parsing.
+    Otherwise `feed` is a ParsedFeed: the entries are already Article records
+    and the feedparser tree has been dropped.
+    `validators` holds the new ETag/Last-Modified/hash to persist once the feed
+    has been processed.
+    """
+
+    def __init__(self, RssItem, feed=None, elapsed=0.0, error=None,
+                 not_modified=None, validators=None, bytes_downloaded=0):
+        self.RssItem = RssItem
+        self.feed = feed
+        self.elapsed = elapsed
+        self.error = error
+        self.not_modified = not_modified
+        self.validators = validators or {}
+        self.bytes_downloaded = bytes_downloaded
+        self.parse_seconds = None
+        # Cache-Control max-age / Expires do servidor, usado pelo agendador do modo daemon
+        self.cache_max_age = None
+        self.finished_at = time.monotonic()
+
+
+def create_session(pool_size=FETCH_WORKERS):
+    """Shared keep-alive session sized for the fetch pool"""
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers['User-Agent'] = feedparser.USER_AGENT
+    return session
+
+
+def conditional_headers(validators):
+    headers = {}
+    if validators.get('etag'):
+        headers['If-None-Match'] = validators['etag']
+    if validators.get('modified'):
+        headers['If-Modified-Since'] = validators['modified']
+    return headers
+
+
+def new_validators_of(response, sha256=None):
+    values = {
+        'etag': response.headers.get('ETag'),
+        'modified': response.headers.get('Last-Modified'),
+        'sha256': sha256,
+    }
+    return {k: v for k, v in values.items() if v}
+
+
+MAX_AGE = re.compile(r'(?:^|[,\s])(?:s-)?max-age\s*=\s*"?(\d+)', re.IGNORECASE)
+
+
+def cache_max_age_of(response):
+    """Seconds the server says the feed stays fresh (Cache-Control max-age, else Expires - Date)"""
+    match = MAX_AGE.search(response.headers.get('Cache-Control', ''))
+    if match:
+        return int(match.group(1))
+    expires, date = response.headers.get('Expires'), response.headers.get('Date')
+    if expires and date:
+        try:
+            return max(0, int((parsedate_to_datetime(expires) - parsedate_to_datetime(date)).total_seconds()))
+        except (TypeError, ValueError):
+            return None
+    return None
+
+
+def download_full(RssItem, session, validators, headers, keep_raw=False):
+    """Download the whole body, compare its hash, then parse it with feedparser"""
+    response = session.get(RssItem[0], headers=headers, timeout=FETCH_TIMEOUT)
+    result = _download_full(RssItem, response, validators, keep_raw)
+    result.cache_max_age = cache_max_age_of(response)
+    return result
+
+
+def _download_full(RssItem, response, validators, keep_raw=False):
+    body = response.content
+    if response.status_code == 304:
+        return FetchResult(RssItem, not_modified='304', validators=validators)
+    response.raise_for_status()
+    new_validators = new_validators_of(response, hashlib.sha256(body).hexdigest())
+    # Servidores sem ETag/Last-Modified: compara o hash do corpo
+    if validators.get('sha256') == new_validators['sha256']:
+        return FetchResult(RssItem, not_modified='hash', validators=new_validators,
+                           bytes_downloaded=len(body))
+    # feedparser espera os nomes de cabeçalho em minúsculas
+    response_headers = {k.lower(): v for k, v in response.headers.items()}
+    response_headers.setdefault('content-location', response.url)
+    start = time.monotonic()
+    NewsFeed = feedparser.parse(body, response_headers=response_headers)
+    # Só os registros compactos saem da thread; a árvore do feedparser é descartada aqui
+    feed = parsed_feed_of(NewsFeed, RssItem[1], keep_raw)
+    result = FetchResult(RssItem, feed, validators=new_validators, bytes_downloaded=len(body))
+    result.parse_seconds = time.monotonic() - start
+    return result
+
+
+def download_stream(RssItem, session, validators, headers, stop_before, keep_raw=False):
+    """Parse the body while it downloads, stopping once entries fall behind `stop_before`"""
+    with session.get(RssItem[0], headers=headers, timeout=FETCH_TIMEOUT, stream=True) as response:
+        if response.status_code == 304:
+            result = FetchResult(RssItem, not_modified='304', validators=validators)
+            result.cache_max_age = cache_max_age_of(response)
+            return result
+        response.raise_for_status()
+        # No modo stream o parse inclui a leitura do corpo
+        start = time.monotonic()
+        NewsFeed, reader = parse_stream(response, stop_before)
+        feed = parsed_feed_of(NewsFeed, RssItem[1], keep_raw)
+        parse_seconds = time.monotonic() - start
+    # O hash só vale se o corpo foi lido até o fim
+    sha256 = reader.sha256.hexdigest() if reader.exhausted else None
+    new_validators = new_validators_of(response, sha256)
+    if sha256 and validators.get('sha256') == sha256:
+        result = FetchResult(RssItem, not_modified='hash', validators=new_validators,
+                             bytes_downloaded=reader.bytes_read)
+    else:
+        result = FetchResult(RssItem, feed, validators=new_validators, bytes_downloaded=reader.bytes_read)
+        result.parse_seconds = parse_seconds
+    result.cache_max_age = cache_max_age_of(response)
+    return result
+
+
+def fetch_feed(RssItem, limiter, session, validators=None, stop_before=None, parse_mode=FEED_PARSE_MODE,
+               keep_raw=False):
+    """Conditionally download one feed while holding a slot for its host, then parse it"""
+    validators = validators or {}
+    headers = conditional_headers(validators)
+    start = time.monotonic()
+    try:
+        with limiter.for_url(RssItem[0]):
+            # O tempo conta a partir do slot obtido, não da fila do host
+            start = time.monotonic()
+            if parse_mode == 'stream':
+                try:
+                    result = download_stream(RssItem, session, validators, headers, stop_before, keep_raw)
+                except ET.ParseError as e:
+                    # XML que o iterparse não aceita: o feedparser é mais tolerante
+                    logger.warning(f"Streaming parse failed for {RssItem[1]} ({e}), falling back to full parse")
+                    result = download_full(RssItem, session, validators, headers, keep_raw)
+            else:
+                result = download_full(RssItem, session, validators, headers, keep_raw)
+    except Exception as e:
+        result = FetchResult(RssItem, error=e)
+    result.elapsed = time.monotonic() - start
+    result.finished_at = time.monotonic()
+    return result
+
+
+def record_fetch_metrics(result):
+    """Per-feed latency/size gauges plus fetch, parse and size histograms"""
+    if not metrics.enabled:
+        return
+    name = result.RssItem[1]
+    outcome = 'error' if result.error else (f"not_modified_{result.not_modified}" if result.not_modified else 'full')
+    metrics.inc('feed_fetches_total', outcome=outcome)
+    metrics.observe('feed_fetch_seconds', result.elapsed)
+    metrics.set('feed_last_fetch_seconds', result.elapsed, feed=name)
+    metrics.set('feed_last_bytes', result.bytes_downloaded, feed=name)
+    if result.bytes_downloaded:
+        metrics.observe('feed_bytes', result.bytes_downloaded)
+    metrics.observe('feed_parse_seconds', result.parse_seconds)
+
+
+def fetch_feeds(rss_items, validator_store=None, session=None, stop_before=None,
+                max_workers=FETCH_WORKERS, per_host=FETCH_PER_HOST, keep_raw=False):
+    """Fetch all feeds in parallel and yield FetchResult objects as they complete.
+
+    The workers only do network and parsing; callers consume results on their
+    own thread, so shared state (state store writes, stats) keeps a single writer.
+    `stop_before(name)` gives the oldest time still worth reading for a feed
+    (used by the streaming parse mode to stop early). `keep_raw` also keeps a
+    plain copy of every entry for the raw archive.
+    """
+    rss_items = list(rss_items)
+    if not rss_items:
+        return
+    limiter = HostLimiter(per_host)
+    session = session or create_session(max_workers)
+    start = time.monotonic()
+    slowest = 0.0
+    finished_at = start
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(rss_items)))) as pool:
+        futures = [
+            pool.submit(fetch_feed, item, limiter, session,
+                        validator_store.get(item[1]) if validator_store else None,
+                        stop_before(item[1]) if stop_before else None, keep_raw=keep_raw)
+            for item in rss_items
+        ]
+        for future in as_completed(futures):
+            result = future.result()
+            slowest = max(slowest, result.elapsed)
+            finished_at = max(finished_at, result.finished_at)
+            logger.debug("Fetched %s in %.2fs", result.RssItem[1], result.elapsed)
+            record_fetch_metrics(result)
+            yield result
+    logger.info(f"Fetch phase: {len(rss_items)} feeds in {finished_at - start:.2f}s "
+                f"(slowest feed {slowest:.2f}s)")
@@ -0,0 +1,125 @@
+"""Streaming RSS/Atom entry parser for large feeds (iterparse, early stop)"""
+import hashlib
+import logging
+import os
+import time
+import xml.etree.ElementTree as ET
+
+import feedparser
+
+from articles import entry_timestamp, parse_date_string, utc_timestamp
+
+logger = logging.getLogger(__name__)
+
+# Quantas entradas antigas seguidas encerram a leitura (feeds nem sempre vêm ordenados)
+STREAM_STOP_AFTER = int(os.getenv('FEED_STREAM_STOP_AFTER', '3'))
+STREAM_CHUNK_SIZE = 64 * 1024
+
+ENTRY_TAGS = {'item', 'entry'}
+DATE_TAGS = {
+    'pubDate': 'published', 'published': 'published', 'issued': 'published', 'date': 'published',
+    'updated': 'updated', 'modified': 'updated', 'lastBuildDate': 'updated',
+    'created': 'created',
+}
+
+
+def local_name(tag):
+    return tag.rsplit('}', 1)[-1] if '}' in tag else tag
+
+
+class HashingReader:
+    """File-like wrapper over a urllib3 response that counts and hashes what was read"""
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.sha256 = hashlib.sha256()
+        self.bytes_read = 0
+        self.exhausted = False
+
+    def read(self, size=STREAM_CHUNK_SIZE):
+        chunk = self.raw.read(size, decode_content=True)
+        if not chunk:
+            self.exhausted = True
+        self.sha256.update(chunk)
+        self.bytes_read += len(chunk)
+        return chunk
+
+
+def build_entry(elem):
+    """Turn one <item>/<entry> element into the FeedParserDict fields the pipeline uses"""
+    entry = feedparser.FeedParserDict()
+    for child in elem:
+        name = local_name(child.tag)
+        text = (child.text or '').strip()
+        if name == 'title':
+            entry['title'] = text
+        elif name == 'link':
+            href = child.get('href')
+            if href is not None:
+                if child.get('rel', 'alternate') == 'alternate' or 'link' not in entry:
+                    entry['link'] = href
+            elif text:
+                entry['link'] = text
+        elif name in ('guid', 'id'):
+            entry['id'] = text
+        elif name in ('description', 'summary'):
+            entry['summary'] = text or ''.join(child.itertext()).strip()
+        elif name in ('encoded', 'content') and 'summary' not in entry:
+            entry['summary'] = text or ''.join(child.itertext()).strip()
+        elif name in DATE_TAGS:
+            field = DATE_TAGS[name]
+            if field not in entry:
+                entry[field] = text
+                timestamp = parse_date_string(text) if text else None
+                if timestamp is not None:
+                    # Mesmo formato do feedparser: struct_time em UTC
+                    entry[f"{field}_parsed"] = time.gmtime(timestamp)
+    if 'id' not in entry and 'link' in entry:
+        entry['id'] = entry['link']
+    return entry
+
+
+def stream_entries(fileobj, stop_before=None, stop_after=STREAM_STOP_AFTER):
+    """Yield entries one at a time without building the whole document.
+
+    Processed elements are cleared from the tree as soon as they are
+    converted. When `stop_before` (naive UTC datetime) is given, reading stops
+    after `stop_after` consecutive entries older than it.
+    """
+    stop_epoch = utc_timestamp(stop_before) if stop_before else None
+    older_in_a_row = 0
+    stack = []
+    for event, elem in ET.iterparse(fileobj, events=('start', 'end')):
+        if event == 'start':
+            stack.append(elem)
+            continue
+        stack.pop()
+        if local_name(elem.tag) not in ENTRY_TAGS:
+            continue
+        entry = build_entry(elem)
+        # Solta a entrada da árvore para que nada fique acumulado
+        elem.clear()
+        if stack:
+            stack[-1].remove(elem)
+        epoch = entry_timestamp(entry)
+        if stop_epoch is not None and epoch is not None and epoch < stop_epoch:
+            older_in_a_row += 1
+            if older_in_a_row >= stop_after:
+                return
+            continue
+        older_in_a_row = 0
+        yield entry
+
+
+def parse_stream(response, stop_before=None):
+    """Stream-parse a requests response opened with stream=True.
+
+    Returns (NewsFeed, reader): NewsFeed only holds the entries newer than
+    `stop_before`, and reader tells how much was read and whether the whole
+    body was consumed (only then is its sha256 meaningful).
+    """
+    reader = HashingReader(response.raw)
+    entries = list(stream_entries(reader, stop_before))
+    NewsFeed = feedparser.FeedParserDict(entries=entries, feed=feedparser.FeedParserDict(),
+                                         bozo=False, bozo_exception=None, streamed=True)
+    return NewsFeed, reader
@@ -0,0 +1,368 @@
+"""LinkedIn publisher: posts the Notion pages marked START, one at a time, at a fixed cadence
+
+Production version of examples/linkedin_poster.py (what the n8n workflow
+does). The OAuth token and the author URN are cached in
+LINKEDIN_TOKEN_PATH, so /v2/me is called once per token rather than once
+per run. The token is refreshed before `expires_at` while a refresh token
+is available. Every LinkedIn and Notion call goes through a keep-alive
+session and is retried on 429/5xx, honoring Retry-After. The time of the
+last post is kept in state.db, so the cadence holds across one-shot runs.
+
+LINKEDIN_API_URL, LINKEDIN_OAUTH_URL and NOTION_API_URL can point at a
+local fake (benchmarks/fake_services.py).
+"""
+import json
+import logging
+import os
+import random
+import secrets
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from urllib.parse import urlencode
+
+import requests
+
+from notion_reader import NotionReader, status_filter
+from notion_writer import NOTION_API_URL, create_notion_session, retry_after_seconds
+
+logger = logging.getLogger(__name__)
+
+LINKEDIN_API_URL = os.getenv('LINKEDIN_API_URL', 'https://api.linkedin.com').rstrip('/')
+LINKEDIN_OAUTH_URL = os.getenv('LINKEDIN_OAUTH_URL', 'https://www.linkedin.com/oauth/v2').rstrip('/')
+LINKEDIN_CLIENT_ID = os.getenv('LINKEDIN_CLIENT_ID')
+LINKEDIN_CLIENT_SECRET = os.getenv('LINKEDIN_CLIENT_SECRET')
+LINKEDIN_REDIRECT_URI = os.getenv('LINKEDIN_REDIRECT_URI')
+LINKEDIN_TOKEN_PATH = os.getenv('LINKEDIN_TOKEN_PATH', 'linkedin_tokens.json')
+# Token inicial sem arquivo (ex.: secret do GitHub); o arquivo passa a valer depois do primeiro refresh
+LINKEDIN_ACCESS_TOKEN = os.getenv('LINKEDIN_ACCESS_TOKEN')
+LINKEDIN_REFRESH_TOKEN = os.getenv('LINKEDIN_REFRESH_TOKEN')
+# Autor fixo (ex.: urn:li:organization:123); vazio = perfil dono do token
+LINKEDIN_AUTHOR_URN = os.getenv('LINKEDIN_AUTHOR_URN', '')
+LINKEDIN_REFRESH_DAYS = float(os.getenv('LINKEDIN_REFRESH_DAYS', '7'))
+LINKEDIN_PUBLISH = os.getenv('LINKEDIN_PUBLISH', 'off').lower() in ('1', 'on', 'true', 'yes')
+LINKEDIN_PUBLISH_INTERVAL = float(os.getenv('LINKEDIN_PUBLISH_INTERVAL', '14400'))
+LINKEDIN_POSTS_PER_RUN = int(os.getenv('LINKEDIN_POSTS_PER_RUN', '1'))
+# Fila vazia ou LinkedIn indisponível: o daemon olha de novo depois disso
+LINKEDIN_QUEUE_POLL = float(os.getenv('LINKEDIN_QUEUE_POLL', '300'))
+LINKEDIN_MAX_RETRIES = int(os.getenv('LINKEDIN_MAX_RETRIES', '5'))
+LINKEDIN_TIMEOUT = float(os.getenv('LINKEDIN_TIMEOUT', '30'))
+LINKEDIN_SCOPES = 'r_liteprofile w_member_social'
+
+# Mesmo banco em que o extrator grava (SOURCE_DATABASE_ID em sec_feed_extract.py)
+NOTION_DATABASE_ID = os.getenv('NOTION_DATABASE_ID', '2027677d888a807ba4c4c2496f90a340')
+# Fluxo do flow_status: NOT STARTED → START → DONE LINKEDIN (ou ERROR)
+STATUS_QUEUED = os.getenv('LINKEDIN_QUEUE_STATUS', 'START')
+STATUS_DONE = 'DONE LINKEDIN'
+STATUS_ERROR = 'ERROR'
+LAST_PUBLISHED_META = 'linkedin_last_published'
+# linkedin_post:<page id> -> id do post, para nunca publicar de novo uma página cujo PATCH falhou
+POST_META = 'linkedin_post:{}'
+
+
+class PublishError(Exception):
+    """Failed LinkedIn or Notion call; `retryable` is False for errors a retry cannot fix (4xx)"""
+
+    def __init__(self, message, status_code=None, retryable=True):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retryable = retryable
+
+
+class AuthError(PublishError):
+    """Missing, expired or rejected credentials (401/403): no page is at fault, so none is marked ERROR"""
+
+    def __init__(self, message, status_code=None):
+        super().__init__(message, status_code, retryable=False)
+
+
+def send_with_retries(session, method, url, max_retries=LINKEDIN_MAX_RETRIES, on_unauthorized=None, **kwargs):
+    """Send a request, retrying 429/5xx and connection errors; returns the successful response.
+
+    `on_unauthorized()` is called once on a 401 (token refresh) and the
+    request is sent again with the headers it returns. A 401 after that,
+    or a 403, raises AuthError.
+    """
+    attempt = 0
+    refreshed = False
+    while True:
+        try:
+            response = session.request(method, url, timeout=LINKEDIN_TIMEOUT, **kwargs)
+        except requests.RequestException as e:
+            status, error, delay = None, f"{e.__class__.__name__}: {e}", None
+        else:
+            if response.status_code < 400:
+                return response
+            status = response.status_code
+            error = f"{status} from {url}: {response.text[:200]}"
+            if status == 401 and on_unauthorized and not refreshed:
+                refreshed = True
+                kwargs['headers'] = dict(kwargs.get('headers') or {}, **on_unauthorized())
+                continue
+            if status in (401, 403):
+                raise AuthError(error, status)
+            if status != 429 and status < 500:
+                raise PublishError(error, status, retryable=False)
+            delay = retry_after_seconds(response)
+        if attempt >= max_retries:
+            raise PublishError(error, status)
+        delay = delay if delay is not None else random.uniform(0, min(30, 2 ** attempt))
+        logger.warning(f"{method} {url} failed ({status or error}), retrying in {delay:.1f}s "
+                       f"(attempt {attempt + 1}/{max_retries})")
+        time.sleep(delay)
+        attempt += 1
+
+
+class TokenStore:
+    """OAuth token, expiry and author URN, kept in memory and written back only when they change"""
+
+    def __init__(self, path=LINKEDIN_TOKEN_PATH):
+        self.path = Path(path)
+        self.tokens = self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            if LINKEDIN_ACCESS_TOKEN:
+                # Sem data de expiração conhecida: vale até a API responder 401
+                tokens = {'access_token': LINKEDIN_ACCESS_TOKEN, 'refresh_token': LINKEDIN_REFRESH_TOKEN}
+                return {key: value for key, value in tokens.items() if value}
+            return {}
+
+    def save(self):
+        tmp = self.path.with_suffix('.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(self.tokens, f, indent=2)
+        os.replace(tmp, self.path)
+
+    def update(self, token_data):
+        """Store an /accessToken answer (authorization code or refresh)"""
+        now = datetime.now()
+        self.tokens['access_token'] = token_data['access_token']
+        self.tokens['expires_at'] = (now + timedelta(seconds=token_data['expires_in'])).isoformat()
+        self.tokens['created_at'] = now.isoformat()
+        if token_data.get('refresh_token'):
+            self.tokens['refresh_token'] = token_data['refresh_token']
+            if token_data.get('refresh_token_expires_in'):
+                self.tokens['refresh_token_expires_at'] = (
+                    now + timedelta(seconds=token_data['refresh_token_expires_in'])).isoformat()
+        self.save()
+
+    def expires_at(self):
+        value = self.tokens.get('expires_at')
+        return datetime.fromisoformat(value) if value else None
+
+
+class LinkedInClient:
+    """ugcPosts client with a cached token and author URN"""
+
+    def __init__(self, tokens=None, session=None, api_url=LINKEDIN_API_URL, oauth_url=LINKEDIN_OAUTH_URL,
+                 client_id=LINKEDIN_CLIENT_ID, client_secret=LINKEDIN_CLIENT_SECRET,
+                 redirect_uri=LINKEDIN_REDIRECT_URI, author_urn=LINKEDIN_AUTHOR_URN,
+                 refresh_margin=timedelta(days=LINKEDIN_REFRESH_DAYS)):
+        self.tokens = tokens or TokenStore()
+        self.session = session or requests.Session()
+        self.api_url = api_url
+        self.oauth_url = oauth_url
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.redirect_uri = redirect_uri
+        self.fixed_author = author_urn
+        self.refresh_margin = refresh_margin
+
+    # --- OAuth ---
+
+    def authorization_url(self):
+        state = secrets.token_urlsafe(32)
+        query = urlencode({'response_type': 'code', 'client_id': self.client_id, 'redirect_uri': self.redirect_uri,
+                           'state': state, 'scope': LINKEDIN_SCOPES})
+        return f"{self.oauth_url}/authorization?{query}", state
+
+    def _token_request(self, data):
+        data = dict(data, client_id=self.client_id, client_secret=self.client_secret)
+        try:
+            response = send_with_retries(self.session, 'POST', f"{self.oauth_url}/accessToken", data=data)
+        except PublishError as e:
+            if e.retryable:
+                raise
+            # Código ou refresh token recusado (400 invalid_grant): credencial, não página
+            raise AuthError(f"LinkedIn token request rejected: {e}", e.status_code) from e
+        self.tokens.update(response.json())
+        return self.tokens.tokens['access_token']
+
+    def exchange_code(self, code):
+        """Authorization code -> access token (saved to LINKEDIN_TOKEN_PATH)"""
+        self.tokens.tokens.pop('profile_urn', None)
+        return self._token_request({'grant_type': 'authorization_code', 'code': code,
+                                    'redirect_uri': self.redirect_uri})
+
+    def refresh(self):
+        refresh_token = self.tokens.tokens.get('refresh_token')
+        if not refresh_token:
+            raise AuthError("LinkedIn token expired and no refresh token is available; "
+                            "run sec-feed-extract.py --linkedin-auth")
+        logger.info("Refreshing the LinkedIn access token")
+        return self._token_request({'grant_type': 'refresh_token', 'refresh_token': refresh_token})
+
+    def access_token(self):
+        """Cached token, refreshed ahead of `expires_at` when a refresh token is available"""
+        if not self.tokens.tokens.get('access_token'):
+            raise AuthError("No LinkedIn token: run sec-feed-extract.py --linkedin-auth "
+                            "or set LINKEDIN_ACCESS_TOKEN")
+        expires_at = self.tokens.expires_at()
+        if expires_at:
+            remaining = expires_at - datetime.now()
+            if remaining <= self.refresh_margin and self.tokens.tokens.get('refresh_token'):
+                return self.refresh()
+            if remaining <= timedelta(0):
+                raise AuthError("LinkedIn token expired; run sec-feed-extract.py --linkedin-auth")
+        return self.tokens.tokens['access_token']
+
+    def _headers(self, token=None):
+        return {"Authorization": f"Bearer {token or self.access_token()}", "X-Restli-Protocol-Version": "2.0.0"}
+
+    def _send(self, method, path, **kwargs):
+        return send_with_retries(self.session, method, f"{self.api_url}{path}", headers=self._headers(),
+                                 on_unauthorized=lambda: self._headers(self.refresh()), **kwargs)
+
+    # --- publicação ---
+
+    def author_urn(self):
+        """urn:li:person:<id> of the token owner, looked up once per token"""
+        if self.fixed_author:
+            return self.fixed_author
+        urn = self.tokens.tokens.get('profile_urn')
+        if not urn:
+            try:
+                profile = self._send('GET', '/v2/me').json()
+            except PublishError as e:
+                if e.retryable or isinstance(e, AuthError):
+                    raise
+                # Sem r_liteprofile (403) ou token inválido: defina LINKEDIN_AUTHOR_URN ou refaça o --linkedin-auth
+                raise AuthError(f"Unable to look up the LinkedIn author: {e}", e.status_code) from e
+            urn = f"urn:li:person:{profile['id']}"
+            self.tokens.tokens['profile_urn'] = urn
+            self.tokens.save()
+        return urn
+
+    def publish(self, text):
+        """Create a public text post; returns its id"""
+        payload = {
+            "author": self.author_urn(),
+            "lifecycleState": "PUBLISHED",
+            "specificContent": {
+                "com.linkedin.ugc.ShareContent": {
+                    "shareCommentary": {"text": text},
+                    "shareMediaCategory": "NONE"
+                }
+            },
+            "visibility": {"com.linkedin.ugc.MemberNetworkVisibility": "PUBLIC"}
+        }
+        response = self._send('POST', '/v2/ugcPosts', json=payload)
+        return response.headers.get('x-restli-id') or (response.json() if response.content else {}).get('id')
+
+    def close(self):
+        self.session.close()
+
+
+def page_text(page):
+    """Post text of a Notion page: its Content rich text (post + "Read more" link)"""
+    rich_text = page.get('properties', {}).get('Content', {}).get('rich_text', [])
+    return ''.join(item.get('plain_text') or item.get('text', {}).get('content', '') for item in rich_text).strip()
+
+
+def page_title(page):
+    title = page.get('properties', {}).get('Edition', {}).get('title', [])
+    return ''.join(item.get('plain_text') or item.get('text', {}).get('content', '') for item in title) or page['id']
+
+
+class PublishQueue:
+    """Notion pages with flow_status = START, published oldest first, at most one per `interval`"""
+
+    def __init__(self, client, store, notion_token, interval=LINKEDIN_PUBLISH_INTERVAL, poll=LINKEDIN_QUEUE_POLL,
+                 database_id=NOTION_DATABASE_ID, notion_url=NOTION_API_URL, notion_session=None):
+        self.client = client
+        self.store = store
+        self.interval = interval
+        self.poll = poll
+        self.idle_until = 0.0
+        self.database_id = database_id
+        self.notion_url = notion_url
+        self.notion = notion_session or create_notion_session(notion_token, 1)
+        self.reader = NotionReader(notion_token, database_id, base_url=notion_url, rps=0,
+                                   max_retries=LINKEDIN_MAX_RETRIES, session=self.notion)
+        self.published = 0
+        self.failed = 0
+
+    def pending(self, limit=10):
+        sorts = [{'property': 'Created time', 'direction': 'ascending'}]
+        return list(self.reader.query(status_filter(STATUS_QUEUED), sorts, limit=limit))
+
+    def set_status(self, page, status):
+        """Move a page to another flow_status; False when Notion could not be updated"""
+        payload = {'properties': {'flow_status': {'multi_select': [{'name': status}]}}}
+        try:
+            send_with_retries(self.notion, 'PATCH', f"{self.notion_url}/pages/{page['id']}", json=payload)
+        except PublishError as e:
+            logger.error(f"Unable to set flow_status of {page_title(page)!r} to {status}: {e}")
+            return False
+        return True
+
+    def seconds_until_due(self, now=None):
+        last = float(self.store.get_meta(LAST_PUBLISHED_META) or 0)
+        return max(0.0, last + self.interval - (now or time.time()))
+
+    def seconds_until_next_pass(self, now=None):
+        """Cadence, or the poll delay after a pass that published nothing"""
+        now = now or time.time()
+        return max(self.seconds_until_due(now), self.idle_until - now)
+
+    def publish_due(self, max_posts=LINKEDIN_POSTS_PER_RUN):
+        """Publish up to `max_posts` queued pages if the cadence allows; returns how many went out"""
+        if self.seconds_until_due() > 0:
+            logger.info(f"Next LinkedIn post due in {self.seconds_until_due() / 60:.0f} min")
+            return 0
+        count = 0
+        for page in self.pending(limit=max_posts):
+            if count and self.seconds_until_due() > 0:
+                break
+            title = page_title(page)
+            post_id = self.store.get_meta(POST_META.format(page['id']))
+            if post_id:
+                # Publicada numa passada anterior, mas o Notion não foi atualizado
+                self.set_status(page, STATUS_DONE)
+                continue
+            text = page_text(page)
+            try:
+                if not text:
+                    raise PublishError("Notion page has no Content", retryable=False)
+                post_id = self.client.publish(text)
+            except AuthError as e:
+                # Nenhuma página tem culpa: a passada para e todas continuam em START
+                logger.error(f"LinkedIn credentials rejected, stopping until they are fixed: {e}")
+                break
+            except PublishError as e:
+                self.failed += 1
+                logger.error(f"Failed to publish {title!r} on LinkedIn: {e}")
+                if e.retryable:
+                    # Fica como START; a próxima passada tenta de novo
+                    break
+                # 4xx específico da página (conteúdo recusado, sem Content)
+                self.set_status(page, STATUS_ERROR)
+                continue
+            # Registrado antes do PATCH: se o Notion falhar, a página não é publicada de novo
+            self.store.set_meta(POST_META.format(page['id']), post_id or 'published')
+            self.store.set_meta(LAST_PUBLISHED_META, str(time.time()))
+            self.published += 1
+            count += 1
+            logger.info(f"Published on LinkedIn: {title} ({post_id})")
+            self.set_status(page, STATUS_DONE)
+        if not count:
+            self.idle_until = time.time() + self.poll
+        return count
+
+    def close(self):
+        self.notion.close()
+        self.client.close()
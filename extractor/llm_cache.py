@@ -0,0 +1,107 @@
+"""Content-addressed SQLite cache of LLM outputs for sec-feed-extract.py"""
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# Configuração do cache (LLM_CACHE=off desativa)
+LLM_CACHE_ENABLED = os.getenv('LLM_CACHE', 'on').lower() not in ('0', 'off', 'false', 'no')
+LLM_CACHE_PATH = os.getenv('LLM_CACHE_PATH', 'cache/llm_cache.sqlite')
+LLM_CACHE_MAX_MB = float(os.getenv('LLM_CACHE_MAX_MB', '64'))
+LLM_CACHE_MAX_AGE_DAYS = float(os.getenv('LLM_CACHE_MAX_AGE_DAYS', '30'))
+
+
+def cache_key(prompt, model, params, title, description, body=None):
+    """sha256 over everything that determines the model output"""
+    # Sem texto da página a chave continua a mesma de antes do estágio de enriquecimento
+    parts = [prompt, model, params, title, description] + ([body] if body else [])
+    material = json.dumps(parts, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+class LLMCache:
+    """Disk-backed generation cache with age and size based eviction"""
+
+    def __init__(self, path=LLM_CACHE_PATH, max_mb=LLM_CACHE_MAX_MB, max_age_days=LLM_CACHE_MAX_AGE_DAYS):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.max_age = max_age_days * 86400
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        self.tokens_saved = 0
+        self._lock = threading.Lock()
+        # Os workers de geração compartilham a conexão, protegida pelo lock; shards na mesma máquina
+        # compartilham o arquivo: WAL, e até 30 s de espera por um lock em vez de "database is locked"
+        self.conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                content TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                tokens INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            )""")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS llm_cache_last_used ON llm_cache(last_used)")
+        self.conn.commit()
+
+    def get(self, *keys):
+        """Return the cached content of the first of `keys` found, or None on a miss"""
+        with self._lock:
+            for key in keys:
+                row = self.conn.execute("SELECT content, size, tokens FROM llm_cache WHERE key = ?",
+                                        (key,)).fetchone()
+                if row is not None:
+                    break
+            else:
+                self.misses += 1
+                return None
+            self.conn.execute("UPDATE llm_cache SET last_used = ? WHERE key = ?", (time.time(), key))
+            self.conn.commit()
+            self.hits += 1
+            self.bytes_saved += row[1]
+            self.tokens_saved += row[2]
+            return row[0]
+
+    def put(self, key, model, content, tokens=0):
+        now = time.time()
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, model, content, size, tokens, created_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, model, content, len(content.encode('utf-8')), tokens or 0, now, now))
+            self.conn.commit()
+
+    def evict(self):
+        """Drop entries older than max age, then least recently used ones above max size"""
+        with self._lock:
+            removed = self.conn.execute("DELETE FROM llm_cache WHERE created_at < ?",
+                                        (time.time() - self.max_age,)).rowcount
+            total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()[0]
+            if total > self.max_bytes:
+                for key, size in self.conn.execute(
+                        "SELECT key, size FROM llm_cache ORDER BY last_used").fetchall():
+                    if total <= self.max_bytes:
+                        break
+                    self.conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                    total -= size
+                    removed += 1
+            self.conn.commit()
+        if removed:
+            logger.info(f"LLM cache: evicted {removed} entries")
+
+    def close(self):
+        try:
+            self.evict()
+        finally:
+            self.conn.close()
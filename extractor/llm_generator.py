@@ -0,0 +1,406 @@
+"""Concurrent, rate-limited LLM generation stage for sec-feed-extract.py (backends in llm_providers)"""
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from llm_cache import LLM_CACHE_ENABLED, LLMCache, cache_key
+from llm_providers import GROQ_FALLBACK_MODEL, GROQ_MODEL, provider_from_env
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Parâmetros de geração
+SAMPLING_PARAMS = {'temperature': 0.5, 'max_tokens': 500, 'top_p': 0.9}
+
+# Limites configuráveis via .env (0 desativa o limite de tokens)
+GROQ_RPM = float(os.getenv('GROQ_RPM', '30'))
+GROQ_TPM = float(os.getenv('GROQ_TPM', '0'))
+GENERATION_WORKERS = int(os.getenv('GENERATION_WORKERS', '4'))
+GENERATION_MAX_RETRIES = int(os.getenv('GENERATION_MAX_RETRIES', '6'))
+BACKOFF_BASE = float(os.getenv('GENERATION_BACKOFF_BASE', '2'))
+BACKOFF_MAX = float(os.getenv('GENERATION_BACKOFF_MAX', '60'))
+# Artigos por requisição (1 = uma requisição por artigo, como antes)
+GENERATION_BATCH_SIZE = int(os.getenv('GENERATION_BATCH_SIZE', '1'))
+
+# Acrescentado ao prompt no modo em lote: a resposta vira JSON, um item por artigo
+BATCH_INSTRUCTIONS = """
+
+BATCH MODE: the user message contains several articles, each introduced by a line "### Article <id>". \
+Write one LinkedIn post per article following every rule above, but ignore the POST:/HASHTAGS: format \
+and reply with a single JSON object instead:
+{"posts": [{"id": <article id>, "post": "<LinkedIn post>", "hashtags": ["#Tag1", "#Tag2", "#Tag3"]}]}
+Include exactly one entry per article, in the same order. Output only the JSON object."""
+BATCH_CODE_FENCE = re.compile(r'^```(?:json)?\s*|\s*```$')
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at `per_minute` tokens per minute"""
+
+    def __init__(self, per_minute, capacity=None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity or per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, amount=1):
+        """Block until `amount` tokens are available and take them"""
+        amount = min(amount, self.capacity)
+        while True:
+            with self._lock:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                wait = (amount - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def adjust(self, delta):
+        """Charge (positive) or refund (negative) tokens once the real cost is known"""
+        with self._lock:
+            self._refill()
+            self.tokens = min(self.capacity, self.tokens - delta)
+
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute budget shared by all workers"""
+
+    def __init__(self, rpm=GROQ_RPM, tpm=GROQ_TPM):
+        self.requests = TokenBucket(rpm) if rpm > 0 else None
+        self.tokens = TokenBucket(tpm) if tpm > 0 else None
+        self._lock = threading.Lock()
+        self.blocked_until = 0.0
+
+    def pause(self, seconds):
+        """Stop every worker for `seconds` (used when the API sends Retry-After)"""
+        with self._lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+    def acquire(self, estimated_tokens):
+        while True:
+            with self._lock:
+                wait = self.blocked_until - time.monotonic()
+            if wait <= 0:
+                break
+            time.sleep(wait)
+        if self.requests:
+            self.requests.acquire(1)
+        if self.tokens:
+            self.tokens.acquire(estimated_tokens)
+
+    def record_usage(self, estimated_tokens, actual_tokens):
+        if self.tokens and actual_tokens:
+            self.tokens.adjust(actual_tokens - estimated_tokens)
+
+
+class GenerationJob:
+    """One article waiting for (or done with) LLM generation"""
+
+    def __init__(self, RssItem, article, DateActivity):
+        self.RssItem = RssItem
+        self.article = article
+        # Texto principal da página do artigo (ENRICH=on), além do resumo do feed
+        self.body = None
+        self.DateActivity = DateActivity
+        self.content = None
+        self.error = None
+        self.model = None
+        # Respondido pelo modelo ou provedor reserva: não vai para o cache
+        self.fallback = False
+        self.attempts = 0
+        self.tokens = 0
+        self.cached = False
+        self.article_id = None
+        self.triage_score = None
+
+    @property
+    def title(self):
+        return self.article.title
+
+    @property
+    def link(self):
+        return self.article.link
+
+    @property
+    def description(self):
+        return self.article.summary
+
+
+def status_code_of(error):
+    return getattr(error, 'status_code', None)
+
+
+def retry_after_of(error):
+    """Seconds from the Retry-After header of a ProviderError, if any"""
+    return getattr(error, 'retry_after', None)
+
+
+def is_retryable(error):
+    # Os backends classificam o erro (429/5xx/timeout) em ProviderError.retryable
+    return getattr(error, 'retryable', False)
+
+
+def backoff_delay(attempt):
+    """Exponential backoff with full jitter"""
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)))
+
+
+def estimate_tokens(*texts, max_tokens=SAMPLING_PARAMS['max_tokens']):
+    """Rough input token count (~4 chars per token) plus the completion budget"""
+    return sum(len(text) for text in texts) // 4 + max_tokens
+
+
+def user_content_of(job):
+    if job.body:
+        return f"Title: {job.title}\nDescription: {job.description}\nArticle: {job.body}"
+    return f"Title: {job.title}\nDescription: {job.description}"
+
+
+def batch_content_of(jobs):
+    return "\n\n".join(f"### Article {i}\n{user_content_of(job)}" for i, job in enumerate(jobs, 1))
+
+
+def batch_params(size):
+    """Sampling params for a batch: the completion budget grows with the number of articles"""
+    return dict(SAMPLING_PARAMS, max_tokens=SAMPLING_PARAMS['max_tokens'] * size,
+                response_format={'type': 'json_object'})
+
+
+def parse_batch(content, size):
+    """Batch JSON answer -> {article id: "POST:...HASHTAGS:..." text}; raises ValueError if it is not JSON"""
+    data = json.loads(BATCH_CODE_FENCE.sub('', (content or '').strip()))
+    items = data.get('posts') if isinstance(data, dict) else data
+    if not isinstance(items, list):
+        raise ValueError("batch answer has no 'posts' list")
+    posts = {}
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        try:
+            article = int(item.get('id'))
+        except (TypeError, ValueError):
+            continue
+        post = item.get('post')
+        if not 1 <= article <= size or not isinstance(post, str) or not post.strip():
+            continue
+        hashtags = item.get('hashtags') or []
+        if isinstance(hashtags, str):
+            hashtags = hashtags.replace(',', ' ').split()
+        tags = [str(tag).strip().lstrip('#') for tag in hashtags if str(tag).strip().lstrip('#')]
+        # Mesmo formato da resposta de um artigo só, para o format_post()
+        posts[article] = f"POST:\n{post.strip()}\n\nHASHTAGS:\n[{', '.join('#' + tag for tag in tags)}]"
+    return posts
+
+
+class Generator:
+    """Runs GenerationJobs concurrently against one shared LLM provider"""
+
+    def __init__(self, prompt, provider=None, limiter=None, workers=GENERATION_WORKERS,
+                 max_retries=GENERATION_MAX_RETRIES, cache=None, batch_size=GENERATION_BATCH_SIZE):
+        self.prompt = prompt
+        if cache is None and LLM_CACHE_ENABLED:
+            try:
+                cache = LLMCache()
+            except Exception as e:
+                logger.warning(f"LLM cache unavailable, generating without it: {e}")
+        self.cache = cache
+        # Retries are handled here so Retry-After pauses every worker, not just one
+        self.provider = provider or provider_from_env()
+        # Chave do cache: o modelo que o backend realmente usa
+        self.model = self.provider.model_for(GROQ_MODEL)
+        self.limiter = limiter or RateLimiter()
+        self.workers = max(1, workers)
+        self.max_retries = max_retries
+        self.batch_size = max(1, batch_size)
+        self.batches = 0
+        self.batch_fallbacks = 0
+
+    def _complete(self, messages, model, params, estimated):
+        """One chat completion under the shared limiter"""
+        self.limiter.acquire(estimated)
+        start = time.monotonic()
+        completion = self.provider.complete(messages, model, params)
+        labels = {'model': completion.model, 'provider': self.provider.name}
+        metrics.observe('llm_request_seconds', time.monotonic() - start, **labels)
+        metrics.inc('llm_prompt_tokens_total', completion.prompt_tokens, **labels)
+        metrics.inc('llm_completion_tokens_total', completion.completion_tokens, **labels)
+        metrics.observe('llm_tokens', completion.total_tokens, **labels)
+        self.limiter.record_usage(estimated, completion.total_tokens)
+        return completion
+
+    def _create(self, job, model):
+        user_content = user_content_of(job)
+        estimated = estimate_tokens(self.prompt, user_content)
+        job.attempts += 1
+        completion = self._complete(
+            [{"role": "system", "content": self.prompt}, {"role": "user", "content": user_content}],
+            model, SAMPLING_PARAMS, estimated)
+        job.tokens, job.model = completion.total_tokens, completion.model
+        job.fallback = completion.fallback or model != GROQ_MODEL
+        return completion.content
+
+    def _create_batch(self, jobs, model):
+        system = self.prompt + BATCH_INSTRUCTIONS
+        user_content = batch_content_of(jobs)
+        params = batch_params(len(jobs))
+        estimated = estimate_tokens(system, user_content, max_tokens=params['max_tokens'])
+        for job in jobs:
+            job.attempts += 1
+        completion = self._complete(
+            [{"role": "system", "content": system}, {"role": "user", "content": user_content}],
+            model, params, estimated)
+        return completion.content, completion.total_tokens, completion.model, completion.fallback or model != GROQ_MODEL
+
+    def classify(self, system, user_content, params, model=GROQ_FALLBACK_MODEL):
+        """Short answer from the small model (no retries); returns (content, total tokens)"""
+        estimated = estimate_tokens(system, user_content, max_tokens=params.get('max_tokens', 0))
+        completion = self._complete(
+            [{"role": "system", "content": system}, {"role": "user", "content": user_content}],
+            model, params, estimated)
+        return completion.content, completion.total_tokens
+
+    def _key(self, job, batch=False):
+        """Cache key of the post for `job` from the primary model, alone or in a batch request"""
+        if batch:
+            # Outro prompt e outros parâmetros: um post feito em lote não passa por um de requisição única
+            return cache_key(self.prompt + BATCH_INSTRUCTIONS, self.model, batch_params(self.batch_size),
+                             job.title, job.description, job.body)
+        return cache_key(self.prompt, self.model, SAMPLING_PARAMS, job.title, job.description, job.body)
+
+    def _cached(self, job):
+        if not self.cache:
+            return None
+        keys = [self._key(job)] + ([self._key(job, batch=True)] if self.batch_size > 1 else [])
+        content = self.cache.get(*keys)
+        if content is not None:
+            job.cached = True
+            logger.info("LLM cache hit for '%s'", job.title)
+        return content
+
+    def _store(self, job, content, batch=False):
+        # A chave é a do modelo primário: a resposta do reserva ficaria no lugar da dele
+        if not self.cache or job.fallback:
+            return
+        try:
+            self.cache.put(self._key(job, batch), job.model, content, job.tokens)
+        except Exception as e:
+            logger.warning(f"Unable to store LLM output in cache: {e}")
+
+    def generate(self, job):
+        """Return the post for one job, from the cache when the same request was answered before"""
+        content = self._cached(job)
+        if content is not None:
+            return content
+        content = self._generate(job)
+        self._store(job, content)
+        return content
+
+    def _with_retries(self, create, label):
+        """Call create(model), retrying 429/5xx with backoff and switching to the fallback model on 400"""
+        model = GROQ_MODEL
+        attempt = 0
+        while True:
+            try:
+                return create(model)
+            except Exception as e:
+                metrics.inc('llm_errors_total', status=str(status_code_of(e) or e.__class__.__name__))
+                # Fallback to a lighter, widely available model if decommissioned/400
+                if status_code_of(e) == 400 and model != GROQ_FALLBACK_MODEL:
+                    logger.warning(f"Model {model} rejected the request, falling back to {GROQ_FALLBACK_MODEL}")
+                    model = GROQ_FALLBACK_MODEL
+                    continue
+                if not is_retryable(e) or attempt >= self.max_retries:
+                    raise
+                retry_after = retry_after_of(e)
+                delay = retry_after if retry_after is not None else backoff_delay(attempt)
+                if status_code_of(e) == 429:
+                    self.limiter.pause(delay)
+                logger.warning(f"LLM error {status_code_of(e) or e.__class__.__name__} for "
+                               f"{label}, retrying in {delay:.1f}s "
+                               f"(attempt {attempt + 1}/{self.max_retries})")
+                time.sleep(delay)
+                attempt += 1
+
+    def _generate(self, job):
+        """Call the API for one job, retrying 429/5xx with backoff"""
+        return self._with_retries(lambda model: self._create(job, model), f"'{job.title}'")
+
+    def _run_job(self, job, use_cache=True):
+        try:
+            if use_cache:
+                job.content = self.generate(job)
+            else:
+                job.content = self._generate(job)
+                self._store(job, job.content)
+        except Exception as e:
+            job.error = e
+        return [job], []
+
+    def _run_batch(self, jobs):
+        """One request for several jobs; returns (finished jobs, jobs to retry one request each)"""
+        try:
+            content, tokens, model, fallback = self._with_retries(
+                lambda model: self._create_batch(jobs, model), f"batch of {len(jobs)} articles")
+            posts = parse_batch(content, len(jobs))
+        except Exception as e:
+            logger.warning(f"Batch of {len(jobs)} articles failed ({e}), falling back to one request per article")
+            return [], jobs
+        self.batches += 1
+        metrics.observe('llm_batch_size', len(jobs))
+        done, retry = [], []
+        for i, job in enumerate(jobs, 1):
+            if i not in posts:
+                retry.append(job)
+                continue
+            # O custo do lote é dividido igualmente entre os artigos
+            job.content, job.model, job.tokens, job.fallback = posts[i], model, tokens // len(jobs), fallback
+            self._store(job, job.content, batch=True)
+            done.append(job)
+        if retry:
+            logger.warning(f"Batch answer missed {len(retry)} of {len(jobs)} articles, generating them one by one")
+        return done, retry
+
+    def run(self, jobs):
+        """Dispatch all jobs concurrently and yield them as they finish"""
+        jobs = list(jobs)
+        if not jobs:
+            return
+        start = time.monotonic()
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(jobs))) as pool:
+            if self.batch_size > 1:
+                misses = []
+                for job in jobs:
+                    job.content = self._cached(job)
+                    if job.content is not None:
+                        yield job
+                    else:
+                        misses.append(job)
+                pending = {pool.submit(self._run_batch, misses[i:i + self.batch_size])
+                           for i in range(0, len(misses), self.batch_size)}
+            else:
+                pending = {pool.submit(self._run_job, job) for job in jobs}
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    finished, retry = future.result()
+                    yield from finished
+                    if retry:
+                        self.batch_fallbacks += len(retry)
+                        metrics.inc('llm_batch_fallbacks_total', len(retry))
+                    pending.update(pool.submit(self._run_job, job, False) for job in retry)
+        logger.info(f"Generation phase: {len(jobs)} articles in {time.monotonic() - start:.2f}s")
+
+    def close(self):
+        self.provider.close()
+        if self.cache:
+            self.cache.close()
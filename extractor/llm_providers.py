@@ -0,0 +1,201 @@
+"""LLM backends for llm_generator: the Groq SDK or any OpenAI-compatible HTTP server
+
+LLM_PROVIDER picks the backend: `groq` (default) or `openai`, an
+OpenAI-compatible /chat/completions endpoint such as llama.cpp's server,
+vLLM, Ollama or the benchmark stub. A comma-separated list
+(`groq,openai`) fails over to the next backend when one is unavailable
+(429, 5xx, timeouts, connection errors).
+
+Every backend raises ProviderError, so the generator's retry policy does
+not depend on any SDK's exception classes.
+"""
+import logging
+import os
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+# Modelos da Groq; o gerador usa estes nomes e cada backend os traduz
+GROQ_MODEL = "llama-3.1-70b-versatile"
+GROQ_FALLBACK_MODEL = "llama-3.1-8b-instant"
+
+LLM_PROVIDER = os.getenv('LLM_PROVIDER', 'groq').lower()
+# Backend compatível com OpenAI (servidor local ou stub)
+LLM_BASE_URL = os.getenv('LLM_BASE_URL', 'http://127.0.0.1:8080/v1')
+LLM_API_KEY = os.getenv('LLM_API_KEY', '')
+LLM_TIMEOUT = float(os.getenv('LLM_TIMEOUT', '120'))
+# Nomes dos modelos no servidor local; vazio = mesmos nomes da Groq
+LLM_MODEL = os.getenv('LLM_MODEL', '')
+LLM_FALLBACK_MODEL = os.getenv('LLM_FALLBACK_MODEL', '')
+
+
+class ProviderError(Exception):
+    """API failure with what the retry policy needs: status code, Retry-After, retryable"""
+
+    def __init__(self, message, status_code=None, retry_after=None, retryable=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+        # 429 e 5xx podem ser repetidos; sem status (timeout, conexão) decide quem levantou o erro
+        self.retryable = retryable if retryable is not None else is_retryable_status(status_code)
+
+
+def is_retryable_status(code):
+    return code is not None and (code == 429 or code >= 500)
+
+
+def parse_retry_after(value):
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class Completion:
+    """Text and token usage of one chat completion"""
+
+    def __init__(self, content, model, prompt_tokens=0, completion_tokens=0):
+        self.content = content
+        self.model = model
+        self.prompt_tokens = prompt_tokens or 0
+        self.completion_tokens = completion_tokens or 0
+        # True quando o FailoverProvider precisou de um backend que não é o primeiro
+        self.fallback = False
+
+    @property
+    def total_tokens(self):
+        return self.prompt_tokens + self.completion_tokens
+
+
+class GroqProvider:
+    """Groq SDK (GROQ_API_KEY, GROQ_BASE_URL)"""
+
+    name = 'groq'
+
+    def __init__(self, client=None):
+        if client is None:
+            # Importado só aqui: o SDK (httpx, pydantic) pesa mais que o resto da partida inteira
+            try:
+                from groq import Groq
+            except ImportError:  # opcional com LLM_PROVIDER=openai
+                raise RuntimeError("LLM_PROVIDER=groq needs the groq package (pip install groq)") from None
+            # Retries are handled by the generator so Retry-After pauses every worker
+            client = Groq(api_key=os.getenv('GROQ_API_KEY'), max_retries=0)
+        self.client = client
+
+    def model_for(self, model):
+        return model
+
+    def complete(self, messages, model, params):
+        try:
+            response = self.client.chat.completions.create(messages=messages, model=model, **params)
+        except Exception as e:
+            raise groq_error(e) from e
+        usage = getattr(response, 'usage', None)
+        return Completion(response.choices[0].message.content, model,
+                          getattr(usage, 'prompt_tokens', 0), getattr(usage, 'completion_tokens', 0))
+
+    def close(self):
+        close = getattr(self.client, 'close', None)
+        if close:
+            close()
+
+
+def groq_error(error):
+    status = getattr(error, 'status_code', None)
+    headers = getattr(getattr(error, 'response', None), 'headers', None) or {}
+    # Timeouts e erros de conexão não trazem status
+    retryable = None if status is not None else error.__class__.__name__ in ('APIConnectionError', 'APITimeoutError')
+    return ProviderError(str(error), status, parse_retry_after(headers.get('retry-after')), retryable)
+
+
+class OpenAICompatibleProvider:
+    """Plain HTTP POST to <LLM_BASE_URL>/chat/completions over a pooled session"""
+
+    name = 'openai'
+
+    def __init__(self, base_url=LLM_BASE_URL, api_key=LLM_API_KEY, timeout=LLM_TIMEOUT, models=None):
+        self.url = base_url.rstrip('/') + '/chat/completions'
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers['Content-Type'] = 'application/json'
+        if api_key:
+            self.session.headers['Authorization'] = f"Bearer {api_key}"
+        if models is None:
+            models = {GROQ_MODEL: LLM_MODEL, GROQ_FALLBACK_MODEL: LLM_FALLBACK_MODEL or LLM_MODEL}
+        self.models = {name: local for name, local in models.items() if local}
+
+    def model_for(self, model):
+        return self.models.get(model, model)
+
+    def complete(self, messages, model, params):
+        model = self.model_for(model)
+        try:
+            response = self.session.post(self.url, json=dict(params, model=model, messages=messages),
+                                         timeout=self.timeout)
+        except requests.RequestException as e:
+            raise ProviderError(f"{self.url}: {e}", retryable=True) from e
+        if response.status_code >= 400:
+            raise ProviderError(f"{response.status_code} from {self.url}: {response.text[:200]}",
+                                response.status_code, parse_retry_after(response.headers.get('Retry-After')))
+        try:
+            data = response.json()
+            content = data['choices'][0]['message']['content']
+        except (ValueError, KeyError, IndexError, TypeError) as e:
+            raise ProviderError(f"Malformed answer from {self.url}: {e}", retryable=True) from e
+        usage = data.get('usage') or {}
+        return Completion(content, data.get('model') or model,
+                          usage.get('prompt_tokens'), usage.get('completion_tokens'))
+
+    def close(self):
+        self.session.close()
+
+
+class FailoverProvider:
+    """Try each provider in order, moving on when one is unavailable"""
+
+    def __init__(self, providers):
+        self.providers = providers
+        self.name = '+'.join(p.name for p in providers)
+
+    def model_for(self, model):
+        return self.providers[0].model_for(model)
+
+    def complete(self, messages, model, params):
+        for i, provider in enumerate(self.providers):
+            try:
+                completion = provider.complete(messages, model, params)
+            except ProviderError as e:
+                # 400 (modelo/requisição) também falharia no próximo; o gerador trata
+                if not e.retryable or i == len(self.providers) - 1:
+                    raise
+                logger.warning(f"LLM provider {provider.name} unavailable ({e}), "
+                               f"trying {self.providers[i + 1].name}")
+                continue
+            completion.fallback = i > 0
+            return completion
+
+    def close(self):
+        for provider in self.providers:
+            provider.close()
+
+
+PROVIDERS = {
+    'groq': GroqProvider,
+    'openai': OpenAICompatibleProvider,
+}
+
+
+def provider_from_env(names=LLM_PROVIDER):
+    """Build the provider(s) named in LLM_PROVIDER"""
+    providers = []
+    for name in (n.strip() for n in names.split(',')):
+        if not name:
+            continue
+        if name not in PROVIDERS:
+            raise ValueError(f"Unknown LLM_PROVIDER {name!r} (expected one of {', '.join(PROVIDERS)})")
+        providers.append(PROVIDERS[name]())
+    if not providers:
+        raise ValueError("LLM_PROVIDER is empty")
+    return providers[0] if len(providers) == 1 else FailoverProvider(providers)
@@ -0,0 +1,73 @@
+"""Logging setup for sec-feed-extract.py: level from env/CLI, text or JSON lines, size-based rotation"""
+import json
+import logging
+import os
+from datetime import datetime, timezone
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'text')
+LOG_DIR = os.getenv('LOG_DIR', 'logs')
+LOG_FILE_NAME = 'sec_feed.log'
+LOG_MAX_MB = float(os.getenv('LOG_MAX_MB', '10'))
+LOG_BACKUP_COUNT = int(os.getenv('LOG_BACKUP_COUNT', '5'))
+LOG_CONSOLE = os.getenv('LOG_CONSOLE', 'on').lower() not in ('0', 'off', 'false', 'no')
+# httpx/httpcore/urllib3 registram cada requisição; só interessam quando pedidos
+LIBRARY_LOG_LEVEL = os.getenv('LOG_LIBRARY_LEVEL', 'WARNING')
+LIBRARY_LOGGERS = ('httpx', 'httpcore', 'urllib3', 'groq', 'charset_normalizer')
+
+TEXT_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+LOG_LEVELS = ('DEBUG', 'INFO', 'WARNING', 'ERROR')
+LOG_FORMATS = ('text', 'json')
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, thread, msg (+ exc)"""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'thread': record.threadName,
+            'msg': record.getMessage(),
+        }
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+def level_of(name):
+    level = logging.getLevelName(str(name).upper())
+    if not isinstance(level, int):
+        raise ValueError(f"Unknown log level: {name}")
+    return level
+
+
+def setup_logging(level=None, fmt=None, log_dir=None, console=None):
+    """Configure the root logger once per process; returns the log file path"""
+    level = level_of(level or LOG_LEVEL)
+    fmt = (fmt or LOG_FORMAT).lower()
+    if fmt not in LOG_FORMATS:
+        raise ValueError(f"Unknown log format: {fmt} (expected one of {', '.join(LOG_FORMATS)})")
+    formatter = JsonFormatter() if fmt == 'json' else logging.Formatter(TEXT_FORMAT)
+    log_path = Path(log_dir or LOG_DIR) / LOG_FILE_NAME
+    log_path.parent.mkdir(parents=True, exist_ok=True)
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+        handler.close()
+    root.setLevel(level)
+    # Um arquivo só, rotacionado por tamanho, em vez de um arquivo novo por execução
+    handlers = [RotatingFileHandler(log_path, maxBytes=int(LOG_MAX_MB * 1024 * 1024),
+                                    backupCount=LOG_BACKUP_COUNT, encoding='utf-8')]
+    if LOG_CONSOLE if console is None else console:
+        handlers.append(logging.StreamHandler())
+    for handler in handlers:
+        handler.setFormatter(formatter)
+        root.addHandler(handler)
+    for name in LIBRARY_LOGGERS:
+        logging.getLogger(name).setLevel(level_of(LIBRARY_LOG_LEVEL))
+    return log_path
@@ -0,0 +1,208 @@
+"""Run metrics (histograms, counters, gauges) exported as a Prometheus textfile and JSON"""
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+METRICS_ENABLED = os.getenv('METRICS', 'off').lower() in ('1', 'on', 'true', 'yes')
+METRICS_DIR = os.getenv('METRICS_DIR', 'metrics')
+METRICS_PREFIX = 'sec_feed_'
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+BYTES_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216, 67108864)
+TOKEN_BUCKETS = (100, 250, 500, 1000, 2000, 4000, 8000, 16000)
+COUNT_BUCKETS = (1, 2, 4, 8, 16, 32)
+# Histogramas que não medem segundos
+BUCKETS = {
+    'feed_bytes': BYTES_BUCKETS,
+    'llm_tokens': TOKEN_BUCKETS,
+    'llm_batch_size': COUNT_BUCKETS,
+}
+
+
+class Histogram:
+    """Cumulative-bucket histogram (Prometheus semantics) plus min/max"""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                break
+        else:
+            i = len(self.buckets)
+        self.counts[i] += 1
+        self.count += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def quantile(self, q):
+        """Estimate a quantile by linear interpolation inside its bucket"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        lower = 0.0
+        for i, bound in enumerate(self.buckets + (self.max,)):
+            if seen + self.counts[i] >= rank:
+                upper = min(bound, self.max)
+                lower = max(lower, self.min)
+                if self.counts[i] == 0 or upper <= lower:
+                    return upper
+                return lower + (upper - lower) * (rank - seen) / self.counts[i]
+            seen += self.counts[i]
+            lower = bound
+        return self.max
+
+
+def peak_rss_kb():
+    """Process peak resident set size in KB (None where `resource` is unavailable)"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reporta bytes, Linux KB
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(labels, extra=None):
+    items = list(labels) + ([extra] if extra else [])
+    if not items:
+        return ''
+    return '{' + ','.join(f'{k}="{escape_label(v)}"' for k, v in items) + '}'
+
+
+def format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metrics:
+    """Thread-safe registry; every call returns immediately when disabled"""
+
+    def __init__(self, enabled=METRICS_ENABLED):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.histograms = {}
+        self.counters = {}
+        self.gauges = {}
+
+    def observe(self, name, value, **labels):
+        if not self.enabled or value is None:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(BUCKETS.get(name, DURATION_BUCKETS))
+            histogram.observe(value)
+
+    def inc(self, name, value=1, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        if not self.enabled or value is None:
+            return
+        with self._lock:
+            self.gauges[(name, tuple(sorted(labels.items())))] = value
+
+    @contextmanager
+    def stage(self, stage):
+        """Record how long a pipeline stage took as the `stage_seconds{stage=...}` gauge"""
+        if not self.enabled:
+            yield
+            return
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.set('stage_seconds', time.monotonic() - start, stage=stage)
+
+    def prometheus_text(self):
+        lines = []
+        with self._lock:
+            for kind, series in (('counter', self.counters), ('gauge', self.gauges)):
+                for name in sorted({key[0] for key in series}):
+                    lines.append(f"# TYPE {METRICS_PREFIX}{name} {kind}")
+                    for (metric, labels), value in sorted(series.items()):
+                        if metric == name:
+                            lines.append(f"{METRICS_PREFIX}{name}{format_labels(labels)} {format_value(value)}")
+            for name in sorted({key[0] for key in self.histograms}):
+                lines.append(f"# TYPE {METRICS_PREFIX}{name} histogram")
+                for (metric, labels), h in sorted(self.histograms.items()):
+                    if metric != name:
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(h.buckets + (float('inf'),), h.counts):
+                        cumulative += count
+                        lines.append(f"{METRICS_PREFIX}{name}_bucket"
+                                     f"{format_labels(labels, ('le', format_value(bound)))} {cumulative}")
+                    lines.append(f"{METRICS_PREFIX}{name}_sum{format_labels(labels)} {format_value(h.sum)}")
+                    lines.append(f"{METRICS_PREFIX}{name}_count{format_labels(labels)} {h.count}")
+        return '\n'.join(lines) + '\n'
+
+    def summary(self):
+        """JSON-friendly view: counters, gauges and histogram count/sum/min/max/p50/p90/p99"""
+        def series(items, render):
+            out = {}
+            for (name, labels), value in sorted(items):
+                out.setdefault(name, []).append({'labels': dict(labels), **render(value)})
+            return out
+
+        with self._lock:
+            return {
+                'generated_at': datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ'),
+                'counters': series(self.counters.items(), lambda v: {'value': v}),
+                'gauges': series(self.gauges.items(), lambda v: {'value': v}),
+                'histograms': series(self.histograms.items(), lambda h: {
+                    'count': h.count, 'sum': round(h.sum, 6), 'min': h.min, 'max': h.max,
+                    'p50': h.quantile(0.5), 'p90': h.quantile(0.9), 'p99': h.quantile(0.99)}),
+            }
+
+    def write(self, directory=METRICS_DIR, basename='sec_feed'):
+        """Write <basename>.prom (node_exporter textfile collector) and <basename>.json atomically"""
+        if not self.enabled:
+            return []
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        written = []
+        for suffix, content in (('.prom', self.prometheus_text()),
+                                ('.json', json.dumps(self.summary(), indent=2, sort_keys=True))):
+            path = directory / f"{basename}{suffix}"
+            tmp = path.with_suffix(suffix + '.tmp')
+            tmp.write_text(content, encoding='utf-8')
+            os.replace(tmp, path)
+            written.append(path)
+        logger.info(f"Metrics written to {', '.join(str(p) for p in written)}")
+        return written
+
+
+# Registro único do processo, usado por todos os estágios
+metrics = Metrics()
@@ -0,0 +1,288 @@
+"""Paginated reader of the Notion database and an incremental local mirror of it
+
+NotionReader pages through `databases/<id>/query` with `start_cursor`,
+sending the filters (flow_status, Source, date range, last edit) to
+Notion instead of filtering locally. NotionMirror keeps a copy of the
+pages in SQLite: each sync only asks for the pages edited since the last
+one (Notion rounds `last_edited_time` to the minute, so the last minute
+is read again), and a periodic full sync drops the pages that were
+deleted or archived. Status counts, duplicate checks and dashboards read
+the mirror rather than the rate-limited API.
+"""
+import json
+import logging
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import requests
+
+from article_index import canonicalize_url
+from metrics import metrics
+from notion_writer import (NOTION_API_URL, NOTION_MAX_RETRIES, NOTION_RPS, NOTION_TIMEOUT, RequestPacer,
+                           create_notion_session, retry_after_seconds)
+
+logger = logging.getLogger(__name__)
+
+NOTION_MIRROR = os.getenv('NOTION_MIRROR', 'off').lower() in ('1', 'on', 'true', 'yes')
+NOTION_MIRROR_PATH = os.getenv('NOTION_MIRROR_PATH', 'cache/notion_mirror.sqlite')
+NOTION_MIRROR_FULL_SYNC_HOURS = float(os.getenv('NOTION_MIRROR_FULL_SYNC_HOURS', '24'))
+# Máximo aceito pela API em uma página de resultados
+NOTION_PAGE_SIZE = 100
+SYNC_OVERLAP = timedelta(minutes=1)
+NOTION_TIME_FORMAT = '%Y-%m-%dT%H:%M:%S.000Z'
+LINK_PATTERN = re.compile(r'Read more:\s*(\S+)')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    id TEXT PRIMARY KEY,
+    title TEXT,
+    source TEXT,
+    link TEXT,
+    canonical_link TEXT,
+    flow_status TEXT,
+    created TEXT,
+    last_edited TEXT NOT NULL,
+    properties TEXT NOT NULL,
+    synced_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS pages_canonical_link ON pages(canonical_link);
+CREATE INDEX IF NOT EXISTS pages_source ON pages(source);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+class NotionQueryError(Exception):
+    pass
+
+
+# --- filtros da API (https://developers.notion.com/reference/post-database-query-filter) ---
+
+def status_filter(status):
+    return {'property': 'flow_status', 'multi_select': {'contains': status}}
+
+
+def source_filter(source):
+    return {'property': 'Source', 'select': {'equals': source}}
+
+
+def date_filter(on_or_after=None, before=None, prop='Created time'):
+    """Date range on a date property; bounds are ISO dates or timestamps"""
+    conditions = [{'property': prop, 'date': {operator: value}}
+                  for operator, value in (('on_or_after', on_or_after), ('before', before)) if value]
+    return all_of(*conditions)
+
+
+def edited_since(timestamp):
+    return {'timestamp': 'last_edited_time', 'last_edited_time': {'on_or_after': timestamp}}
+
+
+def all_of(*filters):
+    """Join filters with `and`, skipping empty ones (None when nothing is left)"""
+    filters = [f for f in filters if f]
+    if len(filters) > 1:
+        return {'and': filters}
+    return filters[0] if filters else None
+
+
+# --- leitura das propriedades de uma página ---
+
+def plain_text(items):
+    return ''.join(item.get('plain_text') or item.get('text', {}).get('content', '') for item in items or [])
+
+
+def page_record(page):
+    """The columns the mirror keeps for a page"""
+    properties = page.get('properties', {})
+    content = plain_text(properties.get('Content', {}).get('rich_text'))
+    match = LINK_PATTERN.search(content)
+    link = match.group(1) if match else None
+    return {
+        'id': page['id'],
+        'title': plain_text(properties.get('Edition', {}).get('title')),
+        'source': (properties.get('Source', {}).get('select') or {}).get('name'),
+        'link': link,
+        'canonical_link': canonicalize_url(link) if link else None,
+        'flow_status': [option['name'] for option in properties.get('flow_status', {}).get('multi_select', [])],
+        'created': (properties.get('Created time', {}).get('date') or {}).get('start') or page.get('created_time'),
+        'last_edited': page.get('last_edited_time') or page.get('created_time') or '',
+    }
+
+
+class NotionReader:
+    """Database queries through a keep-alive session, paced and retried like the writer"""
+
+    def __init__(self, token, database_id, base_url=NOTION_API_URL, rps=NOTION_RPS,
+                 max_retries=NOTION_MAX_RETRIES, session=None):
+        self.database_id = database_id
+        self.base_url = base_url
+        self.max_retries = max_retries
+        self.session = session or create_notion_session(token, 1)
+        self.pacer = RequestPacer(rps)
+        self.requests = 0
+        self.pages_read = 0
+
+    def _post(self, body):
+        """POST one query, retrying 429/5xx and connection errors; returns the JSON answer"""
+        url = f"{self.base_url}/databases/{self.database_id}/query"
+        attempt = 0
+        while True:
+            self.pacer.wait()
+            start = time.monotonic()
+            self.requests += 1
+            try:
+                response = self.session.post(url, json=body, timeout=NOTION_TIMEOUT)
+            except requests.RequestException as e:
+                metrics.inc('notion_errors_total', status=e.__class__.__name__)
+                status, error, delay = None, f"{e.__class__.__name__}: {e}", None
+            else:
+                metrics.observe('notion_request_seconds', time.monotonic() - start, status=str(response.status_code))
+                if response.status_code == 200:
+                    return response.json()
+                status = response.status_code
+                error = f"{status} - {response.text[:200]}"
+                if status != 429 and status < 500:
+                    raise NotionQueryError(error)
+                delay = retry_after_seconds(response)
+                if status == 429:
+                    self.pacer.pause(delay if delay is not None else 1.0)
+            if attempt >= self.max_retries:
+                raise NotionQueryError(error)
+            delay = delay if delay is not None else random.uniform(0, min(30, 2 ** attempt))
+            logger.warning(f"Notion query error {status or error}, retrying in {delay:.1f}s "
+                           f"(attempt {attempt + 1}/{self.max_retries})")
+            time.sleep(delay)
+            attempt += 1
+
+    def query(self, filter=None, sorts=None, page_size=NOTION_PAGE_SIZE, limit=None):
+        """Yield the matching pages, following `next_cursor` until `limit` pages or the end"""
+        body = {'page_size': min(page_size, limit or page_size, NOTION_PAGE_SIZE)}
+        if filter:
+            body['filter'] = filter
+        if sorts:
+            body['sorts'] = sorts
+        returned = 0
+        while True:
+            answer = self._post(body)
+            for page in answer.get('results', []):
+                self.pages_read += 1
+                yield page
+                returned += 1
+                if limit and returned >= limit:
+                    return
+            if not answer.get('has_more') or not answer.get('next_cursor'):
+                return
+            body['start_cursor'] = answer['next_cursor']
+
+    def close(self):
+        self.session.close()
+
+
+class NotionMirror:
+    """SQLite copy of the database pages, kept up to date by last_edited_time"""
+
+    def __init__(self, path=NOTION_MIRROR_PATH, full_sync_hours=NOTION_MIRROR_FULL_SYNC_HOURS):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.full_sync_seconds = full_sync_hours * 3600
+        self._lock = threading.Lock()
+        # Compartilhado pelos shards na mesma máquina (ver LLMCache)
+        self.conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    def _meta(self, key):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def sync(self, reader, full=False):
+        """Fetch the pages edited since the last sync (all of them on a full sync); returns (updated, removed)"""
+        with self._lock:
+            watermark = self._meta('watermark')
+            last_full = float(self._meta('last_full_sync') or 0)
+        full = full or not watermark or time.time() - last_full >= self.full_sync_seconds
+        condition = None
+        if not full:
+            since = datetime.strptime(watermark[:19], '%Y-%m-%dT%H:%M:%S') - SYNC_OVERLAP
+            condition = edited_since(since.replace(tzinfo=timezone.utc).strftime(NOTION_TIME_FORMAT))
+        sorts = [{'timestamp': 'last_edited_time', 'direction': 'ascending'}]
+        now = time.time()
+        seen = set()
+        newest = watermark or ''
+        rows = []
+        for page in reader.query(condition, sorts):
+            record = page_record(page)
+            seen.add(record['id'])
+            newest = max(newest, record['last_edited'])
+            rows.append((record['id'], record['title'], record['source'], record['link'], record['canonical_link'],
+                         json.dumps(record['flow_status']), record['created'], record['last_edited'],
+                         json.dumps(page.get('properties', {}), ensure_ascii=False), now))
+        with self._lock, self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO pages (id, title, source, link, canonical_link, flow_status, "
+                                  "created, last_edited, properties, synced_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                  rows)
+            removed = 0
+            if full:
+                # Páginas apagadas ou arquivadas não voltam nas consultas: só a sincronização completa as percebe
+                removed = self.conn.execute("DELETE FROM pages WHERE synced_at < ?", (now,)).rowcount
+                self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('last_full_sync', ?)", (str(now),))
+            if newest:
+                self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('watermark', ?)", (newest,))
+        logger.info(f"Notion mirror: {len(rows)} pages updated, {removed} removed "
+                    f"({'full' if full else 'incremental'} sync, {reader.requests} requests)")
+        return len(rows), removed
+
+    def has_link(self, link):
+        """Whether a page for this article (same canonical link) is already in Notion"""
+        if not link:
+            return False
+        with self._lock:
+            return self.conn.execute("SELECT 1 FROM pages WHERE canonical_link = ? LIMIT 1",
+                                     (canonicalize_url(link),)).fetchone() is not None
+
+    def pages(self, status=None, source=None, since=None, until=None, limit=None):
+        """Mirrored pages, newest first, with the same filters the reader pushes to Notion"""
+        query = "SELECT id, title, source, link, flow_status, created, last_edited FROM pages WHERE 1 = 1"
+        params = []
+        if status:
+            query += " AND EXISTS (SELECT 1 FROM json_each(pages.flow_status) WHERE value = ?)"
+            params.append(status)
+        if source:
+            query += " AND source = ?"
+            params.append(source)
+        if since:
+            query += " AND created >= ?"
+            params.append(since)
+        if until:
+            query += " AND created < ?"
+            params.append(until)
+        query += " ORDER BY created DESC"
+        if limit:
+            query += f" LIMIT {int(limit)}"
+        with self._lock:
+            rows = self.conn.execute(query, params).fetchall()
+        keys = ('id', 'title', 'source', 'link', 'flow_status', 'created', 'last_edited')
+        return [dict(zip(keys, row[:4] + (json.loads(row[4]),) + row[5:])) for row in rows]
+
+    def counts_by_status(self):
+        with self._lock:
+            return dict(self.conn.execute(
+                "SELECT COALESCE(s.value, '(none)'), COUNT(*) FROM pages LEFT JOIN json_each(pages.flow_status) s "
+                "GROUP BY 1 ORDER BY 2 DESC"))
+
+    def counts_by_source(self):
+        with self._lock:
+            return dict(self.conn.execute(
+                "SELECT COALESCE(source, '(none)'), COUNT(*) FROM pages GROUP BY 1 ORDER BY 2 DESC"))
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
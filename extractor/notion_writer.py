@@ -0,0 +1,163 @@
+"""Pooled, rate-limited Notion page writer with a durable outbox"""
+import json
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Configuração do writer (NOTION_API_URL permite apontar para um servidor fake)
+NOTION_API_URL = os.getenv('NOTION_API_URL', 'https://api.notion.com/v1').rstrip('/')
+NOTION_VERSION = "2022-02-22"
+NOTION_RPS = float(os.getenv('NOTION_RPS', '3'))
+NOTION_WORKERS = int(os.getenv('NOTION_WORKERS', '3'))
+NOTION_MAX_RETRIES = int(os.getenv('NOTION_MAX_RETRIES', '5'))
+NOTION_TIMEOUT = float(os.getenv('NOTION_TIMEOUT', '30'))
+# Tentativas somadas entre execuções antes de desistir de uma página do outbox
+NOTION_OUTBOX_MAX_ATTEMPTS = int(os.getenv('NOTION_OUTBOX_MAX_ATTEMPTS', '20'))
+
+
+class RequestPacer:
+    """Spaces requests evenly so all workers together stay under `rps`"""
+
+    def __init__(self, rps=NOTION_RPS):
+        self.interval = 1.0 / rps if rps > 0 else 0.0
+        self._lock = threading.Lock()
+        self.next_slot = 0.0
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+    def pause(self, seconds):
+        with self._lock:
+            self.next_slot = max(self.next_slot, time.monotonic() + seconds)
+
+
+class NotionResult:
+    """Outcome of one outbox delivery attempt"""
+
+    def __init__(self, outbox_id, article_id, title, ok, error=None, retryable=False):
+        self.outbox_id = outbox_id
+        self.article_id = article_id
+        self.title = title
+        self.ok = ok
+        self.error = error
+        self.retryable = retryable
+
+
+def create_notion_session(token, pool_size=NOTION_WORKERS):
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=max(1, pool_size))
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers.update({
+        "Authorization": f"Bearer {token}",
+        "Notion-Version": NOTION_VERSION,
+        "Content-Type": "application/json"
+    })
+    return session
+
+
+def retry_after_seconds(response):
+    try:
+        return float(response.headers.get('Retry-After'))
+    except (TypeError, ValueError):
+        return None
+
+
+class NotionWriter:
+    """Writes pages through a keep-alive session, with retries and a durable outbox.
+
+    Every page is stored in the state store outbox before it is sent and only
+    removed once Notion confirms it, so pages that still fail after the
+    in-run retries are sent again by `replay_outbox()` on the next run.
+    """
+
+    def __init__(self, token, store, rps=NOTION_RPS, workers=NOTION_WORKERS,
+                 max_retries=NOTION_MAX_RETRIES, base_url=NOTION_API_URL, session=None):
+        self.store = store
+        self.base_url = base_url
+        self.max_retries = max_retries
+        self.session = session or create_notion_session(token, workers)
+        self.pacer = RequestPacer(rps)
+        self.pool = ThreadPoolExecutor(max_workers=max(1, workers))
+        self.futures = []
+
+    def _post(self, payload):
+        """POST one page, retrying 429/5xx and connection errors; returns (ok, error, retryable)"""
+        attempt = 0
+        while True:
+            self.pacer.wait()
+            start = time.monotonic()
+            try:
+                response = self.session.post(f"{self.base_url}/pages", json=payload, timeout=NOTION_TIMEOUT)
+            except requests.RequestException as e:
+                metrics.inc('notion_errors_total', status=e.__class__.__name__)
+                status, error, delay = None, f"{e.__class__.__name__}: {e}", None
+            else:
+                metrics.observe('notion_request_seconds', time.monotonic() - start, status=str(response.status_code))
+                if response.status_code == 200:
+                    return True, None, False
+                status = response.status_code
+                error = f"{status} - {response.text}"
+                if status != 429 and status < 500:
+                    return False, error, False
+                delay = retry_after_seconds(response)
+                if status == 429:
+                    self.pacer.pause(delay if delay is not None else 1.0)
+            if attempt >= self.max_retries:
+                return False, error, True
+            delay = delay if delay is not None else random.uniform(0, min(30, 2 ** attempt))
+            logger.warning(f"Notion error {status or error}, retrying in {delay:.1f}s "
+                           f"(attempt {attempt + 1}/{self.max_retries})")
+            time.sleep(delay)
+            attempt += 1
+
+    def _deliver(self, outbox_id, article_id, title, payload):
+        try:
+            ok, error, retryable = self._post(payload)
+        except Exception as e:
+            ok, error, retryable = False, str(e), True
+        return NotionResult(outbox_id, article_id, title, ok, error, retryable)
+
+    def enqueue(self, payload, article_id=None, title=''):
+        """Persist the page in the outbox and start sending it in the background"""
+        outbox_id = self.store.add_outbox(article_id, title, json.dumps(payload))
+        self.futures.append(self.pool.submit(self._deliver, outbox_id, article_id, title, payload))
+
+    def replay_outbox(self):
+        """Re-send the pages left in the outbox by previous runs"""
+        pending = self.store.pending_outbox(NOTION_OUTBOX_MAX_ATTEMPTS)
+        if pending:
+            logger.info(f"Replaying {len(pending)} pending Notion pages from the outbox")
+        for outbox_id, article_id, title, payload in pending:
+            self.futures.append(self.pool.submit(self._deliver, outbox_id, article_id, title, json.loads(payload)))
+        return len(pending)
+
+    def results(self):
+        """Yield NotionResults as deliveries finish, keeping the outbox in sync"""
+        futures, self.futures = self.futures, []
+        for future in as_completed(futures):
+            result = future.result()
+            if result.ok:
+                self.store.remove_outbox(result.outbox_id)
+            else:
+                # Erros 4xx (exceto 429) não se resolvem sozinhos: a página é descartada
+                self.store.fail_outbox(result.outbox_id, result.error, dead=not result.retryable)
+            yield result
+
+    def close(self):
+        self.pool.shutdown(wait=True)
+        self.session.close()
@@ -0,0 +1,129 @@
+"""LLM output -> LinkedIn post transformation (precompiled, few-pass sanitizer)"""
+import re
+
+# Blocos de código markdown (o primeiro padrão procura um "\n" literal, como sempre fez)
+CODE_BLOCK_ESCAPED_NL = re.compile(r"```[a-zA-Z]*\\n([\s\S]*?)```")
+CODE_BLOCK = re.compile(r"```([\s\S]*?)```")
+INLINE_CODE = re.compile(r"`+([^`]+)`+")
+BULLET = re.compile(r"^\s*[-*]\s+", re.MULTILINE)
+NUMBERED = re.compile(r"^\s*([0-9])\.\s+", re.MULTILINE)
+PARAGRAPH_START = re.compile(r"(^|\n)([A-Za-z])")
+MULTI_SPACE = re.compile(r" +")
+POST_PREFIX = re.compile(
+    r'^(POST:?|<think>|THINK:?|\*\*POST:?\*\*|\*POST:?\*|\*\*POST\*\*|POST |POST:|POST-|POST_|POST—|POST–|POST—|POST–|POST:)+'
+    r'\s*', re.IGNORECASE)
+HASHTAG = re.compile(r'#(\w+)')
+KEYWORD = re.compile(r'\b\w{4,}\b')
+
+EMOJI_NUMS = {'1': '1️⃣', '2': '2️⃣', '3': '3️⃣', '4': '4️⃣', '5': '5️⃣',
+              '6': '6️⃣', '7': '7️⃣', '8': '8️⃣', '9': '9️⃣', '0': '0️⃣'}
+LONG_PARAGRAPH = 80
+STOPWORDS = frozenset(['the','a','an','and','or','for','to','of','in','on','with','is','are','at','by','as','from','that','this','it','be','has','have','was','were','but','if','so','do','can','will','just','your','you','we','i','my','our','their','they','he','she','his','her','its','not','more','all','any','new','how','why','what','when','where','which','who','about','into','out','up','down','over','under','after','before','then','than','too','very','also','only','each','other','such','these','those','may','should','could','would','must','been','being','did','does','had','having','make','made','get','got','use','used','using','like','see','even','many','much','most','some','no','yes','one','two','three','first','last','next','now','today','tomorrow','yesterday'])
+DEFAULT_HASHTAGS = ['Tech', 'IT', 'DevOps']
+
+
+def _code_block(m):
+    return '💻 `' + m.group(1).replace('\n', ' ') + '`'
+
+
+def _num_marker(m):
+    num = m.group(1)
+    return EMOJI_NUMS.get(num, num) + ' '
+
+
+def _finish_lines(content):
+    """Strip lines, collapse blank lines, add separators and squeeze spaces in one walk.
+
+    Equivalent to the old sequence of passes: strip every line, collapse
+    `(\\n\\s*){2,}` into one newline, append a `—` line after a long line that
+    sits between two newlines (a newline is consumed by one match only), then
+    squeeze runs of spaces and strip the result.
+    """
+    lines = [line.strip() for line in content.splitlines()]
+    if not lines:
+        return ''
+    # Linhas vazias no início/fim sobram como um único "\n" antes do strip final
+    leading = not lines[0]
+    trailing = not lines[-1]
+    lines = [line for line in lines if line]
+    if not lines:
+        return ''
+    out = []
+    newline_before = leading
+    last = len(lines) - 1
+    for i, line in enumerate(lines):
+        newline_after = i < last or trailing
+        separated = newline_before and newline_after and len(line) >= LONG_PARAGRAPH
+        if '  ' in line:
+            line = MULTI_SPACE.sub(' ', line)
+        out.append(line)
+        if separated:
+            out.append('—')
+        # O "\n" depois de uma linha separada já foi consumido pela substituição
+        newline_before = not separated
+    return '\n'.join(out)
+
+
+def sanitize_for_linkedin(content):
+    """Turn markdown-ish LLM output into LinkedIn-friendly plain text"""
+    if '```' in content:
+        if '\\n' in content:
+            content = CODE_BLOCK_ESCAPED_NL.sub(_code_block, content)
+        content = CODE_BLOCK.sub(_code_block, content)
+    # Comandos inline
+    if '`' in content:
+        content = INLINE_CODE.sub(r"💻 `\1`", content)
+    # Listas não numeradas e numeradas (1. 2. ...)
+    if '-' in content or '*' in content:
+        content = BULLET.sub("• ", content)
+    if '.' in content:
+        content = NUMBERED.sub(_num_marker, content)
+    # Emojis no início de parágrafo
+    content = PARAGRAPH_START.sub(r"\1👉 \2", content)
+    return _finish_lines(content)
+
+
+def split_post(summary):
+    """Split an LLM answer into (post, hashtags_str) around the POST:/HASHTAGS: markers"""
+    if "POST:" in summary and "HASHTAGS:" in summary:
+        post_part = summary.split("POST:", 1)[1]
+        post, hashtags_str = post_part.split("HASHTAGS:", 1)
+        return post.strip(), hashtags_str.strip()
+    return summary.strip(), ''
+
+
+def clean_post_start(text):
+    """Remove POST:, <think>, THINK: and similar prefixes from the start of the post"""
+    text = POST_PREFIX.sub('', text.strip())
+    # Se ainda começar com <think>, remove novamente
+    while text.lower().startswith('<think>'):
+        text = text[7:].strip()
+    return text.strip()
+
+
+def extract_hashtags(post, hashtags_str):
+    """Hashtags from the HASHTAGS block, else from the post, else keywords, else defaults"""
+    hashtags = []
+    # 1. Tentar extrair do bloco HASHTAGS
+    if hashtags_str:
+        hashtags = [tag.strip().replace("#", "").replace(",", "")
+                    for tag in hashtags_str.replace("[", " ").replace("]", " ").split()
+                    if tag.strip() and tag.startswith("#") or tag.isalnum()]
+    # 2. Se não encontrar, procurar hashtags no post inteiro
+    if not hashtags:
+        hashtags = HASHTAG.findall(post)
+    # 3. Se ainda não encontrar, extrair palavras-chave do post
+    if not hashtags:
+        keywords = [w.capitalize() for w in KEYWORD.findall(post.lower()) if w not in STOPWORDS]
+        hashtags = list(dict.fromkeys(keywords))[:3]
+    # 4. Se ainda não houver, usar tags genéricas
+    if not hashtags:
+        hashtags = list(DEFAULT_HASHTAGS)
+    return hashtags
+
+
+def format_post(summary):
+    """LLM answer -> (LinkedIn-ready post, hashtags without '#')"""
+    post, hashtags_str = split_post(summary)
+    post = sanitize_for_linkedin(clean_post_start(post))
+    return post, extract_hashtags(post, hashtags_str)
@@ -0,0 +1,275 @@
+"""Compressed, append-only daily archive of raw feed entries (only new or changed ones)
+
+Each archived batch (the new/changed entries of one feed in one run) is a
+single gzip member (or zstd frame) appended to the day's segment file, e.g.
+`2024-06-01.jsonl.gz`. Concatenated members are still a valid gzip/zstd
+file, so a whole segment can be read with `zcat`. An SQLite index maps
+(feed, entry id, content hash) to the segment, offset and length of the
+member holding it, so a single entry can be read back without scanning.
+
+Reader:
+    python raw_archive.py list  "<feed>"
+    python raw_archive.py get   "<feed>" "<entry id or link>" [--all-versions]
+    python raw_archive.py dump  2024-06-01
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from state_store import feed_key
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem trava entre processos
+    fcntl = None
+
+try:
+    import zstandard
+except ImportError:  # opcional: sem ele o arquivo usa gzip
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# archive: arquivo compactado; text: um .txt por feed por execução (antigo); off: nada
+RAW_FEEDS_MODE = os.getenv('RAW_FEEDS', 'archive').lower()
+RAW_ARCHIVE_DIR = os.getenv('RAW_ARCHIVE_DIR', 'cache/raw_archive')
+RAW_ARCHIVE_COMPRESSION = os.getenv('RAW_ARCHIVE_COMPRESSION', 'gzip').lower()
+RAW_ARCHIVE_KEEP_DAYS = float(os.getenv('RAW_ARCHIVE_KEEP_DAYS', '30'))
+SEGMENT_DATE_FORMAT = '%Y-%m-%d'
+CONTENT_FIELDS = ('title', 'link', 'published', 'updated', 'author', 'summary')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    feed TEXT NOT NULL,
+    entry_id TEXT NOT NULL,
+    sha256 TEXT NOT NULL,
+    segment TEXT NOT NULL,
+    offset INTEGER NOT NULL,
+    length INTEGER NOT NULL,
+    archived_at REAL NOT NULL,
+    PRIMARY KEY (feed, entry_id, sha256)
+);
+CREATE INDEX IF NOT EXISTS entries_latest ON entries(feed, entry_id, archived_at);
+CREATE INDEX IF NOT EXISTS entries_segment ON entries(segment);
+"""
+
+
+class GzipCodec:
+    suffix = '.jsonl.gz'
+
+    def compress(self, data):
+        return gzip.compress(data, compresslevel=6, mtime=0)
+
+    def decompress(self, data):
+        return gzip.decompress(data)
+
+    def open_stream(self, f):
+        # gzip lê membros concatenados em sequência
+        return gzip.GzipFile(fileobj=f)
+
+
+class ZstdCodec:
+    suffix = '.jsonl.zst'
+
+    def __init__(self):
+        self.compressor = zstandard.ZstdCompressor(level=6)
+        self.decompressor = zstandard.ZstdDecompressor()
+
+    def compress(self, data):
+        return self.compressor.compress(data)
+
+    def decompress(self, data):
+        return self.decompressor.decompress(data)
+
+    def open_stream(self, f):
+        return self.decompressor.stream_reader(f, read_across_frames=True)
+
+
+def codec_for(compression=RAW_ARCHIVE_COMPRESSION):
+    if compression == 'zstd':
+        if zstandard is not None:
+            return ZstdCodec()
+        logger.warning("RAW_ARCHIVE_COMPRESSION=zstd but the zstandard package is not installed, using gzip")
+    return GzipCodec()
+
+
+def entry_id_of(entry):
+    """Stable id of a feed entry: guid/id, else link, else a hash of the title"""
+    value = dict.get(entry, 'id') or dict.get(entry, 'link')
+    if value:
+        return str(value)
+    return 'sha256:' + hashlib.sha256(str(dict.get(entry, 'title', '')).encode('utf-8')).hexdigest()
+
+
+def record_of(entry):
+    record = {field: entry.get(field) for field in CONTENT_FIELDS if entry.get(field) is not None}
+    # content:encoded / Atom <content> costumam trazer o texto completo
+    contents = [c.get('value') for c in entry.get('content') or [] if c.get('value')]
+    if contents:
+        record['content'] = contents
+    record['id'] = entry_id_of(entry)
+    return record
+
+
+def content_hash(record):
+    return hashlib.sha256(json.dumps(record, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+class RawArchive:
+    """Daily append-only segments plus an (feed, entry id) -> member index"""
+
+    def __init__(self, directory=RAW_ARCHIVE_DIR, compression=RAW_ARCHIVE_COMPRESSION):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.codec = codec_for(compression)
+        self._lock = threading.Lock()
+        # Shards na mesma máquina compartilham o diretório: espera pelo lock do índice em vez de falhar
+        self.conn = sqlite3.connect(str(self.directory / 'index.sqlite'), check_same_thread=False, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        self.archived = 0
+        self.unchanged = 0
+        self.bytes_written = 0
+
+    def _latest_hashes(self, feed):
+        rows = self.conn.execute(
+            "SELECT entry_id, sha256 FROM entries WHERE feed = ? ORDER BY archived_at", (feed,)).fetchall()
+        return dict(rows)
+
+    def append(self, feed_name, records, url=None):
+        """Archive the entries of one feed (as `record_of` dicts) that are new or changed since their last copy"""
+        feed = feed_key(feed_name)
+        now = time.time()
+        with self._lock:
+            known = self._latest_hashes(feed)
+            lines, rows = [], []
+            for record in records:
+                sha256 = content_hash(record)
+                if known.get(record['id']) == sha256:
+                    self.unchanged += 1
+                    continue
+                known[record['id']] = sha256
+                lines.append(json.dumps(dict(record, feed=feed_name, url=url, archived_at=round(now, 3)),
+                                        ensure_ascii=False))
+                rows.append((record['id'], sha256))
+            if not lines:
+                return 0
+            blob = self.codec.compress(('\n'.join(lines) + '\n').encode('utf-8'))
+            segment = datetime.utcnow().strftime(SEGMENT_DATE_FORMAT) + self.codec.suffix
+            with open(self.directory / segment, 'ab') as f:
+                # Outro processo (--shard) pode anexar ao mesmo segmento: o offset só vale com a trava
+                if fcntl:
+                    fcntl.flock(f, fcntl.LOCK_EX)
+                offset = f.seek(0, os.SEEK_END)
+                f.write(blob)
+                f.flush()
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO entries (feed, entry_id, sha256, segment, offset, length, archived_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(feed, entry_id, sha256, segment, offset, len(blob), now) for entry_id, sha256 in rows])
+            self.conn.commit()
+            self.archived += len(rows)
+            self.bytes_written += len(blob)
+        return len(rows)
+
+    def _read_member(self, segment, offset, length):
+        with open(self.directory / segment, 'rb') as f:
+            f.seek(offset)
+            data = f.read(length)
+        return [json.loads(line) for line in self.codec.decompress(data).decode('utf-8').split('\n') if line]
+
+    def lookup(self, feed_name, entry_id, all_versions=False):
+        """Latest archived copy of an entry (or every version, oldest first)"""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT segment, offset, length FROM entries WHERE feed = ? AND entry_id = ? "
+                "ORDER BY archived_at", (feed_key(feed_name), entry_id)).fetchall()
+        if not all_versions:
+            rows = rows[-1:]
+        versions = []
+        for segment, offset, length in rows:
+            versions.extend(r for r in self._read_member(segment, offset, length) if r.get('id') == entry_id)
+        if all_versions:
+            return versions
+        return versions[-1] if versions else None
+
+    def entry_ids(self, feed_name):
+        with self._lock:
+            return [row[0] for row in self.conn.execute(
+                "SELECT entry_id, MAX(archived_at) FROM entries WHERE feed = ? GROUP BY entry_id ORDER BY 2",
+                (feed_key(feed_name),))]
+
+    def iter_segment(self, day):
+        """Every record of one day's segment, in the order it was written"""
+        path = self.directory / (day + self.codec.suffix)
+        with open(path, 'rb') as f:
+            for line in self.codec.open_stream(f).read().decode('utf-8').split('\n'):
+                if line:
+                    yield json.loads(line)
+
+    def prune(self, keep_days=RAW_ARCHIVE_KEEP_DAYS):
+        """Delete segments (and their index rows) older than `keep_days`"""
+        if keep_days <= 0:
+            return 0
+        cutoff = (datetime.utcnow() - timedelta(days=keep_days)).strftime(SEGMENT_DATE_FORMAT)
+        removed = 0
+        with self._lock:
+            for path in self.directory.glob('*.jsonl.*'):
+                if path.name[:10] < cutoff:
+                    self.conn.execute("DELETE FROM entries WHERE segment = ?", (path.name,))
+                    path.unlink()
+                    removed += 1
+            self.conn.commit()
+        if removed:
+            logger.info(f"Raw archive: removed {removed} segments older than {keep_days:g} days")
+        return removed
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Read entries back from the raw feed archive")
+    parser.add_argument('--dir', default=RAW_ARCHIVE_DIR, help=f"archive directory (default: {RAW_ARCHIVE_DIR})")
+    commands = parser.add_subparsers(dest='command', required=True)
+    list_parser = commands.add_parser('list', help="entry ids archived for a feed")
+    list_parser.add_argument('feed')
+    get_parser = commands.add_parser('get', help="raw content of one entry")
+    get_parser.add_argument('feed')
+    get_parser.add_argument('entry_id')
+    get_parser.add_argument('--all-versions', action='store_true')
+    dump_parser = commands.add_parser('dump', help="every record of one day (YYYY-MM-DD)")
+    dump_parser.add_argument('day')
+    args = parser.parse_args(argv)
+
+    archive = RawArchive(args.dir)
+    try:
+        if args.command == 'list':
+            for entry_id in archive.entry_ids(args.feed):
+                print(entry_id)
+        elif args.command == 'get':
+            result = archive.lookup(args.feed, args.entry_id, args.all_versions)
+            if not result:
+                print(f"No archived entry {args.entry_id!r} for feed {args.feed!r}", file=sys.stderr)
+                return 1
+            print(json.dumps(result, indent=2, ensure_ascii=False))
+        elif args.command == 'dump':
+            for record in archive.iter_segment(args.day):
+                print(json.dumps(record, ensure_ascii=False))
+    finally:
+        archive.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
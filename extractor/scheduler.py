@@ -0,0 +1,97 @@
+"""Per-feed adaptive polling schedule for the --daemon mode of sec-feed-extract.py
+
+Every feed has its own interval: it shrinks when a fetch brings new
+entries, grows while the feed stays unchanged (304 / same body) and
+doubles after errors, always within [DAEMON_MIN_INTERVAL,
+DAEMON_MAX_INTERVAL]. The server's own hints (RSS <ttl>, Cache-Control
+max-age, Expires) are a floor: a feed is never polled more often than it
+asks. Intervals and due times live in state.db, so a restart resumes the
+same schedule.
+"""
+import logging
+import os
+import random
+import time
+
+from state_store import feed_key
+
+logger = logging.getLogger(__name__)
+
+DAEMON_MIN_INTERVAL = float(os.getenv('DAEMON_MIN_INTERVAL', '300'))
+DAEMON_MAX_INTERVAL = float(os.getenv('DAEMON_MAX_INTERVAL', '21600'))
+DAEMON_DEFAULT_INTERVAL = float(os.getenv('DAEMON_DEFAULT_INTERVAL', '3600'))
+# Multiplicadores do intervalo: sem novidade, com entradas novas, com erro
+DAEMON_BACKOFF = float(os.getenv('DAEMON_BACKOFF', '1.5'))
+DAEMON_SPEEDUP = float(os.getenv('DAEMON_SPEEDUP', '0.5'))
+ERROR_BACKOFF = 2.0
+# Espalha feeds com o mesmo intervalo para não baterem todos juntos
+JITTER = 0.1
+# Acorda pelo menos assim para perceber mudanças no Feed.csv
+MAX_SLEEP = 60.0
+
+
+def server_hint(result):
+    """Seconds the server asks us to wait: max of RSS <ttl> (minutes) and Cache-Control/Expires"""
+    hints = [result.cache_max_age or 0]
+    if result.feed is not None:
+        try:
+            hints.append(int(result.feed.ttl or 0) * 60)
+        except (TypeError, ValueError, AttributeError):
+            pass
+    return max(hints) or None
+
+
+def next_interval(interval, new_entries=0, changed=True, error=False, hint=None,
+                  low=DAEMON_MIN_INTERVAL, high=DAEMON_MAX_INTERVAL):
+    if error:
+        interval *= ERROR_BACKOFF
+    elif new_entries:
+        interval *= DAEMON_SPEEDUP
+    elif not changed:
+        interval *= DAEMON_BACKOFF
+    interval = min(high, max(low, interval))
+    if hint:
+        # O servidor manda mais que o nosso mínimo, mas nunca além do máximo
+        interval = max(interval, min(hint, high))
+    return interval
+
+
+class FeedScheduler:
+    """Interval and next due time per feed, persisted in the state store"""
+
+    def __init__(self, store, default_interval=DAEMON_DEFAULT_INTERVAL):
+        self.store = store
+        self.default_interval = default_interval
+        self.schedules = store.get_schedules()
+        self.active = set()
+
+    def sync(self, names):
+        """Track exactly these feeds; new ones are due immediately"""
+        self.active = {feed_key(name) for name in names}
+        now = time.time()
+        for key in self.active:
+            self.schedules.setdefault(key, (self.default_interval, now))
+
+    def due(self, now=None):
+        now = now or time.time()
+        return {key for key in self.active if self.schedules[key][1] <= now}
+
+    def record(self, name, new_entries=0, changed=True, error=False, hint=None, now=None):
+        """Reschedule a feed after a fetch; returns the new interval"""
+        key = feed_key(name)
+        now = now or time.time()
+        interval = next_interval(self.schedules.get(key, (self.default_interval, now))[0],
+                                 new_entries, changed, error, hint)
+        self.schedules[key] = (interval, now + interval * random.uniform(1, 1 + JITTER))
+        logger.debug("Next poll of %s in %.0fs", name, interval)
+        return interval
+
+    def seconds_until_next(self, now=None):
+        now = now or time.time()
+        upcoming = [self.schedules[key][1] for key in self.active]
+        if not upcoming:
+            return MAX_SLEEP
+        return min(MAX_SLEEP, max(0.0, min(upcoming) - now))
+
+    def save(self):
+        self.store.set_schedules(self.schedules)
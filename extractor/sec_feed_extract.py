@@ -0,0 +1,1029 @@
+"""Security feed pipeline: fetch feeds, generate LinkedIn posts with an LLM, write them to Notion
+
+Importable without side effects; sec-feed-extract.py is the command line
+entry point (it loads `.env` and sets up logging before importing this
+module). Heavy dependencies (feedparser, requests, the LLM SDKs) are
+imported inside the stages that use them, so `--dry-run` or
+`--replay-outbox` never pay for the feed parser or the Groq client.
+"""
+import copy
+import csv
+import time
+from pathlib import Path
+import os
+import logging
+import json
+import signal
+import threading
+from datetime import datetime, timedelta
+
+from metrics import metrics, peak_rss_kb
+from article_index import DEDUPE_ENABLED, ArticleIndex
+from articles import Article, parsed_feed_of, utc_datetime, utc_timestamp
+from post_sanitizer import format_post
+from raw_archive import RAW_FEEDS_MODE, RawArchive
+from scheduler import FeedScheduler, server_hint
+from state_store import (STATE_DB_PATH, STATUS_FAILED, STATUS_SKIPPED, STATUS_WRITTEN, StateStore, feed_key,
+                         parse_cursor)
+
+# O logging é configurado em setup_logging() (nível, formato e rotação via .env ou CLI)
+logger = logging.getLogger(__name__)
+
+# Define the Notion API configuration
+NOTION_API_TOKEN = os.getenv('NOTION_API_TOKEN')
+SOURCE_DATABASE_ID = "2027677d888a807ba4c4c2496f90a340"
+
+# Configuration
+# Config.txt / FeedValidators.json só são lidos para migrar para o state.db
+ConfigurationFilePath = 'Config.txt'
+ValidatorsFilePath = 'FeedValidators.json'
+feed_csv_path = Path('Feed.csv')
+options = type('', (), {})()
+# --fetch-only: baixa e filtra sem gravar cursores, validadores, artigos nem o índice
+options.FetchOnly = False
+# --shard i/N: só os feeds deste shard, com o próprio arquivo de estado (ver sharding.py)
+options.Shard = None
+# Estado persistente e índice de artigos já vistos (abertos em main())
+state_store = None
+article_index = None
+raw_archive = None
+# Cópia local do banco do Notion (NOTION_MIRROR=on)
+notion_mirror = None
+# O daemon não passa por close_state entre ciclos: limpa o state.db no máximo uma vez por dia
+PRUNE_INTERVAL = 86400
+last_prune = None
+
+# Statistics tracking
+stats = {
+    'processed_items': 0,
+    'entries_scanned': 0,
+    'successful_items': 0,
+    'failed_items': 0,
+    'source_count': {},
+    'source_link_count': {},
+    'peak_rss_kb': 0,
+    'full_downloads': 0,
+    'not_modified_304': 0,
+    'not_modified_hash': 0,
+    'bytes_downloaded': 0,
+    'llm_cache_hits': 0,
+    'llm_cache_misses': 0,
+    'llm_cache_bytes_saved': 0,
+    'llm_cache_tokens_saved': 0,
+    'llm_batches': 0,
+    'llm_batch_fallbacks': 0,
+    'duplicate_url': 0,
+    'duplicate_similar': 0,
+    'duplicate_notion': 0,
+    'notion_outbox_pending': 0,
+    'raw_entries_archived': 0,
+    'triage_skipped': 0,
+    'triage_checks': 0,
+    'triage_check_tokens': 0,
+    'triage_tokens_avoided': 0,
+    'enrich_pages_fetched': 0,
+    'enrich_cache_hits': 0,
+    'enrich_failed': 0,
+    'enrich_bytes': 0,
+    'enrich_articles': 0,
+    'resumed_items': 0,
+    'errors': []
+}
+# Estado inicial dos contadores (o modo daemon zera a cada ciclo)
+INITIAL_STATS = copy.deepcopy(stats)
+
+# Define the system prompt for Groq
+prompt = """You are a social media content creator specialized in LinkedIn posts for IT professionals.\n\nYour task is to:\n1. Write a LinkedIn post of up to 1000 characters based on the article below, focusing on Linux, DevOps, CI/CD, Unix, AIX, Solaris, and related technologies.\n2. The post should be clear, concise, and highlight the main insights, tips, or news from the article.\n3. Always include a practical and real-world example related to the topic. If the topic is about Linux, DevOps, or similar, prefer to use a relevant command-line example (e.g., a shell command, script, or config snippet). If the article is just news, provide a contextual example or scenario.\n4. End the post with a thought-provoking question to engage the audience.\n5. Use a professional yet approachable tone, and make the post engaging for IT and tech audiences.\n6. Optimize the post for SEO and LinkedIn engagement.\n7. At the end of the post, add 3-5 relevant hashtags (in English) that match the article's topic (e.g., #Linux, #DevOps, #Cloud, #SysAdmin, #Automation, #CI/CD, #Unix, #AIX, #Solaris, etc).\n\nIMPORTANT: Do not explain your reasoning. Do not include any thoughts, explanations, or step-by-step. Only output the LinkedIn post and hashtags in the format below. Do not include <think> or any other commentary.\n\nFormat your response exactly like this:\nPOST:\n[Your LinkedIn post here]\n\nHASHTAGS:\n[#hashtag1, #hashtag2, #hashtag3, ...]\n"""
+
+def log_feed_stats():
+    """Log feed processing statistics"""
+    logger.info(f"\n{'='*50}")
+    logger.info("Feed Processing Statistics:")
+    logger.info(f"Total processed items: {stats['processed_items']}")
+    logger.info(f"Successful items: {stats['successful_items']}")
+    logger.info(f"Failed items: {stats['failed_items']}")
+    logger.info(f"Dated entries scanned: {stats['entries_scanned']} (scans stop at the cursor or the 14-day window)")
+    logger.info(f"Feed downloads: {stats['full_downloads']} full, "
+                f"{stats['not_modified_304']} not modified (304), "
+                f"{stats['not_modified_hash']} unchanged (same hash), "
+                f"{stats['bytes_downloaded']} bytes")
+    logger.info(f"Notion pages left in outbox: {stats['notion_outbox_pending']}")
+    if stats['resumed_items']:
+        logger.info(f"Resumed from earlier runs: {stats['resumed_items']} articles")
+    logger.info(f"Duplicates skipped: {stats['duplicate_url']} same link, "
+                f"{stats['duplicate_similar']} near-duplicate content, {stats['duplicate_notion']} already in Notion")
+    if raw_archive:
+        logger.info(f"Raw archive: {stats['raw_entries_archived']} new or changed entries archived "
+                    f"({raw_archive.unchanged} unchanged, {raw_archive.bytes_written} compressed bytes)")
+    logger.info(f"Triage: {stats['triage_skipped']} articles skipped (~{stats['triage_tokens_avoided']} tokens "
+                f"avoided), {stats['triage_checks']} small-model checks ({stats['triage_check_tokens']} tokens)")
+    if stats['enrich_pages_fetched'] or stats['enrich_cache_hits'] or stats['enrich_failed']:
+        logger.info(f"Article pages: {stats['enrich_articles']} articles enriched, "
+                    f"{stats['enrich_pages_fetched']} pages fetched ({stats['enrich_bytes']} bytes), "
+                    f"{stats['enrich_cache_hits']} from the cache, {stats['enrich_failed']} without usable text")
+    logger.info(f"LLM cache: {stats['llm_cache_hits']} hits, {stats['llm_cache_misses']} misses, "
+                f"{stats['llm_cache_bytes_saved']} bytes / {stats['llm_cache_tokens_saved']} tokens saved")
+    if stats['llm_batches'] or stats['llm_batch_fallbacks']:
+        logger.info(f"LLM batches: {stats['llm_batches']} multi-article requests, "
+                    f"{stats['llm_batch_fallbacks']} articles retried one by one")
+    # ru_maxrss é do processo inteiro (feeds em threads paralelas), não de um feed
+    stats['peak_rss_kb'] = peak_rss_kb() or 0
+    if stats['peak_rss_kb']:
+        logger.info(f"Peak RSS of the process: {stats['peak_rss_kb'] / 1024:.1f} MB")
+    
+    logger.info("\nSource counts:")
+    for source, count in sorted(stats['source_count'].items()):
+        logger.info(f"- {source}: {count} entries found, {stats['source_link_count'].get(source, 0)} processed")
+    
+    if stats['errors']:
+        logger.info("\nErrors encountered:")
+        for error in stats['errors']:
+            logger.error(error)
+    logger.info(f"{'='*50}\n")
+
+def export_metrics():
+    """Write the run counters and stage timings collected in `metrics` (METRICS=on)"""
+    if not metrics.enabled:
+        return
+    for key, value in stats.items():
+        if isinstance(value, (int, float)):
+            metrics.set(f"run_{key}", value)
+    metrics.set('run_errors', len(stats['errors']))
+    metrics.set('run_timestamp_seconds', time.time())
+    try:
+        # Shards na mesma máquina não sobrescrevem os arquivos uns dos outros
+        metrics.write(basename=f"sec_feed.shard-{options.Shard.index}-of-{options.Shard.count}"
+                      if options.Shard else 'sec_feed')
+    except OSError as e:
+        logger.warning(f"Unable to write metrics: {e}")
+
+def build_notion_page(short_title, summary, date, source, link):
+    """Build the Notion page payload for a generated post"""
+    # Extrai o texto entre POST: e HASHTAGS:, limpa prefixos e sanitiza para o LinkedIn
+    post, hashtags = format_post(summary)
+    # Preencher keywords com as hashtags
+    keywords_str = ", ".join([f"#{tag}" for tag in hashtags])
+    data = {
+        "parent": {"database_id": SOURCE_DATABASE_ID},
+        "properties": {
+            "Edition": {
+                "title": [{"text": {"content": short_title}}]
+            },
+            "Created time": {"date": {"start": date}},
+            "Source": {"select": {"name": source}},
+            "Content": {
+                "rich_text": [
+                    {"text": {"content": post}, "annotations": {"bold": True}},
+                    {"text": {"content": f"\nRead more: {link}"}}
+                ]
+            },
+            "Tags": {"multi_select": [{"name": tag} for tag in hashtags if tag]},
+            "Keywords": {"rich_text": [{"text": {"content": keywords_str}}]},
+            "flow_status": {"multi_select": [{"name": "NOT STARTED"}]}
+        }
+    }
+    # Só serializa o payload quando alguém vai ler
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Notion page payload: %s", json.dumps(data, ensure_ascii=False))
+    return data
+
+def save_raw_feed_content(RssItem, records, feed_dir='raw_feeds'):
+    """Save the raw feed content to a text file for inspection"""
+    try:
+        # Create directory for raw feeds if it doesn't exist
+        feed_dir = Path(feed_dir)
+        feed_dir.mkdir(exist_ok=True)
+        
+        # Create a filename based on the feed name and timestamp
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        filename = feed_dir / f"{RssItem[1].lower().replace(' ', '_')}_{timestamp}.txt"
+        
+        with open(filename, 'w', encoding='utf-8') as f:
+            f.write(f"Feed: {RssItem[1]}\n")
+            f.write(f"URL: {RssItem[0]}\n")
+            f.write(f"Timestamp: {timestamp}\n")
+            f.write(f"Number of entries: {len(records)}\n")
+            f.write("="*50 + "\n\n")
+            
+            for i, entry in enumerate(records, 1):
+                f.write(f"Entry {i}:\n")
+                f.write(f"Title: {entry.get('title', 'No title')}\n")
+                f.write(f"Link: {entry.get('link', 'No link')}\n")
+                f.write(f"Published: {entry.get('published', 'No date')}\n")
+                f.write(f"Summary: {entry.get('summary', 'No summary')}\n")
+                f.write("-"*50 + "\n\n")
+        
+        logger.info(f"Raw feed content saved to {filename}")
+        return filename
+    except Exception as e:
+        logger.error(f"Error saving raw feed content for {RssItem[1]}: {e}")
+        return None
+
+def keep_raw_entries():
+    """Whether the fetch stage has to keep a raw copy of the entries (RAW_FEEDS archive or text)"""
+    return RAW_FEEDS_MODE != 'off' and not options.FetchOnly
+
+def archive_raw_feed(RssItem, feed):
+    """Keep a copy of the raw entries as configured by RAW_FEEDS (archive, text or off)"""
+    if feed.raw_records is None:
+        return
+    if RAW_FEEDS_MODE == 'text':
+        save_raw_feed_content(RssItem, feed.raw_records)
+    elif raw_archive:
+        try:
+            stats['raw_entries_archived'] += raw_archive.append(RssItem[1], feed.raw_records, RssItem[0])
+        except Exception as e:
+            logger.error(f"Error archiving raw feed content for {RssItem[1]}: {e}")
+
+def select_new_entries(articles, window_start, cursor, cursor_ids, undated_ids):
+    """Articles not processed yet, oldest first.
+
+    Dated articles are sorted newest first once and scanned until they cross
+    the cursor or the 14-day window; at the cursor time only ids not in
+    `cursor_ids` are new (all of them are old when it is None). Undated
+    articles are new once, tracked by id. Also returns the undated ids still
+    in the feed and how many dated articles were looked at.
+    """
+    dated, undated = [], []
+    for article in articles:
+        (undated if article.timestamp is None else dated).append(article)
+    dated.sort(key=lambda article: article.timestamp, reverse=True)
+    # Cursores e janela continuam em datetime no state.db; a comparação é feita em epoch
+    floor = utc_timestamp(max(window_start, cursor) if cursor else window_start)
+    cursor = utc_timestamp(cursor) if cursor else None
+    new_articles = []
+    scanned = 0
+    for article in dated:
+        scanned += 1
+        if article.timestamp < floor:
+            break
+        if article.timestamp == cursor and (cursor_ids is None or article.id in cursor_ids):
+            continue
+        new_articles.append(article)
+    new_articles.reverse()
+    seen_undated = set()
+    for article in undated:
+        seen_undated.add(article.id)
+        if article.id not in undated_ids:
+            new_articles.append(article)
+    return new_articles, seen_undated, scanned
+
+def GetRssFromUrl(RssItem, feed=None):
+    """Select the new entries of a feed and return them as GenerationJobs"""
+    from llm_generator import GenerationJob
+    jobs = []
+    try:
+        # Skip commented out feeds
+        if RssItem[0].startswith('#'):
+            logger.info(f"Skipping commented feed: {RssItem[1]}")
+            return jobs
+
+        logger.info(f"\n{'='*50}")
+        logger.info(f"Processing feed: {RssItem[1]} ({RssItem[0]})")
+        
+        # O feed normalmente já vem baixado pelo estágio concorrente de main()
+        if feed is None:
+            import feedparser
+            feed = parsed_feed_of(feedparser.parse(RssItem[0]), RssItem[1], keep_raw_entries())
+        if feed.streamed:
+            logger.info(f"Found {feed.entry_count} entries newer than the cursor (streamed)")
+        else:
+            logger.info(f"Found {feed.entry_count} entries in feed")
+        
+        # Save raw feed content
+        if not options.FetchOnly:
+            archive_raw_feed(RssItem, feed)
+        
+        # Handle bozo errors more gracefully
+        if feed.bozo_exception:
+            if "XML or text declaration not at start of entity" in str(feed.bozo_exception):
+                logger.warning(f"Feed {RssItem[1]} has XML declaration issue but is still parseable")
+            elif "is not an XML media type" in str(feed.bozo_exception):
+                logger.warning(f"Feed {RssItem[1]} has content type issue but is still valid XML")
+            elif "document declared as us-ascii" in str(feed.bozo_exception):
+                logger.warning(f"Feed {RssItem[1]} has encoding mismatch but content is still valid")
+            else:
+                logger.error(f"Feed parsing error for {RssItem[1]}: {feed.bozo_exception}")
+                stats['errors'].append(f"Feed parsing error for {RssItem[1]}: {feed.bozo_exception}")
+                return jobs
+
+        # Count total entries for this source
+        stats['source_count'][RssItem[1]] = feed.entry_count
+        logger.info(f"Processing {feed.entry_count} entries for {RssItem[1]}")
+
+        # Calcular o corte de 14 dias atrás
+        window_start = datetime.utcnow() - timedelta(days=14)
+        # Cursor = horário da entrada mais nova já processada + ids das entradas com esse horário
+        cursor, cursor_ids, undated_ids = state_store.get_cursor_state(RssItem[1])
+        new_articles, seen_undated, scanned = select_new_entries(
+            feed.articles, window_start, cursor, cursor_ids, undated_ids)
+        stats['entries_scanned'] += scanned
+        logger.info(f"Scanned {scanned} of {feed.entry_count} entries, {len(new_articles)} new")
+
+        # Um único UPDATE por feed, com o horário e os ids da entrada mais nova
+        if new_articles:
+            newest = max((a.timestamp for a in new_articles if a.timestamp is not None), default=None)
+            if newest is not None:
+                ids = {a.id for a in new_articles if a.timestamp == newest}
+                newest = utc_datetime(newest)
+                if newest == cursor and cursor_ids is not None:
+                    ids |= cursor_ids
+                cursor, cursor_ids = newest, ids
+
+        queued = []
+        for article in new_articles:
+            if article.timestamp is not None:
+                DateActivity = time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(article.timestamp))
+            else:
+                # Sem data: processada uma vez só, com o horário em que apareceu
+                DateActivity = time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime())
+                logger.warning(f"No date found for entry in {RssItem[1]}, using first-seen time")
+            stats['processed_items'] += 1
+            if RssItem[1] not in stats['source_link_count']:
+                stats['source_link_count'][RssItem[1]] = 0
+            stats['source_link_count'][RssItem[1]] += 1
+            # Já existe uma página no Notion para este link (consulta local, sem chamar a API)
+            if notion_mirror and notion_mirror.has_link(article.canonical_link):
+                stats['duplicate_notion'] += 1
+                logger.info("Skipping article already in Notion: %s", article.title)
+                continue
+            # Mesma notícia publicada por outro feed (ou já processada antes)
+            if article_index:
+                duplicate = article_index.find_duplicate(article.canonical_link, article.title, article.summary)
+                if duplicate:
+                    stats[f"duplicate_{duplicate[0]}"] += 1
+                    logger.info("Skipping duplicate article (%s of %s): %s", duplicate[0], duplicate[1], article.title)
+                    continue
+                if not options.FetchOnly:
+                    article_index.add(article.canonical_link, article.title, article.summary, RssItem[1],
+                                      commit=False)
+            logger.info("Queued article: %s", article.title)
+            logger.debug("Original description: %.200s...", article.summary)
+            # A geração acontece depois, em lote, para todos os feeds
+            queued.append(GenerationJob(RssItem, article, DateActivity))
+        if (new_articles or seen_undated != undated_ids) and not options.FetchOnly:
+            # Fila e cursor na mesma transação: o cursor nunca passa de um artigo que não está na fila
+            ids = state_store.enqueue_articles(
+                RssItem[1], [(job.article.id, job.link, job.title, job.description, job.DateActivity) for job in queued],
+                cursor, cursor_ids, seen_undated)
+            for job, article_id in zip(queued, ids):
+                job.article_id = article_id
+            if article_index:
+                article_index.commit()
+        jobs.extend(queued)
+    except Exception as e:
+        # Nada deste feed foi para a fila: o índice de duplicatas também volta atrás
+        if article_index and not options.FetchOnly:
+            article_index.rollback()
+        logger.error(f"Error processing feed {RssItem[1]}: {str(e)}")
+        stats['errors'].append(f"Error processing feed {RssItem[1]}: {str(e)}")
+        stats['failed_items'] += 1
+    logger.info(f"Completed processing feed: {RssItem[1]}\n{'='*50}\n")
+    return jobs
+
+def resumable_jobs():
+    """GenerationJobs for the queued articles earlier runs did not finish (posts already generated are kept)"""
+    rows = state_store.incomplete_articles()
+    if not rows:
+        return []
+    from llm_generator import GenerationJob
+    jobs = []
+    for article_id, source, entry_id, link, title, summary, published, content in rows:
+        published_at = parse_cursor(published)
+        article = Article(entry_id, link or '', title, summary, utc_timestamp(published_at) if published_at else None,
+                          source)
+        job = GenerationJob(('', source), article, published)
+        job.article_id = article_id
+        job.content = content
+        jobs.append(job)
+    state_store.claim_articles([job.article_id for job in jobs])
+    stats['resumed_items'] += len(jobs)
+    logger.info(f"Resuming {len(jobs)} articles left unfinished by earlier runs "
+                f"({sum(1 for job in jobs if job.content)} already generated)")
+    return jobs
+
+def generate_and_publish(jobs, writer=None, generator=None):
+    """Run the queued articles through the LLM concurrently and hand each result to the Notion writer.
+
+    The daemon passes its long-lived writer and generator; otherwise both are
+    created here and closed at the end.
+    """
+    own_writer = writer is None and bool(NOTION_API_TOKEN)
+    if own_writer:
+        writer = create_notion_writer()
+    if writer:
+        # Páginas que falharam em execuções (ou ciclos) anteriores vão primeiro
+        writer.replay_outbox()
+    else:
+        logger.warning("Skipping Notion page creation - no API token")
+    try:
+        if jobs:
+            with metrics.stage('generate'):
+                generate_posts(jobs, writer, generator)
+    finally:
+        if writer:
+            # Só o que sobra das escritas depois da geração (elas correm em paralelo)
+            with metrics.stage('notion'):
+                collect_notion_results(writer)
+            if own_writer:
+                writer.close()
+
+def generator_counters(generator):
+    cache = generator.cache
+    return {
+        'llm_cache_hits': cache.hits if cache else 0,
+        'llm_cache_misses': cache.misses if cache else 0,
+        'llm_cache_bytes_saved': cache.bytes_saved if cache else 0,
+        'llm_cache_tokens_saved': cache.tokens_saved if cache else 0,
+        'llm_batches': generator.batches,
+        'llm_batch_fallbacks': generator.batch_fallbacks,
+    }
+
+def generate_posts(jobs, writer, generator=None):
+    # Artigos retomados que já têm o post salvo só precisam da página no Notion
+    for job in jobs:
+        if job.content:
+            publish_post(job, writer)
+    jobs = [job for job in jobs if not job.content]
+    if not jobs:
+        return
+    logger.info(f"Generating posts for {len(jobs)} queued articles")
+    own_generator = generator is None
+    try:
+        if own_generator:
+            generator = create_generator()
+    except Exception as e:
+        error_msg = f"Unable to create LLM provider: {e}"
+        logger.error(error_msg)
+        stats['errors'].append(error_msg)
+        stats['failed_items'] += len(jobs)
+        for job in jobs:
+            state_store.set_article_status(job.article_id, STATUS_FAILED, error_msg)
+        return
+    # O gerador do daemon acumula contadores entre ciclos: só a diferença entra nas stats
+    counters_before = generator_counters(generator)
+    from triage import TRIAGE_ENABLED
+    if TRIAGE_ENABLED:
+        jobs = triage_jobs(jobs, generator)
+    from article_fetcher import ENRICH_ENABLED
+    if ENRICH_ENABLED and jobs:
+        # Só depois da triagem: artigos descartados não têm a página baixada
+        enrich_jobs(jobs)
+    # Os resultados chegam fora de ordem; stats e state_store ficam nesta thread
+    for job in generator.run(jobs):
+        if job.error:
+            logger.error(f"Failed to process RSS feed entry {job.RssItem[1]}: {job.error}")
+            stats['failed_items'] += 1
+            stats['errors'].append(f"Failed to process RSS feed entry {job.RssItem[1]}: {job.error}")
+            state_store.set_article_status(job.article_id, STATUS_FAILED, job.error)
+            continue
+        logger.debug("Groq API Response for %s:\n%s", job.title, job.content)
+        state_store.set_article_generated(job.article_id, job.content)
+        publish_post(job, writer)
+    for key, value in generator_counters(generator).items():
+        stats[key] += value - counters_before[key]
+    if own_generator:
+        generator.close()
+
+def publish_post(job, writer):
+    """Build the Notion page of a generated post and put it in the writer's outbox"""
+    if not writer:
+        return
+    try:
+        page = build_notion_page(job.title, job.content, job.DateActivity, job.RssItem[1], job.link)
+    except Exception as e:
+        error_msg = f"Error creating Notion page: {str(e)}"
+        logger.error(error_msg)
+        stats['errors'].append(error_msg)
+        stats['failed_items'] += 1
+        state_store.set_article_status(job.article_id, STATUS_FAILED, error_msg)
+        return
+    logger.info("Creating Notion page for: %s", job.title)
+    writer.enqueue(page, job.article_id, job.title)
+
+def triage_jobs(jobs, generator):
+    """Drop the articles the relevance triage rates off-topic; returns the ones to generate"""
+    from llm_generator import GROQ_MODEL
+    from triage import TriageRouter
+    router = TriageRouter(prompt, generator, sources=configured_feeds())
+    selected, skipped = router.route(jobs)
+    for job in skipped:
+        state_store.set_article_status(job.article_id, STATUS_SKIPPED, f"triage score {job.triage_score:.3f}")
+    stats['triage_skipped'] += router.skipped
+    stats['triage_checks'] += router.confirm_calls
+    stats['triage_check_tokens'] += router.confirm_tokens
+    stats['triage_tokens_avoided'] += router.tokens_avoided
+    metrics.inc('triage_skipped_total', router.skipped)
+    metrics.inc('triage_checks_total', router.confirm_calls)
+    logger.info(f"Triage: {len(selected)} of {len(jobs)} articles sent to {GROQ_MODEL}, "
+                f"{len(skipped)} skipped as off-topic")
+    return selected
+
+
+def enrich_jobs(jobs):
+    """Attach the main text of each article page to its job (ENRICH=on); failures keep the feed summary"""
+    from article_fetcher import ArticleEnricher
+    try:
+        enricher = ArticleEnricher()
+    except Exception as e:
+        logger.warning(f"Article enrichment unavailable, using feed summaries only: {e}")
+        return
+    try:
+        with metrics.stage('enrich'):
+            stats['enrich_articles'] += enricher.enrich(jobs)
+    except Exception as e:
+        logger.warning(f"Article enrichment failed, using feed summaries only: {e}")
+    finally:
+        stats['enrich_pages_fetched'] += enricher.fetched
+        stats['enrich_cache_hits'] += enricher.cache_hits
+        stats['enrich_failed'] += enricher.failed
+        stats['enrich_bytes'] += enricher.bytes_downloaded
+        enricher.close()
+
+
+def collect_notion_results(writer):
+    """Wait for the Notion writes and record their outcome"""
+    for result in writer.results():
+        if result.ok:
+            logger.info("Successfully created Notion page: %s", result.title)
+            stats['successful_items'] += 1
+            state_store.set_article_status(result.article_id, STATUS_WRITTEN)
+        else:
+            error_msg = f"Failed to create Notion page: {result.error}"
+            if result.retryable:
+                error_msg += " (kept in outbox for the next run)"
+                stats['notion_outbox_pending'] += 1
+            logger.error(error_msg)
+            stats['errors'].append(error_msg)
+            stats['failed_items'] += 1
+            state_store.set_article_status(result.article_id, STATUS_FAILED, result.error)
+
+def open_state(extras=True, readonly=False):
+    """Open the state store, the dedupe index and the raw archive (globals shared by the stages)
+
+    With `extras=False` only state.db is opened (modes that never look at feed entries).
+    With `readonly=True` (--dry-run, --fetch-only) nothing is written: no migration, no shard
+    file, no raw archive and its pruning.
+    """
+    global article_index, raw_archive, state_store
+    if options.Shard and readonly:
+        state_store = StateStore(options.Shard.current_path(), readonly=True)
+        logger.info(f"Shard {options.Shard.label}: reading state from {state_store.path}")
+    elif options.Shard:
+        options.Shard.lock()
+        state_store = StateStore(options.Shard.prepare())
+        logger.info(f"Shard {options.Shard.label}: state in {state_store.path}")
+    else:
+        state_store = StateStore(readonly=readonly)
+    if not readonly:
+        state_store.migrate_legacy(ConfigurationFilePath, ValidatorsFilePath)
+    if not extras:
+        return
+    from notion_reader import NOTION_MIRROR
+    if NOTION_MIRROR:
+        open_notion_mirror()
+    if DEDUPE_ENABLED:
+        try:
+            article_index = ArticleIndex()
+        except Exception as e:
+            logger.warning(f"Article index unavailable, cross-feed dedupe disabled: {e}")
+    if RAW_FEEDS_MODE == 'archive' and not readonly:
+        try:
+            raw_archive = RawArchive()
+            raw_archive.prune()
+        except Exception as e:
+            logger.warning(f"Raw feed archive unavailable, raw entries will not be kept: {e}")
+
+def open_notion_mirror():
+    global notion_mirror
+    from notion_reader import NotionMirror
+    try:
+        notion_mirror = NotionMirror()
+    except Exception as e:
+        logger.warning(f"Notion mirror unavailable, pages already in Notion will not be skipped: {e}")
+
+def sync_notion_mirror(full=False):
+    """Bring the local mirror up to date with the pages edited in Notion since the last sync"""
+    if not notion_mirror or not NOTION_API_TOKEN or options.FetchOnly:
+        return
+    from notion_reader import NotionReader
+    from notion_writer import NOTION_RPS
+    reader = NotionReader(NOTION_API_TOKEN, SOURCE_DATABASE_ID, rps=shard_rate(NOTION_RPS))
+    try:
+        with metrics.stage('notion_sync'):
+            notion_mirror.sync(reader, full)
+    except Exception as e:
+        # Uma cópia desatualizada ainda serve para pular duplicatas
+        logger.warning(f"Unable to sync the Notion mirror: {e}")
+    finally:
+        reader.close()
+
+def prune_state(interval=0):
+    """Apply the state.db retention, skipped when the last prune is less than `interval` seconds old"""
+    global last_prune
+    if state_store.run_id is None:
+        return
+    if last_prune is not None and time.monotonic() - last_prune < interval:
+        return
+    try:
+        state_store.prune()
+    except Exception as e:
+        logger.warning(f"Unable to prune {state_store.path}: {e}")
+    last_prune = time.monotonic()
+
+def close_state():
+    global notion_mirror
+    if notion_mirror:
+        notion_mirror.close()
+        notion_mirror = None
+    if article_index:
+        article_index.close()
+    if raw_archive:
+        raw_archive.close()
+    if state_store:
+        # Antes do checkpoint do close: o arquivo commitado já sai sem as linhas antigas
+        prune_state()
+        state_store.close()
+    if options.Shard:
+        options.Shard.release()
+
+def use_shard(index, count):
+    """Restrict the following runs to shard `index` of `count` (--shard i/N)"""
+    from sharding import Shard
+    options.Shard = Shard(index, count)
+
+def shard_rate(value):
+    """GROQ_RPM, GROQ_TPM and NOTION_RPS are budgets for the whole run: each --shard job gets 1/N of them"""
+    return options.Shard.rate(value) if options.Shard else value
+
+def create_generator():
+    """LLM generator for the prompt, within this process's share of GROQ_RPM / GROQ_TPM"""
+    from llm_generator import GROQ_RPM, GROQ_TPM, Generator, RateLimiter
+    return Generator(prompt, limiter=RateLimiter(shard_rate(GROQ_RPM), shard_rate(GROQ_TPM)))
+
+def create_notion_writer():
+    """Notion writer over state.db's outbox, within this process's share of NOTION_RPS"""
+    from notion_writer import NOTION_RPS, NotionWriter
+    return NotionWriter(NOTION_API_TOKEN, state_store, rps=shard_rate(NOTION_RPS))
+
+def configured_feeds():
+    """(url, name) rows of Feed.csv, without the logging and state.db registration of read_feeds"""
+    if not feed_csv_path.exists():
+        return []
+    with open(feed_csv_path, 'r') as csvfile:
+        return [(row[0].strip(), row[1].strip()) for row in csv.reader(csvfile) if len(row) == 2]
+
+def read_feeds(echo=True, register=True):
+    """Feed.csv -> {name: {'url': ...}} (None when the file is missing); registers new feeds in state.db"""
+    feeds = {}
+    # Check if Feed.csv exists and print its contents
+    if not feed_csv_path.exists():
+        logger.error(f"Feed.csv file not found at {feed_csv_path}")
+        return None
+    logger.info(f"Feed.csv found at {feed_csv_path}")
+    with open(feed_csv_path, 'r') as csvfile:
+        reader = csv.reader(csvfile)
+        if echo:
+            print("Contents of Feed.csv:")
+        for row in reader:
+            if echo:
+                print(row)
+            if len(row) == 2:  # Include all rows for display
+                feeds[row[1].strip()] = {'url': row[0].strip(), 'last_update': '1900-01-01T00:00:00'}
+    feed_keys = {name.lower() for name in feeds}
+    if options.Shard:
+        feeds = {name: info for name, info in feeds.items() if options.Shard.owns(name)}
+        logger.info(f"Shard {options.Shard.label}: {len(feeds)} of {len(feed_keys)} feeds")
+    for name in feeds:
+        stats['source_link_count'][name] = 0
+    # Garantir que todos os feeds do Feed.csv tenham um cursor no state.db
+    if register:
+        for name in feeds:
+            state_store.ensure_feed(name)
+    for name in state_store.feed_names():
+        if name not in feed_keys:
+            logger.warning(f"Feed '{name}' from {state_store.path} not found in Feed.csv")
+    return feeds
+
+def fetch_new_articles(active_list, session=None, on_result=None):
+    """Download the feeds concurrently and queue their new entries as GenerationJobs.
+
+    `on_result(result, new_entries)` is called for every feed once it has
+    been processed (used by the daemon scheduler).
+    """
+    from feed_fetcher import fetch_feeds
+    jobs = []
+    # Modo stream: nada mais antigo que o cursor ou a janela de 14 dias é lido
+    def stop_before(name):
+        window_start = datetime.utcnow() - timedelta(days=14)
+        cursor = state_store.get_cursor(name)
+        return max(window_start, cursor) if cursor else window_start
+    # Download concorrente; o processamento das entradas continua nesta thread
+    with metrics.stage('fetch'):
+        for result in fetch_feeds(active_list, state_store, session=session, stop_before=stop_before,
+                                  keep_raw=keep_raw_entries()):
+            processed_before = stats['processed_items']
+            if result.error:
+                error_msg = f"Error fetching feed {result.RssItem[1]}: {result.error}"
+                logger.error(error_msg)
+                stats['errors'].append(error_msg)
+                stats['failed_items'] += 1
+            else:
+                stats['bytes_downloaded'] += result.bytes_downloaded
+                if result.not_modified:
+                    # 304 ou corpo idêntico: nada novo, pula o parse e o loop de entradas
+                    stats[f"not_modified_{result.not_modified}"] += 1
+                    logger.info(f"Feed not modified ({result.not_modified}): {result.RssItem[1]}")
+                else:
+                    stats['full_downloads'] += 1
+                    jobs.extend(GetRssFromUrl(result.RssItem, result.feed))
+                # Validadores só são gravados depois que o feed foi processado
+                if not options.FetchOnly:
+                    state_store.update(result.RssItem[1], result.validators)
+            if on_result:
+                on_result(result, stats['processed_items'] - processed_before)
+    return jobs
+
+def reset_stats(initial=None):
+    """Fresh counters (INITIAL_STATS unless `initial` is given) for the next daemon cycle or benchmark run;
+    the dict is shared, so it is updated in place"""
+    stats.clear()
+    stats.update(copy.deepcopy(INITIAL_STATS if initial is None else initial))
+
+def main():
+    logger.info("Starting security feed extraction")
+    try:
+        open_state()
+        state_store.start_run()
+        sync_notion_mirror()
+        feeds = read_feeds()
+        if feeds is None:
+            return
+        # Process each feed
+        consolidated_list = [(info['url'], name) for name, info in feeds.items()]
+        active_list = [rss_item for rss_item in consolidated_list if not rss_item[0].startswith('#')]
+        # O que sobrou de execuções anteriores entra antes dos artigos novos
+        jobs = resumable_jobs()
+        jobs += fetch_new_articles(active_list)
+        generate_and_publish(jobs)
+        log_feed_stats()
+        export_metrics()
+        state_store.finish_run(stats)
+    except Exception as e:
+        logger.error(f"Critical error in main execution: {str(e)}", exc_info=True)
+    finally:
+        close_state()
+    logger.info("Security feed extraction completed")
+
+def run_fetch_only():
+    """Download and filter the feeds and log what would be queued; no LLM, Notion or state.db changes"""
+    logger.info("Starting security feed extraction (fetch only, state.db is not updated)")
+    options.FetchOnly = True
+    try:
+        open_state(readonly=True)
+        feeds = read_feeds(register=False)
+        if feeds is None:
+            return
+        active_list = [(info['url'], name) for name, info in feeds.items() if not info['url'].startswith('#')]
+        jobs = fetch_new_articles(active_list)
+        logger.info(f"{len(jobs)} new articles would be queued for generation")
+        log_feed_stats()
+    except Exception as e:
+        logger.error(f"Critical error in fetch-only run: {str(e)}", exc_info=True)
+    finally:
+        options.FetchOnly = False
+        close_state()
+    logger.info("Security feed extraction completed")
+
+def run_replay_outbox():
+    """Only re-send the Notion pages left in the outbox by earlier runs (no feeds, no LLM)"""
+    logger.info("Replaying the Notion outbox")
+    try:
+        open_state(extras=False)
+        state_store.start_run()
+        generate_and_publish([])
+        log_feed_stats()
+        export_metrics()
+        state_store.finish_run(stats)
+    except Exception as e:
+        logger.error(f"Critical error while replaying the outbox: {str(e)}", exc_info=True)
+    finally:
+        close_state()
+    logger.info("Notion outbox replay completed")
+
+def run_resume():
+    """Finish the articles earlier runs left in the queue and replay the outbox, without fetching the feeds"""
+    logger.info("Resuming unfinished articles (feeds are not fetched)")
+    try:
+        open_state(extras=False)
+        state_store.start_run()
+        jobs = resumable_jobs()
+        if not jobs:
+            logger.info(f"No unfinished articles in {state_store.path}")
+        generate_and_publish(jobs)
+        log_feed_stats()
+        export_metrics()
+        state_store.finish_run(stats)
+    except Exception as e:
+        logger.error(f"Critical error while resuming: {str(e)}", exc_info=True)
+    finally:
+        close_state()
+    logger.info("Resume completed")
+
+def run_dry_run():
+    """Log what a run would do from Feed.csv and state.db, without any network request"""
+    logger.info("Dry run: no feed, LLM or Notion requests are made")
+    try:
+        open_state(extras=False, readonly=True)
+        feeds = read_feeds(register=False)
+        if feeds is None:
+            return
+        active_list = [(info['url'], name) for name, info in feeds.items() if not info['url'].startswith('#')]
+        logger.info(f"{len(active_list)} of {len(feeds)} feeds would be fetched:")
+        for url, name in active_list:
+            cursor = state_store.get_cursor(name)
+            download = 'conditional GET' if state_store.get(name) else 'full download'
+            logger.info(f"- {name}: {url} (cursor {cursor or 'none, 14-day window'}, {download})")
+        logger.info(f"Articles in state.db by status: {state_store.article_counts() or 'none'}")
+        logger.info(f"Unfinished articles the next run would resume: "
+                    f"{len(state_store.incomplete_articles())}")
+        logger.info(f"Notion pages waiting in the outbox: {state_store.outbox_count()}")
+        if not NOTION_API_TOKEN:
+            logger.warning("NOTION_API_TOKEN is not set: pages would not be written")
+    except Exception as e:
+        logger.error(f"Critical error in dry run: {str(e)}", exc_info=True)
+    finally:
+        close_state()
+
+def run_merge_shards(paths=None):
+    """Fold the shard state files (default: all of them next to state.db) back into state.db"""
+    from sharding import merge_shards, shard_files
+    paths = paths or shard_files()
+    if not paths:
+        logger.warning("No shard state files to merge")
+        return
+    logger.info(f"Merging {len(paths)} shard state files into {STATE_DB_PATH}")
+    try:
+        combined = merge_shards(paths)
+    except Exception as e:
+        logger.error(f"Unable to merge the shard state files: {str(e)}", exc_info=True)
+        return
+    # Mesmo resumo de uma execução normal, com os contadores somados dos shards
+    stats.update({key: value for key, value in combined.items() if key in stats and key != 'errors'})
+    log_feed_stats()
+    logger.info(f"{combined['shards']} shards merged, {combined.get('error_count', 0)} errors in their runs")
+
+def run_notion_status():
+    """Sync the Notion mirror and log the pages by flow_status and source (dashboard without API queries)"""
+    logger.info("Notion database status")
+    try:
+        open_notion_mirror()
+        if not notion_mirror:
+            return
+        if NOTION_API_TOKEN:
+            sync_notion_mirror()
+        else:
+            logger.warning("NOTION_API_TOKEN is not set: showing the mirror as of its last sync")
+        logger.info(f"Pages by flow_status: {notion_mirror.counts_by_status() or 'none'}")
+        logger.info(f"Pages by source: {notion_mirror.counts_by_source() or 'none'}")
+        for page in notion_mirror.pages(limit=5):
+            logger.info(f"- {page['created']} [{', '.join(page['flow_status'])}] {page['title']}")
+    except Exception as e:
+        logger.error(f"Critical error while reading the Notion database: {str(e)}", exc_info=True)
+    finally:
+        close_state()
+
+def run_publish():
+    """Post the queued Notion pages (flow_status START) to LinkedIn if LINKEDIN_PUBLISH_INTERVAL allows"""
+    from linkedin_publisher import LinkedInClient, PublishQueue
+    logger.info("Publishing queued Notion pages on LinkedIn")
+    if not NOTION_API_TOKEN:
+        logger.error("NOTION_API_TOKEN is not set: the LinkedIn queue lives in Notion")
+        return
+    queue = None
+    try:
+        open_state(extras=False)
+        queue = PublishQueue(LinkedInClient(), state_store, NOTION_API_TOKEN)
+        published = queue.publish_due()
+        logger.info(f"{published} posts published on LinkedIn, {queue.failed} failed")
+    except Exception as e:
+        logger.error(f"Critical error while publishing on LinkedIn: {str(e)}", exc_info=True)
+    finally:
+        if queue:
+            queue.close()
+        close_state()
+
+def run_linkedin_auth():
+    """Interactive OAuth: print the authorization URL, exchange the code and cache the token"""
+    from linkedin_publisher import LinkedInClient
+    client = LinkedInClient()
+    auth_url, _ = client.authorization_url()
+    print(f"1. Open: {auth_url}")
+    print("2. Authorize the app")
+    code = input("3. Paste the code from the redirect URL: ").strip()
+    try:
+        client.exchange_code(code)
+        print(f"Token saved to {client.tokens.path}, author {client.author_urn()}")
+    finally:
+        client.close()
+
+def publish_linkedin(queue):
+    """Daemon step: publish the next queued post when it is due; errors never stop the daemon"""
+    try:
+        queue.publish_due()
+    except Exception as e:
+        logger.error(f"LinkedIn publishing failed: {e}")
+        queue.idle_until = time.time() + queue.poll
+
+def run_daemon():
+    """Stay resident and poll each feed on its own adaptive schedule until SIGTERM/SIGINT"""
+    stop = threading.Event()
+
+    def request_stop(signum, frame):
+        if stop.is_set():
+            # Segundo sinal: interrompe o ciclo em andamento
+            raise KeyboardInterrupt
+        logger.info(f"Received signal {signum}, finishing the current cycle before shutting down")
+        stop.set()
+
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(sig, request_stop)
+    from feed_fetcher import create_session
+    from linkedin_publisher import LINKEDIN_PUBLISH, LinkedInClient, PublishQueue
+    logger.info("Starting security feed extraction daemon")
+    # Sessões e clientes quentes, reaproveitados em todos os ciclos
+    session = create_session()
+    writer = None
+    generator = None
+    scheduler = None
+    publisher = None
+    try:
+        open_state()
+        if NOTION_API_TOKEN:
+            writer = create_notion_writer()
+            if LINKEDIN_PUBLISH:
+                publisher = PublishQueue(LinkedInClient(), state_store, NOTION_API_TOKEN)
+        scheduler = FeedScheduler(state_store)
+        feeds, feeds_mtime = {}, None
+        while not stop.is_set():
+            mtime = feed_csv_path.stat().st_mtime if feed_csv_path.exists() else None
+            if mtime != feeds_mtime:
+                # Feed.csv só é relido quando muda
+                feeds = read_feeds(echo=False) or {}
+                feeds_mtime = mtime
+                scheduler.sync(name for name, info in feeds.items() if not info['url'].startswith('#'))
+            due = scheduler.due()
+            if due:
+                active_list = [(info['url'], name) for name, info in feeds.items() if feed_key(name) in due]
+                if generator is None:
+                    try:
+                        generator = create_generator()
+                    except Exception as e:
+                        # generate_posts() tenta de novo e registra a falha nos artigos
+                        logger.error(f"Unable to create LLM provider: {e}")
+                run_cycle(active_list, scheduler, session, writer, generator)
+            wait = scheduler.seconds_until_next()
+            if publisher:
+                if publisher.seconds_until_next_pass() <= 0:
+                    publish_linkedin(publisher)
+                wait = min(wait, publisher.seconds_until_next_pass())
+            stop.wait(wait)
+    except KeyboardInterrupt:
+        logger.warning("Interrupted, shutting down without finishing the cycle")
+    except Exception as e:
+        logger.error(f"Critical error in daemon loop: {str(e)}", exc_info=True)
+    finally:
+        if scheduler:
+            scheduler.save()
+        if writer:
+            collect_notion_results(writer)
+            writer.close()
+        if generator:
+            generator.close()
+        if publisher:
+            publisher.close()
+        session.close()
+        close_state()
+    logger.info("Security feed extraction daemon stopped")
+
+def run_cycle(active_list, scheduler, session, writer, generator):
+    """One daemon cycle over the feeds that are due: same stages and run record as a one-shot run"""
+    reset_stats()
+    state_store.start_run()
+    logger.info(f"Polling {len(active_list)} due feeds")
+    sync_notion_mirror()
+
+    def reschedule(result, new_entries):
+        scheduler.record(result.RssItem[1], new_entries, changed=not result.not_modified,
+                         error=bool(result.error), hint=server_hint(result))
+
+    try:
+        jobs = resumable_jobs()
+        jobs += fetch_new_articles(active_list, session, on_result=reschedule)
+        generate_and_publish(jobs, writer, generator)
+    finally:
+        scheduler.save()
+    log_feed_stats()
+    export_metrics()
+    state_store.finish_run(stats)
+    prune_state(PRUNE_INTERVAL)
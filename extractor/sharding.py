@@ -0,0 +1,304 @@
+"""Split Feed.csv across several workers (--shard i/N) and merge their state back into state.db
+
+Every feed belongs to exactly one of N shards, chosen by a jump consistent
+hash of its name: the split is stable between runs, and going from N to
+N+1 shards only moves about 1/(N+1) of the feeds. A shard works on its own
+copy of the state (`state.shard-<i>-of-<N>.db`), seeded from state.db with
+only the rows of its feeds and held under an exclusive lock for the whole
+run, so two processes can never work on the same feeds at once.
+`--merge-shards` folds the shard files back into state.db: cursors,
+validators and schedules of each shard's own feeds, its new and updated
+articles, its Notion outbox and one combined run record.
+"""
+import hashlib
+import json
+import logging
+import re
+import sqlite3
+import time
+from pathlib import Path
+
+from state_store import STATE_DB_PATH, StateStore, feed_key
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem trava entre processos
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+SHARD_SPEC = re.compile(r'^\s*(\d+)\s*/\s*(\d+)\s*$')
+# Tabelas com uma linha por feed: a do shard substitui a do state.db
+FEED_TABLES = {
+    'feeds': ('name', 'cursor', 'updated_at', 'cursor_ids', 'undated_ids'),
+    'validators': ('name', 'etag', 'modified', 'sha256'),
+    'schedule': ('name', 'interval', 'next_due', 'updated_at'),
+}
+# Chaves de meta que só fazem sentido no arquivo do shard
+SHARD_META = ('shard', 'shard_article_seed', 'shard_outbox_seed', 'shard_seeded_at', 'shard_merged_at')
+
+
+class ShardError(Exception):
+    pass
+
+
+def parse_shard(spec):
+    """'i/N' -> (i, N) with 0 <= i < N (the form of a matrix job index and total)"""
+    match = SHARD_SPEC.match(spec or '')
+    if not match:
+        raise ShardError(f"invalid shard '{spec}', expected i/N such as 0/4")
+    index, count = int(match.group(1)), int(match.group(2))
+    if count < 1 or index >= count:
+        raise ShardError(f"invalid shard '{spec}': the index must be between 0 and N-1")
+    return index, count
+
+
+def jump_hash(key, buckets):
+    """Jump consistent hash (Lamping & Veach): 64-bit key -> bucket in [0, buckets)"""
+    bucket, candidate = -1, 0
+    while candidate < buckets:
+        bucket = candidate
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        candidate = int((bucket + 1) * (float(1 << 31) / float((key >> 33) + 1)))
+    return bucket
+
+
+def shard_of(name, count):
+    digest = hashlib.sha256(feed_key(name).encode('utf-8')).digest()
+    return jump_hash(int.from_bytes(digest[:8], 'big'), count)
+
+
+def shard_state_path(index, count, base=STATE_DB_PATH):
+    base = Path(base)
+    return base.with_name(f"{base.stem}.shard-{index}-of-{count}{base.suffix}")
+
+
+class Shard:
+    """One worker's slice of Feed.csv and its state file"""
+
+    def __init__(self, index, count, base_path=STATE_DB_PATH):
+        self.index = index
+        self.count = count
+        self.base_path = Path(base_path)
+        self.path = shard_state_path(index, count, base_path)
+        self._lock_file = None
+
+    @property
+    def label(self):
+        return f"{self.index}/{self.count}"
+
+    def rate(self, value):
+        """This shard's part of a rate limit meant for all N shards together (0, no limit, stays 0)"""
+        return value / self.count
+
+    def owns(self, name):
+        return shard_of(name, self.count) == self.index
+
+    def owns_page(self, feed):
+        """Owner of a row by its feed name; rows without a feed (outbox pages with no article) go to shard 0"""
+        return self.owns(feed) if feed is not None else self.index == 0
+
+    def lock(self):
+        """Hold an exclusive lock on the shard until release(); fails if another process has it"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock_file = open(self.path.with_name(self.path.name + '.lock'), 'w')
+        if fcntl is None:
+            return
+        try:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            self._lock_file.close()
+            self._lock_file = None
+            raise ShardError(f"shard {self.label} is already running ({self.path}.lock is held)")
+
+    def release(self):
+        if self._lock_file:
+            # Fechar o arquivo solta a trava
+            self._lock_file.close()
+            self._lock_file = None
+
+    def unmerged(self):
+        """True when the shard file holds work that was never merged into state.db"""
+        if not self.path.exists():
+            return False
+        store = StateStore(self.path, readonly=True)
+        try:
+            return not store.get_meta('shard_merged_at')
+        finally:
+            store.close()
+
+    def current_path(self):
+        """The state this shard would start from, for read-only runs that do not prepare() it"""
+        return self.path if self.unmerged() else self.base_path
+
+    def prepare(self):
+        """Seed the shard file from state.db unless it still holds work that was never merged"""
+        if self.unmerged():
+            logger.warning(f"Reusing {self.path}: it was never merged into {self.base_path}")
+            return self.path
+        for suffix in ('', '-wal', '-shm'):
+            Path(str(self.path) + suffix).unlink(missing_ok=True)
+        if self.base_path.exists():
+            source = sqlite3.connect(f"file:{self.base_path}?mode=ro", uri=True)
+            target = sqlite3.connect(str(self.path))
+            try:
+                source.backup(target)
+            finally:
+                source.close()
+                target.close()
+        store = StateStore(self.path)
+        try:
+            self._prune(store)
+        finally:
+            store.close()
+        return self.path
+
+    def _prune(self, store):
+        """Drop everything that belongs to the other shards and remember where new rows start"""
+        store.conn.create_function('owned', 1, self.owns_page)
+        with store.transaction() as conn:
+            conn.execute("DELETE FROM notion_outbox WHERE NOT owned("
+                         "(SELECT feed FROM articles WHERE articles.id = notion_outbox.article_id))")
+            for table in FEED_TABLES:
+                conn.execute(f"DELETE FROM {table} WHERE NOT owned(name)")
+            conn.execute("DELETE FROM articles WHERE NOT owned(feed)")
+            conn.execute("DELETE FROM runs")
+            conn.execute("DELETE FROM meta WHERE key LIKE 'shard%'")
+            article_seed = conn.execute("SELECT COALESCE(MAX(id), 0) FROM articles").fetchone()[0]
+            outbox_seed = conn.execute("SELECT COALESCE(MAX(id), 0) FROM notion_outbox").fetchone()[0]
+            conn.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", [
+                ('shard', self.label), ('shard_article_seed', str(article_seed)),
+                ('shard_outbox_seed', str(outbox_seed)), ('shard_seeded_at', str(time.time())),
+            ])
+        store.conn.execute("VACUUM")
+
+
+def shard_files(base=STATE_DB_PATH):
+    """The shard state files next to state.db"""
+    base = Path(base)
+    return sorted(base.parent.glob(f"{base.stem}.shard-*-of-*{base.suffix}"))
+
+
+def combine_stats(summaries):
+    """Sum the numeric counters of several run summaries; per-feed dicts are merged"""
+    combined = {}
+    for summary in summaries:
+        for key, value in summary.items():
+            if isinstance(value, bool) or not isinstance(value, (int, float, dict)):
+                combined.setdefault(key, value)
+            elif isinstance(value, dict):
+                combined.setdefault(key, {}).update(value)
+            else:
+                combined[key] = combined.get(key, 0) + value
+    return combined
+
+
+def merge_shards(paths, target_path=STATE_DB_PATH):
+    """Fold shard state files into state.db; returns the combined stats of their runs
+
+    Files already merged are skipped, so running the merge twice is harmless.
+    All files must come from the same shard count.
+    """
+    shards = []
+    try:
+        for path in paths:
+            store = StateStore(path)
+            spec = store.get_meta('shard')
+            if not spec or store.get_meta('shard_merged_at'):
+                store.close()
+                if not spec:
+                    raise ShardError(f"{path} is not a shard state file")
+                logger.info(f"Skipping {path}: already merged")
+                continue
+            shard = Shard(*parse_shard(spec), base_path=target_path)
+            shard.path = Path(path)
+            shards.append((shard, store))
+            # Um shard ainda em execução não pode ser fundido pela metade
+            shard.lock()
+        counts = {shard.count for shard, _ in shards}
+        if len(counts) > 1:
+            raise ShardError(f"shard files from different shard counts: {sorted(counts)}")
+        indexes = [shard.index for shard, _ in shards]
+        if len(indexes) != len(set(indexes)):
+            raise ShardError("more than one file for the same shard")
+        if counts:
+            missing = set(range(counts.pop())) - set(indexes)
+            if missing:
+                logger.warning(f"No state for shards {sorted(missing)}: their feeds keep the previous state")
+        target = StateStore(target_path)
+        summaries, started, finished = [], [], []
+        try:
+            # Os artigos novos dos shards ficam ligados ao registro combinado da execução
+            run_id = target.start_run() if shards else None
+            for shard, store in shards:
+                summaries.extend(_merge_one(shard, store, target, run_id, started, finished))
+                store.set_meta('shard_merged_at', str(time.time()))
+                logger.info(f"Merged shard {shard.label} from {store.path}")
+            combined = combine_stats(summaries)
+            combined['shards'] = len(shards)
+            if run_id is not None:
+                with target.transaction() as conn:
+                    conn.execute("UPDATE runs SET started_at = ?, finished_at = ?, stats = ? WHERE id = ?",
+                                 (min(started, default=time.time()), max(finished, default=time.time()),
+                                  json.dumps(combined, sort_keys=True), run_id))
+        finally:
+            target.close()
+        return combined
+    finally:
+        for shard, store in shards:
+            store.close()
+            shard.release()
+
+
+def _merge_one(shard, store, target, run_id, started, finished):
+    source = store.conn
+    article_seed = int(store.get_meta('shard_article_seed') or 0)
+    outbox_seed = int(store.get_meta('shard_outbox_seed') or 0)
+    seeded_at = float(store.get_meta('shard_seeded_at') or 0)
+    with target.transaction() as conn:
+        for table, columns in FEED_TABLES.items():
+            rows = [row for row in source.execute(f"SELECT {', '.join(columns)} FROM {table}")
+                    if shard.owns(row[0])]
+            conn.executemany(f"INSERT OR REPLACE INTO {table} ({', '.join(columns)}) "
+                             f"VALUES ({', '.join('?' * len(columns))})", rows)
+        # Artigos que já estavam no state.db mantêm o id; os novos ganham um id novo
+        conn.executemany("UPDATE articles SET status = ?, error = ?, content = ?, attempts = ?, updated_at = ? "
+                         "WHERE id = ?", [
+            row[1:] + (row[0],) for row in source.execute(
+                "SELECT id, status, error, content, attempts, updated_at FROM articles WHERE id <= ? AND updated_at > ?",
+                (article_seed, seeded_at))])
+        article_ids = {}
+        for row in source.execute("SELECT id, feed, link, title, published, status, error, run_id, created_at, "
+                                  "updated_at, source, entry_id, summary, content, attempts FROM articles "
+                                  "WHERE id > ? ORDER BY id", (article_seed,)):
+            article_ids[row[0]] = conn.execute(
+                "INSERT INTO articles (feed, link, title, published, status, error, run_id, created_at, updated_at, "
+                "source, entry_id, summary, content, attempts) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                row[1:7] + (run_id,) + row[8:]).lastrowid
+        # Outbox: as páginas do shard que sumiram do arquivo dele foram entregues ao Notion
+        kept = {row[0]: row[1:] for row in source.execute(
+            "SELECT id, status, attempts, last_error, updated_at FROM notion_outbox WHERE id <= ?", (outbox_seed,))}
+        seeded = conn.execute("SELECT o.id, a.feed FROM notion_outbox o LEFT JOIN articles a ON a.id = o.article_id "
+                              "WHERE o.id <= ?", (outbox_seed,)).fetchall()
+        for outbox_id in (outbox_id for outbox_id, feed in seeded if shard.owns_page(feed)):
+            if outbox_id in kept:
+                conn.execute("UPDATE notion_outbox SET status = ?, attempts = ?, last_error = ?, updated_at = ? "
+                             "WHERE id = ?", kept[outbox_id] + (outbox_id,))
+            else:
+                conn.execute("DELETE FROM notion_outbox WHERE id = ?", (outbox_id,))
+        for row in source.execute("SELECT article_id, title, payload, status, attempts, last_error, created_at, "
+                                  "updated_at FROM notion_outbox WHERE id > ? ORDER BY id", (outbox_seed,)):
+            article_id = article_ids.get(row[0], row[0])
+            conn.execute("INSERT INTO notion_outbox (article_id, title, payload, status, attempts, last_error, "
+                         "created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", (article_id,) + row[1:])
+        for key, value in source.execute("SELECT key, value FROM meta"):
+            if key not in SHARD_META:
+                conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES (?, ?)", (key, value))
+    summaries = []
+    for run_started, run_finished, stats in source.execute(
+            "SELECT started_at, finished_at, stats FROM runs WHERE stats IS NOT NULL ORDER BY id"):
+        summaries.append(json.loads(stats))
+        started.append(run_started)
+        finished.append(run_finished or run_started)
+    return summaries
+
@@ -0,0 +1,493 @@
+"""Transactional SQLite state for sec-feed-extract.py (replaces Config.txt)
+
+    python state_store.py digest [state.db]
+"""
+import argparse
+import configparser
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+STATE_DB_PATH = os.getenv('STATE_DB_PATH', 'state.db')
+CURSOR_FORMAT = '%Y-%m-%dT%H:%M:%S'
+# Tentativas por artigo antes de a fila desistir dele (falhas do LLM ou execuções interrompidas)
+RESUME_MAX_ATTEMPTS = int(os.getenv('RESUME_MAX_ATTEMPTS', '3'))
+# state.db vai para o git a cada execução: artigos concluídos e execuções mais antigos que isso saem
+STATE_RETENTION_DAYS = float(os.getenv('STATE_RETENTION_DAYS', '30'))
+
+# Estados de um artigo no pipeline: fetched (na fila, resumo salvo) -> generated (post salvo)
+# -> página no outbox do Notion -> written
+STATUS_FETCHED = 'fetched'
+STATUS_GENERATED = 'generated'
+STATUS_WRITTEN = 'written'
+STATUS_FAILED = 'failed'
+# Descartado pela triagem de relevância (nunca chegou ao modelo grande)
+STATUS_SKIPPED = 'skipped'
+# Estado final: resumo e post não servem mais para nada e saem da linha (summary/content = NULL)
+FINISHED = f"(status IN ('{STATUS_WRITTEN}', '{STATUS_SKIPPED}') OR (status = '{STATUS_FAILED}' AND attempts >= ?))"
+# ... ou abandonado: sem tentativas, de uma execução anterior e sem página pendente no outbox
+GIVEN_UP = ("(attempts >= ? AND (run_id IS NULL OR run_id != ?) AND NOT EXISTS (SELECT 1 FROM notion_outbox o "
+            "WHERE o.article_id = articles.id AND o.status = 'pending'))")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS feeds (
+    name TEXT PRIMARY KEY,
+    cursor TEXT,
+    updated_at REAL,
+    cursor_ids TEXT,
+    undated_ids TEXT
+);
+CREATE TABLE IF NOT EXISTS validators (
+    name TEXT PRIMARY KEY,
+    etag TEXT,
+    modified TEXT,
+    sha256 TEXT
+);
+CREATE TABLE IF NOT EXISTS articles (
+    id INTEGER PRIMARY KEY,
+    feed TEXT NOT NULL,
+    link TEXT,
+    title TEXT,
+    published TEXT,
+    status TEXT NOT NULL,
+    error TEXT,
+    run_id INTEGER,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    source TEXT,
+    entry_id TEXT,
+    summary TEXT,
+    content TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS articles_feed_status ON articles(feed, status);
+CREATE TABLE IF NOT EXISTS notion_outbox (
+    id INTEGER PRIMARY KEY,
+    article_id INTEGER,
+    title TEXT,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS notion_outbox_status ON notion_outbox(status);
+CREATE TABLE IF NOT EXISTS schedule (
+    name TEXT PRIMARY KEY,
+    interval REAL NOT NULL,
+    next_due REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    started_at REAL NOT NULL,
+    finished_at REAL,
+    stats TEXT
+);
+"""
+# Colunas acrescentadas depois da criação do schema (bancos antigos recebem ALTER TABLE)
+ADDED_COLUMNS = {
+    'feeds': (('cursor_ids', 'TEXT'), ('undated_ids', 'TEXT')),
+    'articles': (('source', 'TEXT'), ('entry_id', 'TEXT'), ('summary', 'TEXT'), ('content', 'TEXT'),
+                 ('attempts', 'INTEGER NOT NULL DEFAULT 0')),
+}
+# O que precisa sobreviver entre execuções; runs e os updated_at mudam a cada execução e ficam de fora
+DURABLE_QUERIES = (
+    "SELECT key, value FROM meta ORDER BY key",
+    "SELECT name, cursor, cursor_ids, undated_ids FROM feeds ORDER BY name",
+    "SELECT name, etag, modified, sha256 FROM validators ORDER BY name",
+    "SELECT id, feed, status, attempts FROM articles ORDER BY id",
+    "SELECT id, article_id, status, attempts FROM notion_outbox ORDER BY id",
+    "SELECT name, interval FROM schedule ORDER BY name",
+)
+
+
+def feed_key(name):
+    """Feed names are case-insensitive, as they were as Config.txt options"""
+    return name.strip().lower()
+
+
+def durable_digest(path):
+    """sha256 of the state a later run depends on (cursors, validators, queue, outbox), read-only.
+
+    The workflows commit state.db only when this changes, not on every run.
+    """
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        digest = hashlib.sha256()
+        for query in DURABLE_QUERIES:
+            try:
+                rows = conn.execute(query).fetchall()
+            except sqlite3.OperationalError:
+                # Banco anterior a alguma tabela/coluna
+                rows = []
+            digest.update(json.dumps(rows, ensure_ascii=False).encode('utf-8'))
+        return digest.hexdigest()
+    finally:
+        conn.close()
+
+
+def parse_cursor(value):
+    """Cursor string -> naive UTC datetime (None for '?' or unparseable values)"""
+    if not value or value.endswith('?'):
+        return None
+    try:
+        return datetime.strptime(value[:19], CURSOR_FORMAT)
+    except ValueError:
+        return None
+
+
+class StateStore:
+    """Per-feed cursors, HTTP validators, per-article status and run history.
+
+    Every update is its own small transaction in a WAL-mode database, so a
+    crash can lose at most the statement in flight, never the whole file.
+    """
+
+    def __init__(self, path=STATE_DB_PATH, readonly=False):
+        self.path = Path(path)
+        self.readonly = readonly
+        self._lock = threading.RLock()
+        # O estágio de download lê os validadores a partir de outras threads
+        if readonly:
+            # Cópia em memória (--dry-run, --fetch-only): o esquema e as colunas novas não tocam o arquivo
+            self.conn = sqlite3.connect(':memory:', check_same_thread=False, isolation_level=None)
+            if self.path.exists():
+                source = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+                try:
+                    source.backup(self.conn)
+                finally:
+                    source.close()
+        else:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self._add_missing_columns()
+        self.run_id = None
+
+    def _add_missing_columns(self):
+        for table, columns in ADDED_COLUMNS.items():
+            existing = {row[1] for row in self.conn.execute(f"PRAGMA table_info({table})")}
+            for name, kind in columns:
+                if name not in existing:
+                    self.conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {kind}")
+
+    @contextmanager
+    def transaction(self):
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self.conn
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.conn.execute("COMMIT")
+
+    # --- meta / migração ---
+
+    def get_meta(self, key):
+        with self._lock:
+            row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key, value):
+        with self.transaction() as conn:
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def migrate_legacy(self, config_path='Config.txt', validators_path='FeedValidators.json'):
+        """Import Config.txt cursors and FeedValidators.json once, on the first run"""
+        if self.get_meta('legacy_migrated'):
+            return False
+        imported_feeds = imported_validators = 0
+        with self.transaction() as conn:
+            if Path(config_path).exists():
+                legacy = configparser.RawConfigParser()
+                legacy.read(config_path)
+                for section in legacy.sections():
+                    if section.lower() != 'rss':
+                        continue
+                    for name, value in legacy.items(section):
+                        cursor = parse_cursor(value)
+                        conn.execute(
+                            "INSERT OR IGNORE INTO feeds (name, cursor, updated_at) VALUES (?, ?, ?)",
+                            (feed_key(name), cursor.strftime(CURSOR_FORMAT) if cursor else None, time.time()))
+                        imported_feeds += 1
+            if Path(validators_path).exists():
+                try:
+                    with open(validators_path, 'r', encoding='utf-8') as f:
+                        legacy_validators = json.load(f)
+                except (OSError, ValueError) as e:
+                    logger.warning(f"Ignoring unreadable {validators_path}: {e}")
+                    legacy_validators = {}
+                for name, values in legacy_validators.items():
+                    conn.execute(
+                        "INSERT OR IGNORE INTO validators (name, etag, modified, sha256) VALUES (?, ?, ?, ?)",
+                        (feed_key(name), values.get('etag'), values.get('modified'), values.get('sha256')))
+                    imported_validators += 1
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('legacy_migrated', ?)",
+                         (datetime.utcnow().strftime(CURSOR_FORMAT),))
+        logger.info(f"Migrated {imported_feeds} feed cursors from {config_path} and "
+                    f"{imported_validators} validators from {validators_path} into {self.path}")
+        return True
+
+    # --- cursores por feed ---
+
+    def ensure_feed(self, name):
+        with self.transaction() as conn:
+            conn.execute("INSERT OR IGNORE INTO feeds (name, cursor, updated_at) VALUES (?, NULL, ?)",
+                         (feed_key(name), time.time()))
+
+    def feed_names(self):
+        with self._lock:
+            return [row[0] for row in self.conn.execute("SELECT name FROM feeds ORDER BY name")]
+
+    def get_cursor(self, name):
+        """Last processed publication time of a feed as a naive UTC datetime, or None"""
+        with self._lock:
+            row = self.conn.execute("SELECT cursor FROM feeds WHERE name = ?", (feed_key(name),)).fetchone()
+        return parse_cursor(row[0]) if row else None
+
+    def get_cursor_state(self, name):
+        """(cursor, ids of the entries published exactly at the cursor, ids of processed undated entries)
+
+        The id set is None for cursors written before ids were tracked: every
+        entry at the cursor time then counts as already processed.
+        """
+        with self._lock:
+            row = self.conn.execute("SELECT cursor, cursor_ids, undated_ids FROM feeds WHERE name = ?",
+                                    (feed_key(name),)).fetchone()
+        if not row:
+            return None, None, set()
+        cursor_ids = set(json.loads(row[1])) if row[1] is not None else None
+        return parse_cursor(row[0]), cursor_ids, set(json.loads(row[2] or '[]'))
+
+    def set_cursor(self, name, dt_obj, cursor_ids=(), undated_ids=()):
+        with self.transaction() as conn:
+            self._set_cursor(conn, name, dt_obj, cursor_ids, undated_ids)
+
+    def _set_cursor(self, conn, name, dt_obj, cursor_ids, undated_ids):
+        conn.execute(
+            "INSERT INTO feeds (name, cursor, updated_at, cursor_ids, undated_ids) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET cursor = excluded.cursor, updated_at = excluded.updated_at, "
+            "cursor_ids = excluded.cursor_ids, undated_ids = excluded.undated_ids",
+            (feed_key(name), dt_obj.strftime(CURSOR_FORMAT) if dt_obj else None, time.time(),
+             json.dumps(sorted(cursor_ids)) if cursor_ids is not None else None,
+             json.dumps(sorted(undated_ids))))
+
+    # --- agenda do modo daemon ---
+
+    def get_schedules(self):
+        """{feed: (interval seconds, next due epoch)}"""
+        with self._lock:
+            return {name: (interval, next_due) for name, interval, next_due in
+                    self.conn.execute("SELECT name, interval, next_due FROM schedule")}
+
+    def set_schedules(self, schedules):
+        with self.transaction() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO schedule (name, interval, next_due, updated_at) VALUES (?, ?, ?, ?)",
+                [(feed_key(name), interval, next_due, time.time()) for name, (interval, next_due) in schedules.items()])
+
+    # --- validadores HTTP (mesma interface usada por feed_fetcher) ---
+
+    def get(self, name):
+        with self._lock:
+            row = self.conn.execute("SELECT etag, modified, sha256 FROM validators WHERE name = ?",
+                                    (feed_key(name),)).fetchone()
+        if not row:
+            return {}
+        return {k: v for k, v in zip(('etag', 'modified', 'sha256'), row) if v}
+
+    def update(self, name, values):
+        if not values:
+            return
+        with self.transaction() as conn:
+            conn.execute("INSERT OR REPLACE INTO validators (name, etag, modified, sha256) VALUES (?, ?, ?, ?)",
+                         (feed_key(name), values.get('etag'), values.get('modified'), values.get('sha256')))
+
+    # --- artigos ---
+
+    def enqueue_articles(self, feed, articles, dt_obj, cursor_ids=(), undated_ids=()):
+        """Queue a feed's new articles and move its cursor past them in one transaction.
+
+        `articles` are (entry id, link, title, summary, published) tuples.
+        Either both the queue rows and the cursor are saved or neither is, so
+        an article is never behind the cursor without being in the queue.
+        Returns the article ids.
+        """
+        now = time.time()
+        with self.transaction() as conn:
+            ids = [conn.execute(
+                "INSERT INTO articles (feed, source, entry_id, link, title, summary, published, status, attempts, "
+                "run_id, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, 1, ?, ?, ?)",
+                (feed_key(feed), feed, entry_id, link, title, summary, published, STATUS_FETCHED, self.run_id,
+                 now, now)).lastrowid for entry_id, link, title, summary, published in articles]
+            self._set_cursor(conn, feed, dt_obj, cursor_ids, undated_ids)
+        return ids
+
+    def set_article_status(self, article_id, status, error=None, max_attempts=RESUME_MAX_ATTEMPTS):
+        """Move an article to `status`; once it is finished its summary and generated post are dropped"""
+        if article_id is None:
+            return
+        with self.transaction() as conn:
+            conn.execute("UPDATE articles SET status = ?, error = ?, updated_at = ? WHERE id = ?",
+                         (status, str(error) if error else None, time.time(), article_id))
+            conn.execute(f"UPDATE articles SET summary = NULL, content = NULL WHERE id = ? AND {FINISHED} "
+                         "AND (summary IS NOT NULL OR content IS NOT NULL)", (article_id, max_attempts))
+
+    def set_article_generated(self, article_id, content):
+        """Keep the generated post with the article, so a later run can write it without calling the LLM again"""
+        if article_id is None:
+            return
+        with self.transaction() as conn:
+            conn.execute("UPDATE articles SET status = ?, content = ?, error = NULL, updated_at = ? WHERE id = ?",
+                         (STATUS_GENERATED, content, time.time(), article_id))
+
+    def incomplete_articles(self, max_attempts=RESUME_MAX_ATTEMPTS):
+        """Queued articles earlier runs did not finish: still fetched, generated but never handed to the
+        Notion outbox, or failed before reaching it, with fewer than `max_attempts` tries.
+
+        Rows are (id, source, entry_id, link, title, summary, published, content), oldest first.
+        """
+        with self._lock:
+            return self.conn.execute(
+                "SELECT a.id, COALESCE(a.source, a.feed), a.entry_id, a.link, a.title, a.summary, a.published, "
+                "a.content FROM articles a WHERE a.status IN (?, ?, ?) AND a.attempts < ? "
+                "AND a.summary IS NOT NULL AND (a.run_id IS NULL OR a.run_id != ?) "
+                "AND NOT EXISTS (SELECT 1 FROM notion_outbox o WHERE o.article_id = a.id) ORDER BY a.id",
+                (STATUS_FETCHED, STATUS_GENERATED, STATUS_FAILED, max_attempts, self.run_id or 0)).fetchall()
+
+    def claim_articles(self, article_ids):
+        """Count one more try for the articles a run is resuming"""
+        with self.transaction() as conn:
+            conn.executemany("UPDATE articles SET attempts = attempts + 1, run_id = ?, updated_at = ? WHERE id = ?",
+                             [(self.run_id, time.time(), article_id) for article_id in article_ids])
+
+    def article_counts(self):
+        """{status: number of articles}"""
+        with self._lock:
+            return dict(self.conn.execute("SELECT status, COUNT(*) FROM articles GROUP BY status"))
+
+    # --- outbox de páginas do Notion ---
+
+    def add_outbox(self, article_id, title, payload):
+        now = time.time()
+        with self.transaction() as conn:
+            return conn.execute(
+                "INSERT INTO notion_outbox (article_id, title, payload, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?)", (article_id, title, payload, now, now)).lastrowid
+
+    def pending_outbox(self, max_attempts):
+        with self._lock:
+            return self.conn.execute(
+                "SELECT id, article_id, title, payload FROM notion_outbox "
+                "WHERE status = 'pending' AND attempts < ? ORDER BY id", (max_attempts,)).fetchall()
+
+    def outbox_count(self):
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM notion_outbox WHERE status = 'pending'").fetchone()[0]
+
+    def remove_outbox(self, outbox_id):
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM notion_outbox WHERE id = ?", (outbox_id,))
+
+    def fail_outbox(self, outbox_id, error, dead=False):
+        with self.transaction() as conn:
+            conn.execute(
+                "UPDATE notion_outbox SET attempts = attempts + 1, last_error = ?, updated_at = ?, "
+                "status = CASE WHEN ? THEN 'dead' ELSE status END WHERE id = ?",
+                (str(error) if error else None, time.time(), 1 if dead else 0, outbox_id))
+
+    # --- histórico de execuções ---
+
+    def start_run(self):
+        with self.transaction() as conn:
+            self.run_id = conn.execute("INSERT INTO runs (started_at) VALUES (?)", (time.time(),)).lastrowid
+        return self.run_id
+
+    def finish_run(self, stats):
+        if self.run_id is None:
+            return
+        summary = {k: v for k, v in stats.items() if k != 'errors'}
+        summary['error_count'] = len(stats.get('errors', []))
+        with self.transaction() as conn:
+            conn.execute("UPDATE runs SET finished_at = ?, stats = ? WHERE id = ?",
+                         (time.time(), json.dumps(summary, sort_keys=True), self.run_id))
+
+    # --- retenção ---
+
+    def prune(self, max_attempts=RESUME_MAX_ATTEMPTS, days=STATE_RETENTION_DAYS):
+        """Drop the payload of every finished article (written, skipped, failed `max_attempts` times), then
+        delete finished articles, dead outbox pages and runs older than `days` and compact the file.
+        Returns the number of rows deleted."""
+        finished = f"(status IN ('{STATUS_WRITTEN}', '{STATUS_SKIPPED}') OR {GIVEN_UP})"
+        params = (max_attempts, self.run_id or 0)
+        with self.transaction() as conn:
+            # Linhas de antes da limpeza em set_article_status, ou interrompidas na última tentativa
+            released = conn.execute(f"UPDATE articles SET summary = NULL, content = NULL WHERE {finished} "
+                                    "AND (summary IS NOT NULL OR content IS NOT NULL)", params).rowcount
+        deleted = 0
+        if days > 0:
+            cutoff = time.time() - days * 86400
+            with self.transaction() as conn:
+                deleted = conn.execute(f"DELETE FROM articles WHERE updated_at < ? AND {finished}",
+                                       (cutoff,) + params).rowcount
+                deleted += conn.execute("DELETE FROM notion_outbox WHERE status = 'dead' AND updated_at < ?",
+                                        (cutoff,)).rowcount
+                deleted += conn.execute("DELETE FROM runs WHERE started_at < ? AND id != ?",
+                                        (cutoff, self.run_id or 0)).rowcount
+        if deleted or released:
+            # Sem VACUUM as páginas livres continuam no arquivo versionado
+            with self._lock:
+                self.conn.execute("VACUUM")
+        if deleted:
+            logger.info(f"Pruned {deleted} rows older than {days:g} days from {self.path}")
+        return deleted
+
+    def close(self):
+        """Fold the WAL back into the main file so state.db can be committed on its own"""
+        if self.readonly:
+            self.conn.close()
+            return
+        with self._lock:
+            try:
+                self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+                self.conn.execute("PRAGMA journal_mode=DELETE")
+            finally:
+                self.conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect the extractor state file")
+    commands = parser.add_subparsers(dest='command', required=True)
+    digest_parser = commands.add_parser('digest', help="hash of the durable state (what the workflows compare)")
+    digest_parser.add_argument('path', nargs='?', default=STATE_DB_PATH)
+    args = parser.parse_args(argv)
+
+    if args.command == 'digest':
+        if not Path(args.path).exists():
+            print(f"{args.path} not found", file=sys.stderr)
+            return 1
+        print(durable_digest(args.path))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
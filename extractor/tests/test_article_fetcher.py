@@ -0,0 +1,155 @@
+"""Article page enrichment: main-text extraction, token budget and the canonical-URL cache
+
+    python -m unittest discover -s extractor/tests
+"""
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent.parent
+sys.path.insert(0, str(ROOT / 'extractor'))
+sys.path.insert(0, str(ROOT / 'benchmarks'))
+
+from article_fetcher import FAILURE_TTL, ArticleEnricher, ArticleTextCache, truncate_to_tokens  # noqa: E402
+from articles import Article  # noqa: E402
+from fake_services import FakeServices  # noqa: E402
+from llm_generator import GenerationJob  # noqa: E402
+
+TEASER = 'Short teaser from the feed.'
+
+
+class ArticleEnricherTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.services = FakeServices(local_links=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.services.stop()
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = ArticleTextCache(Path(self.tmp.name) / 'article_text.sqlite')
+        self.enrichers = []
+
+    def tearDown(self):
+        for enricher in self.enrichers:
+            enricher.session.close()
+        self.cache.close()
+        self.tmp.cleanup()
+
+    def enricher(self, **kwargs):
+        enricher = ArticleEnricher(cache=self.cache, workers=2, **kwargs)
+        self.enrichers.append(enricher)
+        return enricher
+
+    def job(self, link, summary=TEASER):
+        article = Article(link, link, 'Title', summary, None, 'Feed')
+        return GenerationJob(('', 'Feed'), article, None)
+
+    def link(self, slug, query=''):
+        return f"{self.services.url}/articles/example.com/2026/{slug}.html{query}"
+
+    def page_requests(self):
+        return self.services.requests['articles']
+
+    def test_extracts_the_article_text_without_the_page_chrome(self):
+        job = self.job(self.link('openssh-hardening-guide'))
+
+        self.assertEqual(self.enricher().enrich([job]), 1)
+
+        self.assertIn('openssh hardening guide', job.body)
+        self.assertGreaterEqual(job.body.count('\n\n'), 3)
+        for chrome in ('Home', 'Most read', 'Related story', 'Share on', 'Subscribe', 'Copyright'):
+            self.assertNotIn(chrome, job.body)
+
+    def test_long_summaries_are_not_fetched(self):
+        before = self.page_requests()
+        job = self.job(self.link('kernel-release'), summary='word ' * 200)
+
+        self.assertEqual(self.enricher(min_summary=600).enrich([job]), 0)
+
+        self.assertIsNone(job.body)
+        self.assertEqual(self.page_requests(), before)
+
+    def test_text_is_cut_to_the_token_budget(self):
+        job = self.job(self.link('ansible-controller-upgrade'))
+
+        self.enricher(max_tokens=60).enrich([job])
+
+        self.assertLessEqual(len(job.body), 60 * 4 + 2)
+        self.assertTrue(job.body.endswith(' …'))
+
+    def test_truncation_prefers_a_paragraph_boundary(self):
+        text = 'a' * 150 + '\n\n' + 'b' * 150
+        self.assertEqual(truncate_to_tokens(text, max_tokens=50), 'a' * 150 + ' …')
+        self.assertEqual(truncate_to_tokens(text, max_tokens=100), text)
+
+    def test_syndicated_copies_share_one_download(self):
+        before = self.page_requests()
+        jobs = [self.job(self.link('xz-backdoor-analysis')),
+                self.job(self.link('xz-backdoor-analysis', '?utm_source=rss&utm_medium=feed')),
+                self.job(self.link('xz-backdoor-analysis', '#comments'))]
+
+        self.assertEqual(self.enricher().enrich(jobs), 3)
+
+        self.assertEqual(self.page_requests() - before, 1)
+        self.assertEqual(len({job.body for job in jobs}), 1)
+
+    def test_cached_pages_are_not_downloaded_again(self):
+        self.enricher().enrich([self.job(self.link('terraform-provider-update'))])
+        before = self.page_requests()
+        enricher = self.enricher()
+        job = self.job(self.link('terraform-provider-update', '?utm_campaign=weekly'))
+
+        enricher.enrich([job])
+
+        self.assertEqual(self.page_requests(), before)
+        self.assertEqual(enricher.cache_hits, 1)
+        self.assertIn('terraform provider update', job.body)
+
+
+class ArticleTextCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = ArticleTextCache(Path(self.tmp.name) / 'article_text.sqlite', ttl_days=7)
+
+    def tearDown(self):
+        self.cache.close()
+        self.tmp.cleanup()
+
+    def age(self, url, seconds):
+        self.cache.conn.execute("UPDATE article_text SET fetched_at = fetched_at - ? WHERE url = ?", (seconds, url))
+        self.cache.conn.commit()
+
+    def test_entries_expire_after_the_ttl(self):
+        self.cache.put('https://example.com/a', 'text')
+        self.age('https://example.com/a', 6 * 86400)
+        self.assertEqual(self.cache.get('https://example.com/a'), (True, 'text'))
+        self.age('https://example.com/a', 2 * 86400)
+        self.assertEqual(self.cache.get('https://example.com/a'), (False, None))
+
+    def test_failures_expire_sooner(self):
+        self.cache.put('https://example.com/gone', None, 'HTTPError: 404')
+        self.assertEqual(self.cache.get('https://example.com/gone'), (True, None))
+        self.age('https://example.com/gone', FAILURE_TTL + 1)
+        self.assertEqual(self.cache.get('https://example.com/gone'), (False, None))
+
+    def test_evict_deletes_only_expired_rows(self):
+        self.cache.put('https://example.com/old', 'text')
+        self.cache.put('https://example.com/failed', None, 'timeout')
+        self.cache.put('https://example.com/new', 'text')
+        self.age('https://example.com/old', 8 * 86400)
+        self.age('https://example.com/failed', FAILURE_TTL + 1)
+
+        self.assertEqual(self.cache.evict(), 2)
+
+        urls = {row[0] for row in self.cache.conn.execute("SELECT url FROM article_text")}
+        self.assertEqual(urls, {'https://example.com/new'})
+
+
+if __name__ == '__main__':
+    unittest.main()
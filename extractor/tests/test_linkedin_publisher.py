@@ -0,0 +1,95 @@
+"""LinkedIn client: token refresh (ahead of expiry and on 401) and retries on 429/5xx
+
+    python -m unittest discover -s extractor/tests
+"""
+import json
+import sys
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent.parent
+sys.path.insert(0, str(ROOT / 'extractor'))
+sys.path.insert(0, str(ROOT / 'benchmarks'))
+
+from fake_services import LINKEDIN_TOKEN, FakeServices  # noqa: E402
+from linkedin_publisher import AuthError, LinkedInClient, PublishError, TokenStore  # noqa: E402
+
+REFRESH_TOKEN = 'fake-refresh-token'
+
+
+class LinkedInClientTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.token_path = Path(self.tmp.name) / 'linkedin_tokens.json'
+
+    def client(self, tokens, **options):
+        services = FakeServices(**options).start()
+        self.addCleanup(services.stop)
+        self.token_path.write_text(json.dumps(tokens))
+        client = LinkedInClient(tokens=TokenStore(self.token_path), api_url=services.url,
+                                oauth_url=services.url + '/oauth/v2', client_id='id', client_secret='secret',
+                                author_urn='', refresh_margin=timedelta(days=7))
+        self.addCleanup(client.close)
+        return client, services
+
+    def saved_tokens(self):
+        return json.loads(self.token_path.read_text())
+
+    def test_token_is_refreshed_before_it_expires(self):
+        expires_at = (datetime.now() + timedelta(days=2)).isoformat()
+        client, services = self.client({'access_token': LINKEDIN_TOKEN, 'expires_at': expires_at,
+                                        'refresh_token': REFRESH_TOKEN})
+
+        client.publish('hello')
+
+        saved = self.saved_tokens()
+        self.assertNotEqual(saved['access_token'], LINKEDIN_TOKEN)
+        self.assertGreater(datetime.fromisoformat(saved['expires_at']), datetime.now() + timedelta(days=30))
+        self.assertEqual(len(services.posts), 1)
+
+    def test_rejected_token_is_refreshed_once_and_the_request_sent_again(self):
+        client, services = self.client({'access_token': 'revoked-token', 'refresh_token': REFRESH_TOKEN})
+
+        client.publish('hello')
+
+        self.assertEqual(len(services.posts), 1)
+        self.assertTrue(self.saved_tokens()['profile_urn'].startswith('urn:li:person:'))
+        # /v2/me com 401, refresh, /v2/me de novo e o post
+        self.assertEqual(services.requests['linkedin'], 4)
+
+    def test_rejected_refresh_token_raises_auth_error(self):
+        client, services = self.client({'access_token': 'revoked-token', 'refresh_token': 'revoked-refresh'})
+
+        with self.assertRaises(AuthError):
+            client.publish('hello')
+
+        self.assertEqual(services.posts, [])
+
+    def test_throttled_and_failed_posts_are_retried(self):
+        for status in (429, 503):
+            with self.subTest(status=status):
+                client, services = self.client({'access_token': LINKEDIN_TOKEN},
+                                               linkedin_fail_every=2, linkedin_fail_status=status)
+                with self.assertLogs('linkedin_publisher', 'WARNING'):
+                    ids = [client.publish(f'post {i}') for i in range(3)]
+
+                self.assertEqual(ids, ['urn:li:share:1', 'urn:li:share:2', 'urn:li:share:3'])
+
+    def test_gives_up_when_every_attempt_fails(self):
+        client, services = self.client({'access_token': LINKEDIN_TOKEN}, linkedin_fail_every=1,
+                                       linkedin_fail_status=502)
+
+        with self.assertRaises(PublishError) as raised, self.assertLogs('linkedin_publisher', 'WARNING'):
+            client.publish('hello')
+
+        self.assertTrue(raised.exception.retryable)
+        self.assertEqual(raised.exception.status_code, 502)
+        self.assertEqual(services.posts, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
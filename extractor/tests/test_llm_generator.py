@@ -0,0 +1,170 @@
+"""Generation stage: Retry-After and backoff on 429, and what goes into the LLM cache
+
+    python -m unittest discover -s extractor/tests
+"""
+import sys
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+ROOT = Path(__file__).resolve().parent.parent.parent
+sys.path.insert(0, str(ROOT / 'extractor'))
+sys.path.insert(0, str(ROOT / 'benchmarks'))
+
+import llm_generator  # noqa: E402
+from articles import Article  # noqa: E402
+from fake_services import FakeServices  # noqa: E402
+from llm_cache import LLMCache  # noqa: E402
+from llm_generator import GenerationJob, Generator, RateLimiter  # noqa: E402
+from llm_providers import FailoverProvider, OpenAICompatibleProvider, ProviderError  # noqa: E402
+
+
+class RecordingLimiter(RateLimiter):
+    """No RPM/TPM budget, only the pauses asked for by the generator"""
+
+    def __init__(self):
+        super().__init__(rpm=0, tpm=0)
+        self.pauses = []
+
+    def pause(self, seconds):
+        self.pauses.append(seconds)
+        super().pause(seconds)
+
+
+class RateLimiterTest(unittest.TestCase):
+
+    def test_pause_blocks_every_acquire_until_it_expires(self):
+        limiter = RateLimiter(rpm=0, tpm=0)
+        limiter.pause(0.2)
+        limiter.pause(0.05)
+        start = time.monotonic()
+        limiter.acquire(100)
+        self.assertGreaterEqual(time.monotonic() - start, 0.18)
+
+
+class GeneratorRetryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.limiter = RecordingLimiter()
+
+    def generator(self, max_retries=3, **options):
+        services = FakeServices(**options).start()
+        self.addCleanup(services.stop)
+        provider = OpenAICompatibleProvider(base_url=services.url + '/openai/v1', api_key='x', models={})
+        generator = Generator('Write a post.', provider=provider, limiter=self.limiter, workers=1,
+                              max_retries=max_retries, cache=LLMCache(Path(self.tmp.name) / 'llm.sqlite'))
+        self.addCleanup(generator.close)
+        return generator, services
+
+    def job(self, title):
+        return GenerationJob(('', 'Feed'), Article(title, f'https://example.com/{title}', title,
+                                                   f'Summary of {title}.', None, 'Feed'), None)
+
+    def test_retry_after_pauses_the_limiter(self):
+        generator, services = self.generator(llm_fail_every=2, llm_retry_after='0.3')
+        generator.generate(self.job('first'))
+        job = self.job('second')
+        start = time.monotonic()
+
+        with self.assertLogs('llm_generator', 'WARNING'):
+            content = generator.generate(job)
+
+        self.assertIn('POST', content)
+        self.assertEqual(self.limiter.pauses, [0.3])
+        self.assertGreaterEqual(time.monotonic() - start, 0.3)
+        self.assertEqual(job.attempts, 2)
+        self.assertEqual(services.requests['llm'], 3)
+
+    def test_backoff_without_retry_after(self):
+        generator, services = self.generator(llm_fail_every=2, llm_retry_after=None)
+        generator.generate(self.job('first'))
+
+        with mock.patch.object(llm_generator, 'BACKOFF_BASE', 0.05), self.assertLogs('llm_generator', 'WARNING'):
+            generator.generate(self.job('second'))
+
+        self.assertEqual(len(self.limiter.pauses), 1)
+        self.assertLessEqual(self.limiter.pauses[0], 0.05)
+        self.assertEqual(services.requests['llm'], 3)
+
+    def test_gives_up_after_max_retries(self):
+        generator, services = self.generator(max_retries=2, llm_fail_every=1, llm_retry_after='0')
+        job = self.job('throttled')
+
+        with self.assertRaises(ProviderError) as raised, self.assertLogs('llm_generator', 'WARNING'):
+            generator.generate(job)
+
+        self.assertEqual(raised.exception.status_code, 429)
+        self.assertEqual(job.attempts, 3)
+        self.assertEqual(services.requests['llm'], 3)
+
+
+class GeneratorCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.services = self.start()
+
+    def start(self, **options):
+        services = FakeServices(**options).start()
+        self.addCleanup(services.stop)
+        return services
+
+    def provider(self, services):
+        return OpenAICompatibleProvider(base_url=services.url + '/openai/v1', api_key='x', models={})
+
+    def generator(self, provider=None, batch_size=1):
+        generator = Generator('Write a post.', provider=provider or self.provider(self.services),
+                              limiter=RateLimiter(rpm=0, tpm=0), workers=1, max_retries=0, batch_size=batch_size,
+                              cache=LLMCache(Path(self.tmp.name) / 'llm.sqlite'))
+        self.addCleanup(generator.close)
+        return generator
+
+    def jobs(self, count=2):
+        return [GenerationJob(('', 'Feed'), Article(str(i), f'https://example.com/{i}', f'Title {i}',
+                                                    f'Summary {i}.', None, 'Feed'), None) for i in range(count)]
+
+    def run_jobs(self, generator, jobs):
+        return [job.content for job in generator.run(jobs)]
+
+    def test_single_requests_are_cached(self):
+        self.run_jobs(self.generator(), self.jobs())
+        jobs = self.jobs()
+
+        self.run_jobs(self.generator(), jobs)
+
+        self.assertEqual(self.services.requests['llm'], 2)
+        self.assertTrue(all(job.cached for job in jobs))
+
+    def test_answers_from_the_fallback_provider_are_not_cached(self):
+        down = self.start(llm_fail_every=1)
+        failover = FailoverProvider([self.provider(down), self.provider(self.services)])
+        with self.assertLogs('llm_providers', 'WARNING'):
+            self.run_jobs(self.generator(failover), self.jobs())
+
+        jobs = self.jobs()
+        self.run_jobs(self.generator(), jobs)
+
+        self.assertEqual(self.services.requests['llm'], 4)
+        self.assertFalse(any(job.cached for job in jobs))
+
+    def test_batch_answers_have_their_own_key(self):
+        self.run_jobs(self.generator(batch_size=2), self.jobs())
+        self.assertEqual(self.services.requests['llm_batch'], 1)
+
+        batched = self.jobs()
+        self.run_jobs(self.generator(batch_size=2), batched)
+        single = self.jobs()
+        self.run_jobs(self.generator(), single)
+
+        self.assertTrue(all(job.cached for job in batched))
+        self.assertFalse(any(job.cached for job in single))
+        self.assertEqual(self.services.requests['llm'], 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
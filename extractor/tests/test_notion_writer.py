@@ -0,0 +1,106 @@
+"""Notion writer: in-run retries and replay of the durable outbox on the next run
+
+    python -m unittest discover -s extractor/tests
+"""
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent.parent
+sys.path.insert(0, str(ROOT / 'extractor'))
+sys.path.insert(0, str(ROOT / 'benchmarks'))
+
+from fake_services import FakeServices  # noqa: E402
+from notion_writer import NotionWriter  # noqa: E402
+from state_store import StateStore  # noqa: E402
+
+
+def page(title):
+    return {'parent': {'database_id': 'db'},
+            'properties': {'title': {'title': [{'text': {'content': title}}]}}}
+
+
+class NotionOutboxTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name) / 'state.db'
+        self.store = self.open_store()
+
+    def tearDown(self):
+        self.store.close()
+        self.tmp.cleanup()
+
+    def open_store(self):
+        store = StateStore(self.path)
+        store.start_run()
+        return store
+
+    def next_run(self):
+        """Close the store as a run would and open it again for the next one"""
+        self.store.close()
+        self.store = self.open_store()
+
+    def services(self, **options):
+        services = FakeServices(**options).start()
+        self.addCleanup(services.stop)
+        return services
+
+    def send(self, services, pages=(), max_retries=0, replay=False):
+        """Enqueue `pages` (after replaying the outbox) and wait for every delivery"""
+        writer = NotionWriter('token', self.store, rps=0, workers=2, max_retries=max_retries,
+                              base_url=services.url + '/v1')
+        try:
+            replayed = writer.replay_outbox() if replay else 0
+            for title in pages:
+                writer.enqueue(page(title), title=title)
+            return replayed, list(writer.results())
+        finally:
+            writer.close()
+
+    def titles(self, services):
+        return sorted(p['properties']['title']['title'][0]['plain_text'] for p in services.pages.values())
+
+    def test_retries_within_the_run(self):
+        services = self.services(notion_fail_every=2)
+
+        with self.assertLogs('notion_writer', 'WARNING'):
+            _, results = self.send(services, ['one', 'two', 'three'], max_retries=2)
+
+        self.assertTrue(all(result.ok for result in results))
+        self.assertEqual(self.titles(services), ['one', 'three', 'two'])
+        self.assertEqual(self.store.outbox_count(), 0)
+
+    def test_failed_pages_are_replayed_on_the_next_run(self):
+        services = self.services(notion_fail_every=1)
+        _, results = self.send(services, ['one', 'two'])
+        self.assertEqual([(r.ok, r.retryable) for r in results], [(False, True), (False, True)])
+        self.assertEqual(self.store.outbox_count(), 2)
+        self.assertEqual(services.pages, {})
+
+        services.notion_fail_every = 0
+        self.next_run()
+        replayed, results = self.send(services, ['three'], replay=True)
+
+        self.assertEqual(replayed, 2)
+        self.assertTrue(all(result.ok for result in results))
+        self.assertEqual(self.titles(services), ['one', 'three', 'two'])
+        self.assertEqual(self.store.outbox_count(), 0)
+
+    def test_rejected_pages_are_not_replayed(self):
+        services = self.services(notion_fail_every=1, notion_fail_status=400)
+        _, results = self.send(services, ['invalid'])
+        self.assertEqual([(r.ok, r.retryable) for r in results], [(False, False)])
+
+        services.notion_fail_every = 0
+        self.next_run()
+        replayed, _ = self.send(services, replay=True)
+
+        self.assertEqual(replayed, 0)
+        self.assertEqual(services.pages, {})
+        self.assertEqual(self.store.conn.execute("SELECT status FROM notion_outbox").fetchall(), [('dead',)])
+
+
+if __name__ == '__main__':
+    unittest.main()
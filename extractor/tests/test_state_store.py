@@ -0,0 +1,143 @@
+"""Payload cleanup and retention of the article queue in state.db
+
+    python -m unittest discover -s extractor/tests
+"""
+import sys
+import tempfile
+import unittest
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from state_store import (STATUS_FAILED, STATUS_GENERATED, STATUS_SKIPPED, STATUS_WRITTEN,  # noqa: E402
+                         StateStore)
+
+MAX_ATTEMPTS = 3
+
+
+class ArticlePayloadTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = StateStore(Path(self.tmp.name) / 'state.db')
+        self.store.start_run()
+
+    def tearDown(self):
+        self.store.close()
+        self.tmp.cleanup()
+
+    def enqueue(self, count=1):
+        articles = [(f'id-{i}', f'https://example.com/{i}', f'Title {i}', f'summary {i}', '2026-10-01T00:00:00')
+                    for i in range(count)]
+        return self.store.enqueue_articles('Feed', articles, datetime(2026, 10, 1))
+
+    def row(self, article_id):
+        return self.store.conn.execute("SELECT status, summary, content FROM articles WHERE id = ?",
+                                       (article_id,)).fetchone()
+
+    def age(self, days):
+        """Move every article and run `days` into the past"""
+        shift = days * 86400
+        self.store.conn.execute("UPDATE articles SET updated_at = updated_at - ?", (shift,))
+        self.store.conn.execute("UPDATE runs SET started_at = started_at - ?", (shift,))
+
+    def test_written_and_skipped_drop_the_payload(self):
+        written, skipped = self.enqueue(2)
+        self.store.set_article_generated(written, 'POST: text')
+        self.store.set_article_status(written, STATUS_WRITTEN, max_attempts=MAX_ATTEMPTS)
+        self.store.set_article_status(skipped, STATUS_SKIPPED, 'triage score 0.010', max_attempts=MAX_ATTEMPTS)
+        self.assertEqual(self.row(written), (STATUS_WRITTEN, None, None))
+        self.assertEqual(self.row(skipped), (STATUS_SKIPPED, None, None))
+
+    def test_failed_keeps_the_payload_until_the_last_attempt(self):
+        article_id, = self.enqueue()
+        self.store.set_article_generated(article_id, 'POST: text')
+        self.store.set_article_status(article_id, STATUS_FAILED, 'notion 500', max_attempts=MAX_ATTEMPTS)
+        self.assertEqual(self.row(article_id), (STATUS_FAILED, 'summary 0', 'POST: text'))
+        self.store.claim_articles([article_id])
+        self.store.claim_articles([article_id])
+        self.store.set_article_status(article_id, STATUS_FAILED, 'notion 500', max_attempts=MAX_ATTEMPTS)
+        self.assertEqual(self.row(article_id), (STATUS_FAILED, None, None))
+
+    def test_prune_deletes_old_finished_rows_only(self):
+        old_written, old_pending = self.enqueue(2)
+        self.store.set_article_status(old_written, STATUS_WRITTEN, max_attempts=MAX_ATTEMPTS)
+        self.age(40)
+        recent_written, = self.enqueue()
+        self.store.set_article_status(recent_written, STATUS_WRITTEN, max_attempts=MAX_ATTEMPTS)
+
+        self.store.prune(MAX_ATTEMPTS, days=30)
+
+        ids = {row[0] for row in self.store.conn.execute("SELECT id FROM articles")}
+        self.assertEqual(ids, {old_pending, recent_written})
+        self.assertEqual(self.row(old_pending)[1], 'summary 1')
+        # A execução atual fica, mesmo "antiga"; o cursor do feed nunca sai
+        self.assertEqual(self.store.conn.execute("SELECT COUNT(*) FROM runs").fetchone()[0], 1)
+        self.assertIsNotNone(self.store.get_cursor('Feed'))
+
+    def test_prune_releases_articles_abandoned_on_their_last_attempt(self):
+        article_id, = self.enqueue()
+        self.store.set_article_generated(article_id, 'POST: text')
+        self.store.claim_articles([article_id])
+        self.store.claim_articles([article_id])
+        # Interrompido na terceira tentativa: continua 'generated', e a execução seguinte o vê
+        self.store.start_run()
+
+        self.store.prune(MAX_ATTEMPTS, days=30)
+
+        self.assertEqual(self.row(article_id), (STATUS_GENERATED, None, None))
+        self.assertEqual(self.store.incomplete_articles(MAX_ATTEMPTS), [])
+
+    def test_prune_keeps_articles_with_a_pending_outbox_page(self):
+        article_id, = self.enqueue()
+        self.store.claim_articles([article_id])
+        self.store.claim_articles([article_id])
+        self.store.set_article_generated(article_id, 'POST: text')
+        self.store.add_outbox(article_id, 'Title 0', '{}')
+        self.store.start_run()
+        self.age(40)
+
+        self.store.prune(MAX_ATTEMPTS, days=30)
+
+        self.assertEqual(self.row(article_id), (STATUS_GENERATED, 'summary 0', 'POST: text'))
+
+    def test_retention_zero_keeps_everything(self):
+        article_id, = self.enqueue()
+        self.store.set_article_status(article_id, STATUS_WRITTEN, max_attempts=MAX_ATTEMPTS)
+        self.age(400)
+        self.assertEqual(self.store.prune(MAX_ATTEMPTS, days=0), 0)
+        self.assertIsNotNone(self.row(article_id))
+
+
+class ReadOnlyStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name) / 'state.db'
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_missing_file_is_not_created(self):
+        store = StateStore(self.path, readonly=True)
+        self.assertEqual(store.article_counts(), {})
+        store.close()
+        self.assertFalse(self.path.exists())
+
+    def test_existing_file_is_left_untouched(self):
+        store = StateStore(self.path)
+        store.ensure_feed('Feed')
+        store.close()
+        before = self.path.read_bytes()
+
+        store = StateStore(self.path, readonly=True)
+        self.assertEqual(store.feed_names(), ['feed'])
+        store.ensure_feed('Other')
+        store.close()
+
+        self.assertEqual(self.path.read_bytes(), before)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,196 @@
+"""Relevance triage before generation: local keyword score against the prompt topics, optional small-model check
+
+Every queued article is scored over its title + description against a
+weighted keyword profile: the topics named in the system prompt,
+TRIAGE_KEYWORDS, and the name and site of the configured feed the article
+came from (those only count for that feed's own articles, so "chef" is a
+topic in the Chef blog and nowhere else). The score depends on the
+article alone, never on the rest of the batch, so it is the same from
+one run to the next.
+
+Triage is off by default. TRIAGE=report scores and logs every article,
+with a per-source summary, but skips nothing: run it on the real feeds to
+pick TRIAGE_THRESHOLD before TRIAGE=on marks anything as skipped. With
+TRIAGE_CONFIRM=on, articles between the threshold and
+TRIAGE_CONFIRM_BELOW are confirmed by the small model with a one-word
+YES/NO answer.
+"""
+import logging
+import math
+import os
+import re
+import statistics
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from llm_generator import estimate_tokens, user_content_of
+from post_sanitizer import STOPWORDS
+
+logger = logging.getLogger(__name__)
+
+# off (padrão), report (só pontua e registra) ou on (descarta abaixo do limiar)
+TRIAGE_MODE = os.getenv('TRIAGE', 'off').lower()
+if TRIAGE_MODE in ('1', 'true', 'yes'):
+    TRIAGE_MODE = 'on'
+TRIAGE_ENABLED = TRIAGE_MODE in ('on', 'report')
+TRIAGE_THRESHOLD = float(os.getenv('TRIAGE_THRESHOLD', '0.08'))
+TRIAGE_CONFIRM = os.getenv('TRIAGE_CONFIRM', 'off').lower() in ('1', 'on', 'true', 'yes')
+TRIAGE_CONFIRM_BELOW = float(os.getenv('TRIAGE_CONFIRM_BELOW', '0.3'))
+# Termos extras separados por vírgula, com peso opcional: "postgres:2, nginx"
+TRIAGE_KEYWORDS = os.getenv('TRIAGE_KEYWORDS', '')
+
+PROMPT_TOPIC_WEIGHT = 3.0
+SOURCE_WEIGHT = 2.0
+# Partes do nome/endereço de um feed que não dizem nada sobre o assunto
+SOURCE_NOISE = {'blog', 'feed', 'new', 'www', 'com', 'about', 'en'}
+
+# Expressões que viram um token só antes da tokenização
+PHRASES = (
+    (re.compile(r'\bci\s*/\s*cd\b'), 'cicd'),
+    (re.compile(r'\bred\s+hat\b'), 'redhat'),
+    (re.compile(r'\bgithub\s+actions\b'), 'githubactions'),
+    (re.compile(r'\bopen[\s-]+source\b'), 'opensource'),
+    (re.compile(r'\bsys\s*admins?\b'), 'sysadmin'),
+)
+HTML_TAG = re.compile(r'<[^>]+>')
+WORD = re.compile(r'[a-z0-9]+')
+PROMPT_HASHTAG = re.compile(r'#([A-Za-z][\w/]*)')
+PLACEHOLDER = re.compile(r'hashtag\d*$', re.IGNORECASE)
+PROMPT_FOCUS = re.compile(r'focusing on ([^.]+?)(?:,? and related technologies|\.)', re.IGNORECASE)
+
+CONFIRM_PROMPT = ("You screen news articles for a LinkedIn page aimed at IT professionals interested in {topics}. "
+                  "Answer YES if the article below is relevant to that audience, otherwise NO. "
+                  "Answer with one word only.")
+CONFIRM_PARAMS = {'temperature': 0, 'max_tokens': 2}
+
+
+def stem(word):
+    """Crude plural folding, applied to profile and text alike"""
+    if len(word) > 4 and word.endswith('ies'):
+        return word[:-3] + 'y'
+    if len(word) > 3 and word.endswith('s') and not word.endswith('ss'):
+        return word[:-1]
+    return word
+
+
+def tokenize(text):
+    text = HTML_TAG.sub(' ', text or '').lower()
+    for pattern, replacement in PHRASES:
+        text = pattern.sub(replacement, text)
+    return [stem(w) for w in WORD.findall(text) if len(w) > 1 and w not in STOPWORDS]
+
+
+def topics_from_prompt(prompt):
+    """Topics named in the prompt: the "focusing on ..." list and the example hashtags"""
+    topics = []
+    match = PROMPT_FOCUS.search(prompt)
+    if match:
+        topics.extend(t.strip() for t in re.split(r',|\band\b', match.group(1)) if t.strip())
+    # #hashtag1, #hashtag2... são só o formato de exemplo
+    topics.extend(t for t in PROMPT_HASHTAG.findall(prompt) if not PLACEHOLDER.match(t))
+    return list(dict.fromkeys(topics))
+
+
+def build_profile(prompt, extra=TRIAGE_KEYWORDS):
+    """Keyword -> weight for every article: the prompt topics and TRIAGE_KEYWORDS"""
+    profile = {}
+    for topic in topics_from_prompt(prompt):
+        for token in tokenize(topic):
+            profile[token] = PROMPT_TOPIC_WEIGHT
+    for item in extra.split(','):
+        term, _, weight = item.strip().partition(':')
+        for token in tokenize(term):
+            profile[token] = float(weight) if weight else PROMPT_TOPIC_WEIGHT
+    return profile
+
+
+def source_terms(url, name):
+    """Topic words of a configured feed: its name and host ("HashiCorp Blog", www.hashicorp.com -> hashicorp)"""
+    host = (urlsplit(url).hostname or '').split('.')[:-1]
+    return {token for token in tokenize(' '.join([name] + host)) if token not in SOURCE_NOISE}
+
+
+class TriageRouter:
+    """Split queued jobs into those worth a big-model call and those to skip"""
+
+    def __init__(self, prompt, generator=None, sources=(), threshold=TRIAGE_THRESHOLD,
+                 confirm=TRIAGE_CONFIRM, confirm_below=TRIAGE_CONFIRM_BELOW, report=TRIAGE_MODE == 'report'):
+        self.prompt = prompt
+        self.profile = build_profile(prompt)
+        # (url, name) do Feed.csv -> termos que só valem para os artigos daquele feed
+        self.source_profiles = {}
+        for url, name in sources:
+            terms = {token: SOURCE_WEIGHT for token in source_terms(url, name)}
+            terms.update(self.profile)
+            self.source_profiles[name.lower()] = terms
+        self.max_weight = max(list(self.profile.values()) + [SOURCE_WEIGHT])
+        self.report = report
+        self.generator = generator
+        self.threshold = threshold
+        self.confirm = confirm and generator is not None
+        self.confirm_below = confirm_below
+        self.confirm_prompt = CONFIRM_PROMPT.format(topics=', '.join(topics_from_prompt(prompt)) or 'IT')
+        self.skipped = 0
+        self.confirm_calls = 0
+        self.confirm_tokens = 0
+        self.tokens_avoided = 0
+
+    def score(self, job):
+        """Cosine-style score in [0, 1]; depends on the article and its feed only"""
+        # O título pesa o dobro da descrição
+        doc = Counter(tokenize(job.title) * 2 + tokenize(job.description))
+        weights = {t: 1 + math.log(tf) for t, tf in doc.items()}
+        norm = math.sqrt(sum(v * v for v in weights.values()))
+        if not norm:
+            return 0.0
+        profile = self.source_profiles.get(job.RssItem[1].lower(), self.profile)
+        dot = sum(v * profile[t] for t, v in weights.items() if t in profile)
+        return dot / (norm * self.max_weight)
+
+    def _confirm(self, job):
+        """Small-model YES/NO; any failure keeps the article (fail open)"""
+        try:
+            answer, tokens = self.generator.classify(self.confirm_prompt, user_content_of(job), CONFIRM_PARAMS)
+        except Exception as e:
+            logger.warning(f"Triage check failed for {job.title!r}, keeping it: {e}")
+            return True, 0
+        return not (answer or '').strip().upper().startswith('NO'), tokens
+
+    def route(self, jobs):
+        """Return (jobs to generate, jobs skipped); each job gets a `triage_score`"""
+        selected, skipped, borderline = [], [], []
+        for job in jobs:
+            job.triage_score = self.score(job)
+        if self.report:
+            self.log_report(jobs)
+            return list(jobs), []
+        for job in jobs:
+            if job.triage_score < self.threshold:
+                skipped.append(job)
+            elif self.confirm and job.triage_score < self.confirm_below:
+                borderline.append(job)
+            else:
+                selected.append(job)
+        if borderline:
+            with ThreadPoolExecutor(max_workers=self.generator.workers) as pool:
+                for job, (keep, tokens) in zip(borderline, pool.map(self._confirm, borderline)):
+                    self.confirm_calls += 1
+                    self.confirm_tokens += tokens
+                    (selected if keep else skipped).append(job)
+        for job in skipped:
+            logger.debug("Triage skipped %s (score %.3f)", job.title, job.triage_score)
+            self.tokens_avoided += estimate_tokens(self.prompt, user_content_of(job))
+        self.skipped += len(skipped)
+        return selected, skipped
+
+    def log_report(self, jobs):
+        """TRIAGE=report: every score and a per-source summary, to calibrate TRIAGE_THRESHOLD"""
+        by_source = defaultdict(list)
+        for job in jobs:
+            by_source[job.RssItem[1]].append(job.triage_score)
+            logger.info("Triage score %.3f  %s: %s", job.triage_score, job.RssItem[1], job.title)
+        for source, scores in sorted(by_source.items()):
+            below = sum(1 for score in scores if score < self.threshold)
+            logger.info("Triage report %s: %d articles, min %.3f, median %.3f, %d below %.3f",
+                        source, len(scores), min(scores), statistics.median(scores), below, self.threshold)